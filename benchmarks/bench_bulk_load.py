@@ -0,0 +1,69 @@
+"""
+Compares bulk loading with Container.add_documents against a loop of
+Container.add_document calls.
+
+Run from the project root folder: python -m benchmarks.bench_bulk_load --count 1000000
+"""
+import argparse
+import time
+
+from dockie.core.container import Container
+from dockie.core.document import Document
+
+
+def _records(count: int):
+    return [(f"doc{number}", {"number": number}) for number in range(count)]
+
+
+def per_document_loop(records: list) -> float:
+    """
+    Loads the records one document at a time.
+    :param records: The (document_id, data) records.
+    :return: The elapsed time in seconds.
+    """
+    container = Container("bench")
+    start = time.perf_counter()
+
+    for document_id, data in records:
+        container.add_document(Document(document_id, data))
+
+    return time.perf_counter() - start
+
+
+def bulk_load(records: list, batch_size: int) -> float:
+    """
+    Loads the records with Container.add_documents.
+    :param records: The (document_id, data) records.
+    :param batch_size: The bulk load batch size.
+    :return: The elapsed time in seconds.
+    """
+    container = Container("bench")
+    start = time.perf_counter()
+    container.add_documents(records, batch_size)
+
+    return time.perf_counter() - start
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    records = _records(arguments.count)
+    loop_seconds = per_document_loop(records)
+    bulk_seconds = bulk_load(records, arguments.batch_size)
+
+    print(f"documents:          {arguments.count}")
+    print(f"add_document loop:  {loop_seconds:.3f}s "
+          f"({arguments.count / loop_seconds:,.0f} docs/s)")
+    print(f"add_documents bulk: {bulk_seconds:.3f}s "
+          f"({arguments.count / bulk_seconds:,.0f} docs/s)")
+    print(f"speedup:            {loop_seconds / bulk_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares the save and load throughput and the on-disk size of a database
+persisted with each available codec and compression.
+
+Run from the project root folder: python -m benchmarks.bench_codecs --count 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from dockie.core import codecs
+from dockie.core.database import Database
+from dockie.core.persistence import load_from_file, persist_to_file
+
+
+def _database(count: int) -> Database:
+    database = Database()
+    database.add_container("bench")
+    database.bulk_load(
+        "bench",
+        (
+            (
+                f"doc{number}",
+                {
+                    "number": number,
+                    "name": f"customer {number % 1000}",
+                    "price": number * 0.25,
+                    "tags": ["red", "large"] if number % 2 else ["blue"],
+                    "address": {"city": "Seattle", "zip": 98101 + number % 50},
+                },
+            )
+            for number in range(count)
+        ),
+    )
+
+    return database
+
+
+def measure(database: Database, filename: str, codec: str, compression) -> tuple:
+    """
+    Saves and loads the database with a codec and compression.
+    :param database: The database.
+    :param filename: The file name.
+    :param codec: The codec name.
+    :param compression: The compression name, or None.
+    :return: The save seconds, the load seconds and the file size in bytes.
+    """
+    start = time.perf_counter()
+    persist_to_file(database, filename, overwrite=True, codec=codec, compression=compression)
+    save_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_from_file(filename, allow_pickle=codec == "pickle")
+    load_seconds = time.perf_counter() - start
+
+    return save_seconds, load_seconds, os.path.getsize(filename)
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    arguments = parser.parse_args()
+
+    database = _database(arguments.count)
+    print(f"documents: {arguments.count}")
+    print(f"{'codec':<10}{'compression':<13}{'save docs/s':>14}{'load docs/s':>14}{'size MiB':>11}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "bench.db")
+
+        for codec in codecs.list_codecs():
+            for compression in [None] + codecs.list_compressions():
+                save_seconds, load_seconds, size = measure(
+                    database, filename, codec, compression
+                )
+                print(
+                    f"{codec:<10}{compression or '-':<13}"
+                    f"{arguments.count / save_seconds:>14,.0f}"
+                    f"{arguments.count / load_seconds:>14,.0f}"
+                    f"{size / 2 ** 20:>11.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures the memory held per document by a container, comparing the slotted
+Document with an equivalent class that keeps a per-instance __dict__, and the
+memory allocated by lookups of missing documents.
+
+Run from the project root folder: python -m benchmarks.bench_memory --count 1000000
+"""
+import argparse
+import tracemalloc
+
+from dockie.core.container import Container
+from dockie.core.document import Document
+
+
+class DictDocument:
+    """
+    A document with a per-instance __dict__, laid out like Document was before
+    it was slotted.
+    """
+
+    def __init__(self, document_id, data: dict):
+        self._document_id = document_id
+        self._data = data
+
+    def get_id(self):
+        """
+        Retrieves the document's id.
+        """
+        return self._document_id
+
+    def get_data(self) -> dict:
+        """
+        Retrieves the document's data.
+        """
+        return self._data
+
+
+def _records(count: int):
+    return [(f"doc{number}", {"number": number}) for number in range(count)]
+
+
+def bytes_per_document(records: list, document_type) -> float:
+    """
+    Measures the memory held by a container per document, excluding the
+    document ids and data, which are shared by every run.
+    :param records: The (document_id, data) records.
+    :param document_type: The document class.
+    :return: The number of bytes per document.
+    """
+    tracemalloc.start()
+    container = Container("bench")
+
+    for document_id, data in records:
+        container.add_document(document_type(document_id, data))
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del container
+    return size / len(records)
+
+
+def bytes_per_miss(count: int) -> float:
+    """
+    Measures the memory allocated per lookup of a missing document.
+    :param count: The number of lookups.
+    :return: The number of bytes per lookup.
+    """
+    container = Container("bench")
+    document_ids = [f"missing{number}" for number in range(count)]
+
+    tracemalloc.start()
+    misses = [container.get_document(document_id) for document_id in document_ids]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del misses
+    return (size - count * 8) / count
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200000)
+    arguments = parser.parse_args()
+
+    records = _records(arguments.count)
+    dict_bytes = bytes_per_document(records, DictDocument)
+    slotted_bytes = bytes_per_document(records, Document)
+
+    print(f"documents:              {arguments.count}")
+    print(f"with __dict__:          {dict_bytes:.1f} bytes/document")
+    print(f"slotted:                {slotted_bytes:.1f} bytes/document")
+    print(f"saved:                  {1 - slotted_bytes / dict_bytes:.0%}")
+    print(f"missing document reads: {bytes_per_miss(arguments.count):.1f} bytes/lookup")
+
+
+if __name__ == "__main__":
+    main()
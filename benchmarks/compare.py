@@ -0,0 +1,111 @@
+"""
+Compares two result files written by benchmarks.suite, for example from two
+commits. Cases whose throughput dropped, or whose p95 latency or peak memory
+grew, by more than the threshold are reported as regressions, and the exit
+status is 1 when there is at least one.
+
+Run from the project root folder:
+python -m benchmarks.compare baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+def load_results(filename: str) -> Dict[Tuple[str, str, int], dict]:
+    """
+    Loads a result file.
+    :param filename: The file name.
+    :return: The results keyed by case, shape and number of documents.
+    """
+    with open(filename, encoding="utf-8") as file:
+        results = json.load(file)["results"]
+
+    return {
+        (result["case"], result["shape"], result["documents"]): result
+        for result in results
+    }
+
+
+def change(baseline: Optional[float], current: Optional[float]) -> Optional[float]:
+    """
+    Computes the relative change from a baseline value.
+    :param baseline: The baseline value.
+    :param current: The current value.
+    :return: The relative change, or None when either value is missing or the baseline is zero.
+    """
+    if not baseline or current is None:
+        return None
+
+    return (current - baseline) / baseline
+
+
+def regressions(result_change: Dict[str, Optional[float]], threshold: float) -> List[str]:
+    """
+    Lists the metrics of a case that regressed.
+    :param result_change: The relative change of each metric.
+    :param threshold: The relative change tolerated.
+    :return: The names of the regressed metrics.
+    """
+    regressed = []
+
+    if (result_change["throughput"] or 0) < -threshold:
+        regressed.append("throughput")
+
+    for metric in ("p95", "peak_bytes"):
+        if (result_change[metric] or 0) > threshold:
+            regressed.append(metric)
+
+    return regressed
+
+
+def _format(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:+.1%}"
+
+
+def main():
+    """
+    Compares the result files.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    arguments = parser.parse_args()
+
+    baseline = load_results(arguments.baseline)
+    current = load_results(arguments.current)
+    regressed = 0
+
+    print(f"{'case':<20}{'shape':<8}{'documents':>10}{'ops/s':>10}{'p95':>10}{'peak':>10}")
+
+    for key in sorted(baseline.keys() & current.keys(), key=lambda item: (item[2], item[0])):
+        result_change = {
+            metric: change(baseline[key][metric], current[key][metric])
+            for metric in ("throughput", "p95", "peak_bytes")
+        }
+        metrics = regressions(result_change, arguments.threshold)
+        regressed += bool(metrics)
+        case, shape, documents = key
+
+        print(
+            f"{case:<20}{shape:<8}{documents:>10}"
+            f"{_format(result_change['throughput']):>10}"
+            f"{_format(result_change['p95']):>10}"
+            f"{_format(result_change['peak_bytes']):>10}"
+            f"{'  REGRESSED: ' + ', '.join(metrics) if metrics else ''}"
+        )
+
+    for key in sorted(baseline.keys() ^ current.keys()):
+        side = "baseline" if key in baseline else "current"
+        print(f"{key[0]:<20}{key[1]:<8}{key[2]:>10}  only in {side}")
+
+    print(f"{regressed} regression(s) beyond {arguments.threshold:.0%}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
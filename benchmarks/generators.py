@@ -0,0 +1,92 @@
+"""
+Synthetic document generators shared by the benchmarks. Generators are seeded,
+so every run and every commit benchmarks the same documents.
+"""
+import random
+from typing import Iterator, Tuple
+
+FLAT = "flat"
+NESTED = "nested"
+
+_NAMES = ["basketball", "football", "tennis", "hockey", "cricket", "rugby", "golf"]
+_CITIES = ["Seattle", "Portland", "Boston", "Austin", "Denver", "Chicago"]
+_TAGS = ["red", "blue", "green", "large", "small", "sale", "new"]
+
+
+def flat_documents(count: int, seed: int = 0, padding: int = 0) -> Iterator[Tuple[str, dict]]:
+    """
+    Generates documents with scalar attributes only.
+    :param count: The number of documents.
+    :param seed: The random seed.
+    :param padding: The length of an extra string attribute, used to vary the document size.
+    :return: An iterator over (document_id, data) tuples.
+    """
+    generator = random.Random(seed)
+
+    for number in range(count):
+        data = {
+            "number": number,
+            "name": generator.choice(_NAMES),
+            "price": round(generator.uniform(1, 500), 2),
+            "quantity": generator.randint(0, 1000),
+            "active": generator.random() < 0.5,
+        }
+
+        if padding:
+            data["padding"] = "x" * padding
+
+        yield f"doc{number}", data
+
+
+def nested_documents(count: int, seed: int = 0, padding: int = 0) -> Iterator[Tuple[str, dict]]:
+    """
+    Generates documents with nested objects and lists of objects.
+    :param count: The number of documents.
+    :param seed: The random seed.
+    :param padding: The length of an extra string attribute, used to vary the document size.
+    :return: An iterator over (document_id, data) tuples.
+    """
+    generator = random.Random(seed)
+
+    for number in range(count):
+        data = {
+            "number": number,
+            "name": generator.choice(_NAMES),
+            "customer": {
+                "id": generator.randint(1, count // 10 + 1),
+                "address": {
+                    "city": generator.choice(_CITIES),
+                    "zip": 98000 + generator.randint(0, 999),
+                },
+            },
+            "tags": generator.sample(_TAGS, generator.randint(1, 3)),
+            "lines": [
+                {"sku": generator.randint(1, 5000), "price": round(generator.uniform(1, 100), 2)}
+                for _ in range(generator.randint(1, 4))
+            ],
+        }
+
+        if padding:
+            data["padding"] = "x" * padding
+
+        yield f"doc{number}", data
+
+
+def documents(
+    shape: str, count: int, seed: int = 0, padding: int = 0
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Generates documents of a shape.
+    :param shape: 'flat' or 'nested'.
+    :param count: The number of documents.
+    :param seed: The random seed.
+    :param padding: The length of an extra string attribute.
+    :return: An iterator over (document_id, data) tuples.
+    """
+    if shape == FLAT:
+        return flat_documents(count, seed, padding)
+
+    if shape == NESTED:
+        return nested_documents(count, seed, padding)
+
+    raise ValueError(f"Unknown document shape '{shape}'.")
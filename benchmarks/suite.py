@@ -0,0 +1,402 @@
+"""
+Benchmarks the core operations, point reads, attribute queries and persistence
+over synthetic flat and nested documents at several container sizes. Every case
+reports throughput, latency percentiles and the peak memory it allocated, and
+the results can be written to a JSON file and compared between commits with
+benchmarks.compare.
+
+Run from the project root folder:
+python -m benchmarks.suite --sizes 1000 10000 100000 --output results.json
+
+Sizes up to 10000000 are supported; the generated documents are held in memory
+for the whole run, so the largest sizes need several GiB.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, NamedTuple
+
+from benchmarks import generators
+from dockie.core import index
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.persistence import load_from_file, persist_to_file
+from dockie.query.parallel import ParallelExecutor
+from dockie.query.query import DocumentAttributeQuery
+
+FORMAT_VERSION = 1
+
+_SCAN_QUERIES = {
+    generators.FLAT: 'name == "tennis"',
+    generators.NESTED: '`customer.address.city` == "Boston"',
+}
+
+# Every get_documents operation reads one batch of this many sampled ids.
+_GET_BATCH_SIZE = 500
+
+
+class Case(NamedTuple):
+    """
+    A benchmark case. setup builds the state outside the measurement and run
+    returns the latency of every operation it performed, in seconds.
+    """
+
+    name: str
+    setup: Callable[[list, argparse.Namespace], object]
+    run: Callable[[object], List[float]]
+
+
+def _container(records: list) -> Container:
+    container = Container("bench")
+    container.add_documents(records)
+
+    return container
+
+
+def _sample_ids(records: list, samples: int, prefix: str = "") -> List[str]:
+    generator = random.Random(1)
+
+    return [
+        prefix + records[generator.randrange(len(records))][0] for _ in range(samples)
+    ]
+
+
+def _timed(function: Callable[[], object], repeats: int) -> List[float]:
+    latencies = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def _run_add_document(documents: List[Document]) -> List[float]:
+    container = Container("bench")
+    add_document = container.add_document
+    clock = time.perf_counter
+    latencies = []
+
+    for document in documents:
+        start = clock()
+        add_document(document)
+        latencies.append(clock() - start)
+
+    return latencies
+
+
+def _run_add_documents(state) -> List[float]:
+    records, batch_size = state
+    container = Container("bench")
+    latencies = []
+
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        start_time = time.perf_counter()
+        container.add_documents(batch, batch_size)
+        latencies.append(time.perf_counter() - start_time)
+
+    return latencies
+
+
+def _run_get_document(state) -> List[float]:
+    container, document_ids = state
+    get_document = container.get_document
+    clock = time.perf_counter
+    latencies = []
+
+    for document_id in document_ids:
+        start = clock()
+        get_document(document_id)
+        latencies.append(clock() - start)
+
+    return latencies
+
+
+def _run_get_documents(state) -> List[float]:
+    container, document_ids = state
+    batches = [
+        document_ids[start:start + _GET_BATCH_SIZE]
+        for start in range(0, len(document_ids), _GET_BATCH_SIZE)
+    ]
+
+    return [
+        latency
+        for batch in batches
+        for latency in _timed(lambda batch=batch: container.get_documents(batch), 1)
+    ]
+
+
+def _run_query(state) -> List[float]:
+    container, query_string, repeats = state
+    query = DocumentAttributeQuery()
+
+    return _timed(lambda: query.execute(container, query=query_string), repeats)
+
+
+def _setup_parallel_query(records: list, arguments) -> tuple:
+    container = _container(records)
+    executor = ParallelExecutor(arguments.processes, threshold=1)
+    query = DocumentAttributeQuery(executor=executor)
+    query_string = _SCAN_QUERIES[arguments.shape]
+    # The first scan publishes the container to the workers; the measured
+    # scans find it already published, as repeated reads of a container do.
+    query.execute(container, query=query_string)
+
+    return container, query, query_string, arguments.repeats, executor
+
+
+def _run_parallel_query(state) -> List[float]:
+    container, query, query_string, repeats, executor = state
+
+    try:
+        return _timed(lambda: query.execute(container, query=query_string), repeats)
+    finally:
+        executor.close()
+
+
+def _setup_indexed_query(records: list, arguments) -> tuple:
+    container = _container(records)
+    container.add_index("number", index.SORTED)
+    low = len(records) // 2
+
+    return container, f"number >= {low} AND number < {low + 100}", arguments.repeats * 10
+
+
+def _setup_persistence(records: list, _) -> tuple:
+    database = Database()
+    database.attach_container(_container(records))
+    directory = tempfile.mkdtemp()
+
+    return database, os.path.join(directory, "bench.db")
+
+
+def _run_persist(state) -> List[float]:
+    database, filename = state
+
+    try:
+        return _timed(lambda: persist_to_file(database, filename, overwrite=True), 1)
+    finally:
+        _remove(filename)
+
+
+def _setup_load(records: list, arguments) -> str:
+    database, filename = _setup_persistence(records, arguments)
+    persist_to_file(database, filename, overwrite=True)
+
+    return filename
+
+
+def _run_load(filename: str) -> List[float]:
+    try:
+        return _timed(lambda: load_from_file(filename), 1)
+    finally:
+        _remove(filename)
+
+
+def _remove(filename: str):
+    if os.path.exists(filename):
+        os.remove(filename)
+        os.rmdir(os.path.dirname(filename))
+
+
+CASES = [
+    Case(
+        "add_document",
+        lambda records, _: [Document(document_id, data) for document_id, data in records],
+        _run_add_document,
+    ),
+    Case(
+        "add_documents",
+        lambda records, arguments: (records, arguments.batch_size),
+        _run_add_documents,
+    ),
+    Case(
+        "get_document_hit",
+        lambda records, arguments: (
+            _container(records), _sample_ids(records, arguments.samples)
+        ),
+        _run_get_document,
+    ),
+    Case(
+        "get_document_miss",
+        lambda records, arguments: (
+            _container(records), _sample_ids(records, arguments.samples, "missing-")
+        ),
+        _run_get_document,
+    ),
+    Case(
+        "get_documents",
+        lambda records, arguments: (
+            _container(records), _sample_ids(records, arguments.samples)
+        ),
+        _run_get_documents,
+    ),
+    Case(
+        "query_scan",
+        lambda records, arguments: (
+            _container(records), _SCAN_QUERIES[arguments.shape], arguments.repeats
+        ),
+        _run_query,
+    ),
+    Case("query_scan_parallel", _setup_parallel_query, _run_parallel_query),
+    Case("query_index_range", _setup_indexed_query, _run_query),
+    Case("persist_to_file", _setup_persistence, _run_persist),
+    Case("load_from_file", _setup_load, _run_load),
+]
+
+
+def percentile(latencies: List[float], percent: float) -> float:
+    """
+    Computes a nearest-rank percentile.
+    :param latencies: The latencies, in any order.
+    :param percent: The percentile, between 0 and 100.
+    :return: The percentile.
+    """
+    ordered = sorted(latencies)
+
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def measure(case: Case, records: list, arguments) -> dict:
+    """
+    Runs a case, then runs it again under tracemalloc to measure its peak memory.
+    Tracing slows Python down, so the two runs are kept apart.
+    :param case: The case.
+    :param records: The (document_id, data) records.
+    :param arguments: The command line arguments.
+    :return: The case result.
+    """
+    latencies = case.run(case.setup(records, arguments))
+    total = sum(latencies)
+    result = {
+        "case": case.name,
+        "shape": arguments.shape,
+        "documents": len(records),
+        "operations": len(latencies),
+        "seconds": total,
+        "throughput": len(latencies) / total if total else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "peak_bytes": None,
+    }
+
+    if not arguments.skip_memory:
+        state = case.setup(records, arguments)
+        tracemalloc.start()
+
+        try:
+            case.run(state)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(arguments) -> dict:
+    """
+    Describes the run, so results can be matched to a commit and a machine.
+    :param arguments: The command line arguments.
+    :return: The run description.
+    """
+    return {
+        "format": FORMAT_VERSION,
+        "commit": _commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "arguments": {
+            key: value for key, value in vars(arguments).items() if key != "output"
+        },
+    }
+
+
+def _print_result(result: dict):
+    peak = result["peak_bytes"]
+    throughput = result["throughput"]
+    print(
+        f"{result['case']:<20}{result['documents']:>10}"
+        f"{throughput or 0:>14,.1f}"
+        f"{result['p50'] * 1e6:>14,.1f}"
+        f"{result['p95'] * 1e6:>14,.1f}"
+        f"{result['p99'] * 1e6:>14,.1f}"
+        f"{'-' if peak is None else f'{peak / 2 ** 20:,.1f}':>11}"
+    )
+
+
+def main():
+    """
+    Runs the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--shape", choices=[generators.FLAT, generators.NESTED], default=generators.FLAT
+    )
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in CASES])
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-memory", action="store_true")
+    parser.add_argument("--output")
+    arguments = parser.parse_args()
+
+    cases = [case for case in CASES if not arguments.cases or case.name in arguments.cases]
+    results = []
+    print(
+        f"{'case':<20}{'documents':>10}{'ops/s':>14}{'p50 us':>14}"
+        f"{'p95 us':>14}{'p99 us':>14}{'peak MiB':>11}"
+    )
+
+    for size in arguments.sizes:
+        records = list(
+            generators.documents(arguments.shape, size, arguments.seed, arguments.padding)
+        )
+
+        for case in cases:
+            result = measure(case, records, arguments)
+            results.append(result)
+            _print_result(result)
+
+        sys.stdout.flush()
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump({"environment": environment(arguments), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
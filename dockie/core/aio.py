@@ -0,0 +1,284 @@
+"""
+Asyncio module. AsyncDatabase and AsyncContainer wrap a Database and its
+containers for use from coroutines. Calls that can wait on a lock, scan many
+documents or touch the disk run in an executor, so they never block the event loop.
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterable, List, Optional
+
+from dockie.core import codecs, ensure, errors, persistence, snapshot
+from dockie.core.container import BulkLoadResult, Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.feed import Change
+
+
+async def run_blocking(executor: Optional[Executor], function, *args, **kwargs):
+    """
+    Runs a blocking call in an executor and waits for its result.
+    :param executor: The executor. When None, the event loop's default executor is used.
+    :param function: The callable.
+    :param args: The positional arguments of the call.
+    :param kwargs: The keyword arguments of the call.
+    :return: The result of the call.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(function, *args, **kwargs)
+    )
+
+
+class AsyncContainer:
+    """
+    Wraps a Container for use from coroutines.
+    """
+
+    def __init__(self, container: Container, executor: Optional[Executor] = None):
+        """
+        Creates an AsyncContainer instance.
+        :param container: The container.
+        :param executor: The executor that runs blocking calls. When not specified,
+        the event loop's default executor is used.
+        """
+        ensure.not_none(
+            container, errors.ObjectCreateError("Container cannot be of type None.")
+        )
+
+        self._container = container
+        self._executor = executor
+
+    def get_container(self) -> Container:
+        """
+        Retrieves the wrapped container.
+        :return: The container.
+        """
+        return self._container
+
+    def get_name(self) -> str:
+        """
+        Retrieves the container name.
+        :return: The container name.
+        """
+        return self._container.get_name()
+
+    async def add_document(self, document: Document, ttl: Optional[float] = None):
+        """
+        Adds a document to the container, see Container.add_document.
+        :param document: The document.
+        :param ttl: The number of seconds the document lives.
+        """
+        await run_blocking(self._executor, self._container.add_document, document, ttl)
+
+    async def add_documents(
+        self, documents: Iterable, batch_size: int = 1000
+    ) -> BulkLoadResult:
+        """
+        Adds many documents to the container, see Container.add_documents.
+        :param documents: The documents to add, as Document instances or
+        (document_id, data) tuples.
+        :param batch_size: The number of documents validated and inserted at a time.
+        :return: The number of inserted and replaced documents.
+        """
+        return await run_blocking(
+            self._executor, self._container.add_documents, documents, batch_size
+        )
+
+    async def get_document(self, document_id) -> Document:
+        """
+        Retrieves a document by its id, see Container.get_document. The read
+        may decode the document from a snapshot or a spill file, so it runs in the executor.
+        :param document_id: The document id.
+        :return: The document, or a NoneDocument when the id was not found.
+        """
+        return await run_blocking(
+            self._executor, self._container.get_document, document_id
+        )
+
+    async def get_documents(self, document_ids: Iterable) -> List[Document]:
+        """
+        Retrieves several documents by their ids, see Container.get_documents.
+        A batch may decode many documents from a snapshot, so it is read in the executor.
+        :param document_ids: The document ids.
+        :return: The documents in the order of the ids, with NONE_DOCUMENT for
+        the ids that were not found.
+        """
+        return await run_blocking(
+            self._executor, self._container.get_documents, document_ids
+        )
+
+    async def list_documents(self) -> list:
+        """
+        Lists the documents in the container.
+        :return: The ids of the documents.
+        """
+        return await run_blocking(self._executor, self._container.list_documents)
+
+    async def stream_changes(
+        self, checkpoint: int = 0, timeout: Optional[float] = None
+    ) -> AsyncIterator[Change]:
+        """
+        Streams the changes after a checkpoint, see ChangeFeed.stream.
+        :param checkpoint: The sequence of the last change the consumer has seen.
+        :param timeout: The maximum number of seconds to wait for a change.
+        When not specified, the stream ends only when the feed is closed.
+        :return: An asynchronous iterator over the changes.
+        """
+        change_feed = self._container.get_change_feed()
+
+        if change_feed is None:
+            raise errors.ObjectReadError(
+                "Change feed is not enabled. Enable it with enable_change_feed."
+            )
+
+        async for change in change_feed.stream(checkpoint, timeout):
+            yield change
+
+
+class AsyncDatabase:
+    """
+    Wraps a Database for use from coroutines.
+    """
+
+    def __init__(
+        self, database: Optional[Database] = None, executor: Optional[Executor] = None
+    ):
+        """
+        Creates an AsyncDatabase instance.
+        :param database: The database. When not specified, a new database is created.
+        :param executor: The executor that runs blocking calls. When not specified,
+        the event loop's default executor is used.
+        """
+        self._database = database if database is not None else Database()
+        self._executor = executor
+
+    def get_database(self) -> Database:
+        """
+        Retrieves the wrapped database.
+        :return: The database.
+        """
+        return self._database
+
+    async def add_container(self, name: str) -> AsyncContainer:
+        """
+        Adds a container to the database, see Database.add_container.
+        :param name: The container name.
+        :return: The new container.
+        """
+        await run_blocking(self._executor, self._database.add_container, name)
+
+        return await self.get_container(name)
+
+    async def get_container(self, name: str) -> AsyncContainer:
+        """
+        Retrieves a container by its name, see Database.get_container.
+        :param name: The container name.
+        :return: The container.
+        """
+        return AsyncContainer(self._database.get_container(name), self._executor)
+
+    async def list_containers(self) -> List[str]:
+        """
+        Lists the containers in the database.
+        :return: A list of the container names.
+        """
+        return await run_blocking(self._executor, self._database.list_containers)
+
+    async def bulk_load(
+        self, name: str, documents: Iterable, batch_size: int = 1000
+    ) -> BulkLoadResult:
+        """
+        Adds many documents to a container, see Database.bulk_load.
+        :param name: The container name.
+        :param documents: The documents to add.
+        :param batch_size: The number of documents validated and inserted at a time.
+        :return: The number of inserted and replaced documents.
+        """
+        return await run_blocking(
+            self._executor, self._database.bulk_load, name, documents, batch_size
+        )
+
+    async def persist_to_file(
+        self,
+        filename: str,
+        overwrite=False,
+        codec: str = codecs.DEFAULT,
+        compression: str = None,
+    ):
+        """
+        Persists the database to a file, see persistence.persist_to_file.
+        :param filename: The file name.
+        :param overwrite: When True and the file exists, the file is overwritten.
+        :param codec: The name of the codec that encodes the database.
+        :param compression: The name of the compression applied to the encoded database.
+        """
+        await run_blocking(
+            self._executor,
+            persistence.persist_to_file,
+            self._database,
+            filename,
+            overwrite,
+            codec,
+            compression,
+        )
+
+    async def write_snapshot(
+        self, filename: str, overwrite=False, codec: str = codecs.DEFAULT
+    ):
+        """
+        Writes the database to a memory-mappable snapshot, see snapshot.write_snapshot.
+        :param filename: The file name.
+        :param overwrite: When True and the file exists, the file is overwritten.
+        :param codec: The name of the codec that encodes each document.
+        """
+        await run_blocking(
+            self._executor,
+            snapshot.write_snapshot,
+            self._database,
+            filename,
+            overwrite,
+            codec,
+        )
+
+    @classmethod
+    async def load_from_file(
+        cls,
+        filename: str,
+        executor: Optional[Executor] = None,
+        allow_pickle: bool = False,
+    ) -> "AsyncDatabase":
+        """
+        Loads a database from a file, see persistence.load_from_file.
+        :param filename: The file name.
+        :param executor: The executor that runs blocking calls.
+        :param allow_pickle: When True, files encoded with pickle are loaded.
+        :return: The AsyncDatabase instance.
+        """
+        database = await run_blocking(
+            executor, persistence.load_from_file, filename, allow_pickle
+        )
+
+        return cls(database, executor)
+
+    @classmethod
+    async def open_snapshot(
+        cls,
+        filename: str,
+        max_resident: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        allow_pickle: bool = False,
+    ) -> "AsyncDatabase":
+        """
+        Opens a snapshot file, see snapshot.open_snapshot.
+        :param filename: The file name.
+        :param max_resident: The maximum number of decoded documents kept in memory
+        per container.
+        :param executor: The executor that runs blocking calls.
+        :param allow_pickle: When True, snapshots encoded with pickle are opened.
+        :return: The AsyncDatabase instance.
+        """
+        database = await run_blocking(
+            executor, snapshot.open_snapshot, filename, max_resident, allow_pickle
+        )
+
+        return cls(database, executor)
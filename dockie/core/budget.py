@@ -0,0 +1,530 @@
+"""
+Memory budget module. A budgeted document store keeps the approximate size of
+its resident documents within a byte budget, evicting cold documents with the
+CLOCK algorithm. Evicted documents are either dropped, for containers used as
+caches, or spilled to a temporary file and decoded again when they are read.
+"""
+import os
+import sys
+import tempfile
+import threading
+import weakref
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from dockie.core import codecs, ensure, errors, instrumentation
+from dockie.core.document import Document
+
+DROP = "drop"
+SPILL = "spill"
+
+# Spill files are compacted once this many bytes of replaced records pile up
+# and they outweigh the live records.
+_COMPACT_BYTES = 1 << 20
+
+_MISSING = object()
+
+
+class MemoryStats(NamedTuple):
+    """
+    The memory statistics of a budgeted container.
+
+    max_bytes: The budget.
+    used_bytes: The approximate size of the resident documents of every
+    container sharing the budget.
+    resident: The number of documents held in memory.
+    spilled: The number of documents held only in the spill file.
+    evictions: The number of documents evicted, by dropping or spilling.
+    spills: The number of documents written to the spill file.
+    faults: The number of spilled documents read back into memory.
+    """
+
+    max_bytes: int
+    used_bytes: int
+    resident: int
+    spilled: int
+    evictions: int
+    spills: int
+    faults: int
+
+
+class MemoryBudget:
+    """
+    A byte budget. A budget can be shared by several containers, for example
+    all containers of a database. A container only evicts its own documents,
+    and only while it uses more than its fair share of the budget, so a
+    shared budget can be exceeded until the containers over their share write
+    again.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Creates a MemoryBudget instance.
+        :param max_bytes: The approximate number of bytes resident documents may use.
+        """
+        ensure.greater_than_zero(
+            max_bytes,
+            errors.ObjectCreateError("Memory budget must be greater than zero."),
+        )
+
+        self.max_bytes = max_bytes
+        self._used = 0
+        self._stores = 0
+        self._lock = threading.Lock()
+
+    def register(self):
+        """
+        Counts a store sharing the budget.
+        """
+        with self._lock:
+            self._stores += 1
+
+    def unregister(self):
+        """
+        Stops counting a store sharing the budget.
+        """
+        with self._lock:
+            self._stores -= 1
+
+    def get_share(self) -> int:
+        """
+        Retrieves the fair share of each store sharing the budget.
+        :return: The number of bytes.
+        """
+        return self.max_bytes // max(1, self._stores)
+
+    def charge(self, amount: int):
+        """
+        Adds to, or with a negative amount releases from, the used bytes.
+        :param amount: The number of bytes.
+        """
+        with self._lock:
+            self._used += amount
+
+    def get_used(self) -> int:
+        """
+        Retrieves the used bytes.
+        :return: The approximate size of the resident documents.
+        """
+        return self._used
+
+    def is_exceeded(self) -> bool:
+        """
+        Checks whether the used bytes exceed the budget.
+        :return: True if the budget is exceeded, otherwise False.
+        """
+        return self._used > self.max_bytes
+
+
+def estimate_size(document: Document) -> int:
+    """
+    Estimates the memory a document uses, from the sizes of its objects. Values
+    shared between documents, such as small integers, are counted for each.
+    :param document: The document.
+    :return: The approximate size in bytes.
+    """
+    size = sys.getsizeof(document) + sys.getsizeof(document.get_id())
+    pending = [document.get_data()]
+
+    while pending:
+        value = pending.pop()
+        size += sys.getsizeof(value)
+
+        if isinstance(value, dict):
+            pending.extend(value)
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+
+    return size
+
+
+class SpillFile:
+    """
+    An append-only temporary file of encoded documents. The file is deleted
+    when it is closed or garbage collected.
+    """
+
+    def __init__(self, directory: Optional[str], codec: codecs.Codec):
+        """
+        Creates a SpillFile instance.
+        :param directory: The directory of the file. When not specified, the
+        system's temporary directory is used.
+        :param codec: The codec that encodes the documents.
+        """
+        handle, self._filename = tempfile.mkstemp(prefix="dockie-spill-", dir=directory)
+        self._file = os.fdopen(handle, "w+b")
+        self._finalizer = weakref.finalize(self, _delete, self._file, self._filename)
+        self._codec = codec
+        self.size = 0
+        self.garbage = 0
+
+    def write(self, data) -> Tuple[int, int]:
+        """
+        Appends a document.
+        :param data: The document data.
+        :return: The (offset, length) location of the record.
+        """
+        return self.write_raw(self._codec.encode(data))
+
+    def write_raw(self, payload: bytes) -> Tuple[int, int]:
+        """
+        Appends an encoded record.
+        :param payload: The record.
+        :return: The (offset, length) location of the record.
+        """
+        self._file.seek(self.size)
+        self._file.write(payload)
+        location = (self.size, len(payload))
+        self.size += len(payload)
+
+        return location
+
+    def read(self, location: Tuple[int, int]):
+        """
+        Reads a document.
+        :param location: The location of the record.
+        :return: The document data.
+        """
+        return self._codec.decode(self.read_raw(location))
+
+    def read_raw(self, location: Tuple[int, int]) -> bytes:
+        """
+        Reads an encoded record.
+        :param location: The location of the record.
+        :return: The record.
+        """
+        self._file.seek(location[0])
+
+        return self._file.read(location[1])
+
+    def release(self, location: Tuple[int, int]):
+        """
+        Marks a record as no longer used.
+        :param location: The location of the record.
+        """
+        self.garbage += location[1]
+
+    def close(self):
+        """
+        Closes and deletes the file.
+        """
+        self._finalizer()
+
+
+def _delete(file, filename: str):
+    file.close()
+
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+class BudgetedDocumentStore(MutableMapping):  # pylint: disable=too-many-instance-attributes
+    """
+    A mapping of document ids to documents that keeps its resident documents
+    within a memory budget. Writes and reads of spilled documents hold the
+    store's lock; reads of resident documents do not lock.
+
+    Eviction follows the CLOCK algorithm: the resident documents form a queue
+    in admission order, reading a document sets its reference bit, and the
+    oldest document is evicted unless its bit is set, in which case the bit is
+    cleared and the document goes to the back of the queue. A spilled document
+    that is read back keeps its record, so evicting it again costs no write
+    until it is replaced.
+    """
+
+    def __init__(
+        self,
+        memory_budget: MemoryBudget,
+        mode: str = DROP,
+        spill_directory: Optional[str] = None,
+        codec: str = codecs.PICKLE,
+    ):
+        """
+        Creates a BudgetedDocumentStore instance.
+        :param memory_budget: The budget.
+        :param mode: 'drop' to discard evicted documents, or 'spill' to write
+        them to a temporary file.
+        :param spill_directory: The directory of the spill file.
+        :param codec: The name of the codec that encodes spilled documents.
+        """
+        ensure.not_none(
+            memory_budget, errors.ObjectCreateError("Memory budget not specified.")
+        )
+
+        if mode not in (DROP, SPILL):
+            raise errors.ObjectCreateError(
+                f"Eviction mode '{mode}' is not supported. Supported modes are "
+                f"'{DROP}' and '{SPILL}'."
+            )
+
+        self._budget = memory_budget
+        self._mode = mode
+        self._spill_directory = spill_directory
+        self._codec = codecs.get_codec(codec)
+        self._spill = SpillFile(spill_directory, self._codec) if mode == SPILL else None
+        self._ids: Dict[object, None] = {}
+        self._resident: Dict[object, Document] = {}
+        self._sizes: Dict[object, int] = {}
+        self._used = 0
+        self._referenced = set()
+        self._spilled: Dict[object, Tuple[int, int]] = {}
+        self._dropped: List[Document] = []
+        self._evictions = 0
+        self._spills = 0
+        self._faults = 0
+        self._lock = threading.RLock()
+        memory_budget.register()
+        self._finalizer = weakref.finalize(self, memory_budget.unregister)
+
+    def __reduce__(self):
+        with self._lock:
+            return dict, ([(document_id, self._peek(document_id)) for document_id in self._ids],)
+
+    def __getitem__(self, document_id) -> Document:
+        document = self._resident.get(document_id)
+
+        if document is not None:
+            self._referenced.add(document_id)
+            return document
+
+        with self._lock:
+            return self._fault(document_id)
+
+    def get(self, key, default=None):
+        document = self._resident.get(key)
+
+        if document is not None:
+            self._referenced.add(key)
+            return document
+
+        if key not in self._ids:
+            return default
+
+        with self._lock:
+            try:
+                return self._fault(key)
+            except KeyError:
+                return default
+
+    def scan(self, document_id) -> Optional[Document]:
+        """
+        Retrieves a document for a scan over the container. Unlike get, the
+        document's reference bit is not set and a spilled document is read
+        without being admitted, so a scan does not evict the documents that
+        are read often.
+        :param document_id: The document id.
+        :return: The document, or None when it was not found.
+        """
+        document = self._resident.get(document_id)
+
+        if document is not None or document_id not in self._ids:
+            return document
+
+        with self._lock:
+            try:
+                return self._peek(document_id)
+            except KeyError:
+                return None
+
+    def get_many(self, document_ids: Iterable) -> List[Optional[Document]]:
+        """
+        Retrieves several documents while holding the lock once.
+        :param document_ids: The document ids.
+        :return: The documents in the order of the ids, with None for the ids
+        that were not found.
+        """
+        with self._lock:
+            return [
+                self._fault(document_id) if document_id in self._ids else None
+                for document_id in document_ids
+            ]
+
+    def __setitem__(self, document_id, document: Document):
+        with self._lock:
+            self._discard(document_id)
+            self._ids[document_id] = None
+            self._admit(document_id, document)
+            self._enforce()
+
+    def __delitem__(self, document_id):
+        with self._lock:
+            if document_id not in self._ids:
+                raise KeyError(document_id)
+
+            self._discard(document_id)
+            del self._ids[document_id]
+
+    def pop(self, key, default=_MISSING):
+        """
+        Removes a document without admitting it to the resident documents.
+        :param key: The document id.
+        :param default: The value returned when the id is not found.
+        :return: The document.
+        """
+        with self._lock:
+            if key not in self._ids:
+                if default is _MISSING:
+                    raise KeyError(key)
+
+                return default
+
+            document = self._peek(key)
+            self._discard(key)
+            del self._ids[key]
+
+            return document
+
+    def __iter__(self) -> Iterator:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, document_id) -> bool:
+        return document_id in self._ids
+
+    def pop_dropped(self) -> List[Document]:
+        """
+        Retrieves and forgets the documents dropped since the last call.
+        :return: The dropped documents.
+        """
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
+
+        return dropped
+
+    def get_stats(self) -> MemoryStats:
+        """
+        Retrieves the memory statistics.
+        :return: The statistics.
+        """
+        with self._lock:
+            return MemoryStats(
+                self._budget.max_bytes,
+                self._budget.get_used(),
+                len(self._resident),
+                len(self._ids) - len(self._resident),
+                self._evictions,
+                self._spills,
+                self._faults,
+            )
+
+    def close(self):
+        """
+        Releases the budget used by the resident documents and deletes the spill file.
+        """
+        with self._lock:
+            self._budget.charge(-self._used)
+            self._finalizer()
+            self._sizes.clear()
+            self._used = 0
+
+            if self._spill is not None:
+                self._spill.close()
+
+    def _fault(self, document_id) -> Document:
+        document = self._resident.get(document_id)
+
+        if document is not None:
+            self._referenced.add(document_id)
+            return document
+
+        location = self._spilled.get(document_id)
+
+        if location is None:
+            raise KeyError(document_id)
+
+        document = Document.from_validated(document_id, self._spill.read(location))
+        self._faults += 1
+
+        collector = instrumentation.ACTIVE
+
+        if collector is not None:
+            collector.increment("memory.faults")
+
+        self._admit(document_id, document)
+        self._enforce()
+
+        return document
+
+    def _peek(self, document_id) -> Document:
+        document = self._resident.get(document_id)
+
+        if document is None:
+            document = Document.from_validated(
+                document_id, self._spill.read(self._spilled[document_id])
+            )
+
+        return document
+
+    def _admit(self, document_id, document: Document):
+        size = estimate_size(document)
+        self._resident[document_id] = document
+        self._sizes[document_id] = size
+        self._referenced.discard(document_id)
+        self._used += size
+        self._budget.charge(size)
+
+    def _discard(self, document_id):
+        if self._resident.pop(document_id, None) is not None:
+            self._release(document_id)
+
+        self._referenced.discard(document_id)
+        location = self._spilled.pop(document_id, None)
+
+        if location is not None:
+            self._spill.release(location)
+
+    def _enforce(self):
+        evicted = 0
+        share = self._budget.get_share()
+
+        while self._budget.is_exceeded() and self._used > share and self._resident:
+            document_id = next(iter(self._resident))
+            document = self._resident.pop(document_id)
+
+            if document_id in self._referenced:
+                self._referenced.discard(document_id)
+                self._resident[document_id] = document
+                continue
+
+            self._release(document_id)
+            evicted += 1
+
+            if self._mode == DROP:
+                del self._ids[document_id]
+                self._dropped.append(document)
+            elif document_id not in self._spilled:
+                self._spilled[document_id] = self._spill.write(document.get_data())
+                self._spills += 1
+
+        if evicted:
+            self._evictions += evicted
+
+            collector = instrumentation.ACTIVE
+
+            if collector is not None:
+                collector.increment("memory.evictions", evicted)
+
+            if self._spill is not None:
+                self._compact()
+
+    def _release(self, document_id):
+        size = self._sizes.pop(document_id)
+        self._used -= size
+        self._budget.charge(-size)
+
+    def _compact(self):
+        if self._spill.garbage < _COMPACT_BYTES or self._spill.garbage < (
+            self._spill.size - self._spill.garbage
+        ):
+            return
+
+        old = self._spill
+        self._spill = SpillFile(self._spill_directory, self._codec)
+
+        for document_id, location in self._spilled.items():
+            self._spilled[document_id] = self._spill.write_raw(old.read_raw(location))
+
+        old.close()
@@ -0,0 +1,306 @@
+"""
+Codecs module. A codec turns plain values (dicts, lists, strings, numbers,
+booleans and None) into bytes and back, and a compression turns bytes into
+smaller bytes and back. Persistence looks both up by name, so files record
+which codec and compression they were written with.
+
+msgpack and lz4 are optional dependencies; install them with
+'pip install tq-dockie-db[codecs]'.
+"""
+import json
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from dockie.core import ensure, errors
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+PICKLE = "pickle"
+JSON = "json"
+MSGPACK = "msgpack"
+
+# The codec files are written with unless another is specified. Loading it
+# cannot run code, and unlike msgpack it has no optional dependency.
+DEFAULT = JSON
+
+ZLIB = "zlib"
+LZ4 = "lz4"
+
+# Files record the codec and compression names in fields of this many bytes.
+MAX_NAME_BYTES = 16
+
+
+class Codec(ABC):
+    """
+    Base class of codecs. A codec has a name and a version, which are recorded
+    in the files it writes. Increase the version when the encoding changes in a
+    way older readers cannot decode.
+    """
+
+    name: str = ""
+    version: int = 1
+
+    @abstractmethod
+    def encode(self, value) -> bytes:  # pragma: no cover
+        """
+        Encodes a value.
+        :param value: The value.
+        :return: The encoded bytes.
+        """
+
+    @abstractmethod
+    def decode(self, payload: bytes):  # pragma: no cover
+        """
+        Decodes a value.
+        :param payload: The encoded bytes.
+        :return: The value.
+        """
+
+    def is_available(self) -> bool:
+        """
+        Checks whether the codec's dependencies are installed.
+        :return: True if the codec can be used, otherwise False.
+        """
+        return True
+
+
+class PickleCodec(Codec):
+    """
+    Encodes values with pickle. Any picklable value is supported, but pickle
+    files must only be loaded from trusted sources.
+    """
+
+    name = PICKLE
+
+    def encode(self, value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, payload: bytes):
+        return pickle.loads(payload)
+
+
+class JsonCodec(Codec):
+    """
+    Encodes values as UTF-8 JSON. Tuples are decoded as lists and dict keys
+    are decoded as strings.
+    """
+
+    name = JSON
+
+    def encode(self, value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, payload: bytes):
+        return json.loads(payload)
+
+
+class MsgpackCodec(Codec):
+    """
+    Encodes values with msgpack, a compact binary format. Tuples are decoded
+    as lists; dict keys keep their types.
+    """
+
+    name = MSGPACK
+
+    def encode(self, value) -> bytes:
+        _require(msgpack, MSGPACK)
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, payload: bytes):
+        _require(msgpack, MSGPACK)
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+    def is_available(self) -> bool:
+        return msgpack is not None
+
+
+class Compression(ABC):
+    """
+    Base class of compressions.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def compress(self, payload: bytes) -> bytes:  # pragma: no cover
+        """
+        Compresses bytes.
+        :param payload: The bytes.
+        :return: The compressed bytes.
+        """
+
+    @abstractmethod
+    def decompress(self, payload: bytes) -> bytes:  # pragma: no cover
+        """
+        Decompresses bytes.
+        :param payload: The compressed bytes.
+        :return: The bytes.
+        """
+
+    def is_available(self) -> bool:
+        """
+        Checks whether the compression's dependencies are installed.
+        :return: True if the compression can be used, otherwise False.
+        """
+        return True
+
+
+class ZlibCompression(Compression):
+    """
+    Compresses with zlib.
+    """
+
+    name = ZLIB
+
+    def __init__(self, level: int = 6):
+        """
+        Creates a ZlibCompression instance.
+        :param level: The compression level, from 0 (none) to 9 (smallest).
+        """
+        self._level = level
+
+    def compress(self, payload: bytes) -> bytes:
+        return zlib.compress(payload, self._level)
+
+    def decompress(self, payload: bytes) -> bytes:
+        return zlib.decompress(payload)
+
+
+class Lz4Compression(Compression):
+    """
+    Compresses with the LZ4 frame format, which trades size for speed.
+    """
+
+    name = LZ4
+
+    def compress(self, payload: bytes) -> bytes:
+        _require(lz4_frame, LZ4)
+        return lz4_frame.compress(payload)
+
+    def decompress(self, payload: bytes) -> bytes:
+        _require(lz4_frame, LZ4)
+        return lz4_frame.decompress(payload)
+
+    def is_available(self) -> bool:
+        return lz4_frame is not None
+
+
+_codecs: Dict[str, Codec] = {}
+_compressions: Dict[str, Compression] = {}
+
+
+def register_codec(codec: Codec):
+    """
+    Registers a codec, replacing any codec registered under the same name.
+    Names are limited to MAX_NAME_BYTES bytes of UTF-8.
+    :param codec: The codec.
+    """
+    ensure.not_none(codec, errors.PersistenceError("Codec cannot be of type None."))
+    ensure.not_none_or_whitespace(
+        codec.name, errors.PersistenceError("Codec name not specified.")
+    )
+    _ensure_name_fits(codec.name, "Codec")
+    _codecs[codec.name] = codec
+
+
+def register_compression(compression: Compression):
+    """
+    Registers a compression, replacing any compression registered under the same name.
+    Names are limited to MAX_NAME_BYTES bytes of UTF-8.
+    :param compression: The compression.
+    """
+    ensure.not_none(
+        compression, errors.PersistenceError("Compression cannot be of type None.")
+    )
+    ensure.not_none_or_whitespace(
+        compression.name, errors.PersistenceError("Compression name not specified.")
+    )
+    _ensure_name_fits(compression.name, "Compression")
+    _compressions[compression.name] = compression
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Retrieves a registered codec.
+    :param name: The codec name.
+    :return: The codec.
+    """
+    codec = _codecs.get(name)
+
+    if codec is None:
+        raise errors.PersistenceError(
+            f"Codec '{name}' is not supported. "
+            f"Supported codecs are {', '.join(sorted(_codecs))}."
+        )
+
+    return codec
+
+
+def get_compression(name: Optional[str]) -> Optional[Compression]:
+    """
+    Retrieves a registered compression.
+    :param name: The compression name. When None, no compression is used.
+    :return: The compression, or None when the name is None.
+    """
+    if name is None:
+        return None
+
+    compression = _compressions.get(name)
+
+    if compression is None:
+        raise errors.PersistenceError(
+            f"Compression '{name}' is not supported. "
+            f"Supported compressions are {', '.join(sorted(_compressions))}."
+        )
+
+    return compression
+
+
+def list_codecs() -> List[str]:
+    """
+    Lists the registered codecs whose dependencies are installed.
+    :return: The codec names.
+    """
+    return [name for name, codec in _codecs.items() if codec.is_available()]
+
+
+def list_compressions() -> List[str]:
+    """
+    Lists the registered compressions whose dependencies are installed.
+    :return: The compression names.
+    """
+    return [
+        name for name, compression in _compressions.items() if compression.is_available()
+    ]
+
+
+def _ensure_name_fits(name: str, kind: str):
+    if len(name.encode("utf-8")) > MAX_NAME_BYTES:
+        raise errors.PersistenceError(
+            f"{kind} name '{name}' is longer than {MAX_NAME_BYTES} bytes, the "
+            f"length files record."
+        )
+
+
+def _require(module, name: str):
+    if module is None:
+        raise errors.PersistenceError(
+            f"'{name}' is not installed. Install it with 'pip install {name}'."
+        )
+
+
+for _codec in (PickleCodec(), JsonCodec(), MsgpackCodec()):
+    register_codec(_codec)
+
+for _compression in (ZlibCompression(), Lz4Compression()):
+    register_compression(_compression)
@@ -0,0 +1,334 @@
+"""
+Columnar projection module. A column store keeps the values of declared scalar
+fields in NumPy arrays aligned with document positions, so comparisons and
+aggregates over those fields can be evaluated as vectorized operations.
+NumPy is an optional dependency; install it with 'pip install tq-dockie-db[columnar]'.
+"""
+import operator
+from typing import Dict, Iterable, List, Optional
+
+from dockie.core import errors
+from dockie.core.index import extract_values
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+AGGREGATES = ("count", "sum", "min", "max", "mean")
+
+_MAX_EXACT_INTEGER = 2 ** 53
+
+# Columns are not compacted for fewer removed positions than this.
+_MIN_COMPACT = 64
+
+
+def is_available() -> bool:
+    """
+    Checks whether NumPy is installed.
+    :return: True if columns can be declared, otherwise False.
+    """
+    return np is not None
+
+
+class ColumnStore:
+    """
+    Holds the columns of a container. Every document has a position that is
+    assigned when it is first stored, so positions follow insertion order. The
+    positions of removed documents are reclaimed by compacting the columns once
+    they outnumber the live ones, which keeps the order of the others.
+
+    A column value is stored when the path holds exactly one number. Documents
+    without a value at the path are recorded as missing, which never satisfies a
+    comparison. Any other value, such as a string or a list, is recorded as a
+    fallback and such documents are evaluated one at a time.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise errors.ObjectCreateError(
+                "Columns require NumPy. Install it with 'pip install numpy'."
+            )
+
+        self._positions: Dict[object, int] = {}
+        self._ids: List = []
+        self._removed = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._values: Dict[str, "np.ndarray"] = {}
+        self._present: Dict[str, "np.ndarray"] = {}
+        self._fallback: Dict[str, "np.ndarray"] = {}
+
+    @classmethod
+    def from_description(cls, description: dict) -> "ColumnStore":
+        """
+        Creates a column store from a description written by describe, without
+        the documents.
+        :param description: The description.
+        :return: The column store.
+        """
+        store = cls()
+        store._ids = list(description["ids"])
+        store._positions = {
+            document_id: position for position, document_id in enumerate(store._ids)
+        }
+        store._alive = np.ones(len(store._ids), dtype=bool)
+
+        for path, column in description["columns"].items():
+            store._values[path] = np.array(column["values"], dtype=np.float64)
+            store._present[path] = np.array(column["present"], dtype=bool)
+            store._fallback[path] = np.array(column["fallback"], dtype=bool)
+
+        return store
+
+    def describe(self) -> dict:
+        """
+        Describes the columns of the live documents as plain values that any
+        codec can encode.
+        :return: The document ids in position order and the values of every column.
+        """
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+
+        return {
+            "ids": [self._ids[position] for position in live],
+            "columns": {
+                path: {
+                    "values": values[live].tolist(),
+                    "present": self._present[path][live].tolist(),
+                    "fallback": self._fallback[path][live].tolist(),
+                }
+                for path, values in self._values.items()
+            },
+        }
+
+    def list_columns(self) -> List[str]:
+        """
+        Lists the columns.
+        :return: The column paths.
+        """
+        return list(self._values.keys())
+
+    def has_column(self, path: str) -> bool:
+        """
+        Checks whether a path is stored as a column.
+        :param path: The dotted attribute path.
+        :return: True if the path is a column, otherwise False.
+        """
+        return path in self._values
+
+    def add_column(self, path: str, documents: Iterable[tuple]):
+        """
+        Adds a column and fills it from the existing documents.
+        :param path: The dotted attribute path.
+        :param documents: The (document_id, data) pairs of the existing documents.
+        """
+        capacity = len(self._alive)
+        self._values[path] = np.zeros(capacity, dtype=np.float64)
+        self._present[path] = np.zeros(capacity, dtype=bool)
+        self._fallback[path] = np.zeros(capacity, dtype=bool)
+
+        for document_id, data in documents:
+            self._set_cell(path, self._position(document_id), data)
+
+    def set(self, document_id, data):
+        """
+        Stores the column values of a document.
+        :param document_id: The document id.
+        :param data: The document data.
+        """
+        position = self._position(document_id)
+
+        for path in self._values:
+            self._set_cell(path, position, data)
+
+    def remove(self, document_id):
+        """
+        Removes a document from the columns.
+        :param document_id: The document id.
+        """
+        position = self._positions.pop(document_id, None)
+
+        if position is None:
+            return
+
+        self._alive[position] = False
+
+        for path in self._values:
+            self._present[path][position] = False
+            self._fallback[path][position] = False
+
+        self._removed += 1
+
+        if self._removed >= _MIN_COMPACT and self._removed > len(self._positions):
+            self._compact()
+
+    def compare(self, path: str, comparison: str, value) -> "np.ndarray":
+        """
+        Evaluates a comparison against a column.
+        :param path: The column path.
+        :param comparison: One of '==', '!=', '<', '<=', '>' or '>='.
+        :param value: The number to compare with.
+        :return: A mask of the positions whose value satisfies the comparison.
+        """
+        size = len(self._ids)
+
+        return self._present[path][:size] & COMPARISONS[comparison](
+            self._values[path][:size], value
+        )
+
+    def isin(self, path: str, values: list) -> "np.ndarray":
+        """
+        Evaluates an IN comparison against a column.
+        :param path: The column path.
+        :param values: The numbers to look for.
+        :return: A mask of the positions whose value is one of the numbers.
+        """
+        size = len(self._ids)
+
+        return self._present[path][:size] & np.isin(self._values[path][:size], values)
+
+    def fallback(self, paths: Iterable[str]) -> "np.ndarray":
+        """
+        Retrieves the positions that must be evaluated one document at a time.
+        :param paths: The column paths.
+        :return: A mask of the live positions holding a fallback value in any of the paths.
+        """
+        size = len(self._ids)
+        mask = np.zeros(size, dtype=bool)
+
+        for path in paths:
+            mask |= self._fallback[path][:size]
+
+        return mask & self._alive[:size]
+
+    def live(self) -> "np.ndarray":
+        """
+        Retrieves the live positions.
+        :return: A mask of the positions holding a document.
+        """
+        return self._alive[:len(self._ids)].copy()
+
+    def ids(self, mask: "np.ndarray") -> list:
+        """
+        Retrieves the document ids at the positions of a mask, in position order.
+        :param mask: The mask.
+        :return: The document ids.
+        """
+        return [self._ids[position] for position in np.flatnonzero(mask)]
+
+    def mask_of(self, document_ids: Iterable) -> "np.ndarray":
+        """
+        Builds a mask from document ids.
+        :param document_ids: The document ids.
+        :return: A mask of the positions of the documents.
+        """
+        mask = np.zeros(len(self._ids), dtype=bool)
+        positions = [
+            self._positions[document_id]
+            for document_id in document_ids
+            if document_id in self._positions
+        ]
+        mask[positions] = True
+        return mask
+
+    def aggregate(self, path: str, function: str, mask: "np.ndarray" = None):
+        """
+        Computes an aggregate over a column.
+        :param path: The column path.
+        :param function: One of 'count', 'sum', 'min', 'max' or 'mean'.
+        :param mask: When specified, only the positions in the mask are aggregated.
+        :return: The aggregate. The minimum, maximum and mean of no values are None.
+        """
+        if function not in AGGREGATES:
+            raise errors.QueryError(
+                f"Aggregate '{function}' is not supported. "
+                f"Supported aggregates are {', '.join(AGGREGATES)}."
+            )
+
+        size = len(self._ids)
+        selected = self._present[path][:size] & self._alive[:size]
+
+        if mask is not None:
+            selected &= mask
+
+        values = self._values[path][:size][selected]
+
+        if function == "count":
+            return int(values.size)
+
+        if function == "sum":
+            return float(values.sum())
+
+        if not values.size:
+            return None
+
+        return float(getattr(values, function)())
+
+    def _position(self, document_id) -> int:
+        position = self._positions.get(document_id)
+
+        if position is not None:
+            return position
+
+        position = len(self._ids)
+
+        if position == len(self._alive):
+            self._grow(max(16, position * 2))
+
+        self._positions[document_id] = position
+        self._ids.append(document_id)
+        self._alive[position] = True
+
+        return position
+
+    def _grow(self, capacity: int):
+        self._alive = _resized(self._alive, capacity)
+
+        for path in self._values:
+            self._values[path] = _resized(self._values[path], capacity)
+            self._present[path] = _resized(self._present[path], capacity)
+            self._fallback[path] = _resized(self._fallback[path], capacity)
+
+    def _compact(self):
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+        self._ids = [self._ids[position] for position in live]
+        self._positions = {document_id: position for position, document_id in enumerate(self._ids)}
+        self._removed = 0
+        self._alive = _resized(self._alive[live], max(16, len(live) * 2))
+
+        for path in self._values:
+            self._values[path] = _resized(self._values[path][live], len(self._alive))
+            self._present[path] = _resized(self._present[path][live], len(self._alive))
+            self._fallback[path] = _resized(self._fallback[path][live], len(self._alive))
+
+    def _set_cell(self, path: str, position: int, data):
+        values = extract_values(data, path)
+        value = _scalar(values)
+
+        self._values[path][position] = 0.0 if value is None else value
+        self._present[path][position] = value is not None
+        self._fallback[path][position] = value is None and bool(values)
+
+
+def _scalar(values: list) -> Optional[float]:
+    if len(values) != 1 or not isinstance(values[0], (int, float)):
+        return None
+
+    if isinstance(values[0], int) and abs(values[0]) > _MAX_EXACT_INTEGER:
+        return None
+
+    return float(values[0])
+
+
+def _resized(array: "np.ndarray", capacity: int) -> "np.ndarray":
+    resized = np.zeros(capacity, dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
@@ -1,59 +1,642 @@
 """
 Document container module.
 """
-from typing import Dict
+import time
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Type,
+)
 
-from dockie.core import errors, ensure
-from dockie.core.document import Document, NoneDocument
+from dockie.core import (
+    budget,
+    columns,
+    errors,
+    ensure,
+    events,
+    expiry,
+    features,
+    index,
+    instrumentation,
+    jsonl,
+)
+from dockie.core.locks import ReadWriteLock
+from dockie.core.document import NONE_DOCUMENT, Document
 
 
-class Container:
+class BulkLoadResult(NamedTuple):
+    """
+    The outcome of a bulk load.
+    """
+
+    inserted: int
+    replaced: int
+
+
+class Container(
+    features.ResultCacheMixin,
+    features.ChangeFeedMixin,
+    features.ExpiryMixin,
+    features.MemoryBudgetMixin,
+    events.Observable,
+):
     """
     Document container class. A document container holds documents.
+
+    A container is safe to use from multiple threads. Writers hold the container's
+    readers-writer lock exclusively, while scans hold it only long enough to take
+    a snapshot of the documents, so a long scan never blocks writers. Point reads
+    of a dict-backed container do not lock at all.
+
+    Documents can be given a time to live once expiry is enabled. Reads and
+    queries treat expired documents as missing, and a background sweeper
+    removes them; until then they are still counted by count_documents.
+
+    A memory budget keeps the resident documents within an approximate number
+    of bytes by dropping cold documents or spilling them to disk.
     """
-    def __init__(self, name):
+    def __init__(
+        self,
+        name,
+        documents: MutableMapping = None,
+        indexes: Iterable[index.Index] = None,
+        column_store: columns.ColumnStore = None,
+        expiry_queue: expiry.ExpiryQueue = None,
+    ):
         """
         Creates a new Container instance.
         :param name: The container name.
+        :param documents: The mapping of document ids to documents backing the
+        container. When not specified, the documents are held in a dict.
+        :param indexes: Indexes that are already populated with the documents.
+        :param column_store: A column store that is already populated with the documents.
+        :param expiry_queue: An expiry queue that already tracks the documents.
+        When specified, expiry is enabled with the queue's settings.
         """
         ensure.not_none_or_whitespace(
             name, errors.ObjectCreateError("Container name not specified.")
         )
 
+        super().__init__()
         self._name = name
-        self._documents: Dict[str, Document] = {}
+        self._documents: MutableMapping = {} if documents is None else documents
+        self._indexes: Dict[str, index.Index] = {
+            document_index.get_path(): document_index
+            for document_index in indexes or ()
+        }
+        self._columns: Optional[columns.ColumnStore] = column_store
+        self._version = 0
+        self._features = features.ContainerFeatures(expiry_queue)
+        self._lock = ReadWriteLock()
+
+        if expiry_queue is not None:
+            self._features.start_sweeper([self], expiry_queue.sweep_interval)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        # Containers pickled before the features were grouped kept them apart.
+        expiry_queue = state.pop("_expiry", None)
+
+        for name in ("_result_cache", "_sweeper", "_budget", "_feed"):
+            state.pop(name, None)
+
+        super().__setstate__(state)
+        self.__dict__.setdefault("_indexes", {})
+        self.__dict__.setdefault("_columns", None)
+        self.__dict__.setdefault("_version", 0)
+        self.__dict__.setdefault("_features", features.ContainerFeatures(expiry_queue))
+        self._lock = ReadWriteLock()
+
+    def get_lock(self) -> ReadWriteLock:
+        """
+        Retrieves the readers-writer lock guarding the container.
+        :return: The lock.
+        """
+        return self._lock
+
+    def get_name(self) -> str:
+        """
+        Retrieves the container name.
+        :return: The container name.
+        """
+        return self._name
 
     def list_documents(self):
         """
         Lists the documents in the container.
         :return: The id's of the documents in the container.
         """
-        return list(self._documents.keys())
+        with self._lock.read():
+            queue = self._features.expiry
+
+            if queue is None:
+                return list(self._documents.keys())
+
+            now = time.time()
+
+            return [
+                document_id
+                for document_id in self._documents.keys()
+                if not queue.is_expired(document_id, now)
+            ]
+
+    def count_documents(self) -> int:
+        """
+        Counts the documents in the container.
+        :return: The number of documents.
+        """
+        return len(self._documents)
+
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        Iterates over the documents in the container in insertion order. The
+        iterator walks a snapshot taken when it is created, so the container may
+        be changed while iterating and documents added later are not included.
+        :return: An iterator over the documents.
+        """
+        with self._lock.read():
+            queue = self._features.expiry
+
+            if queue is not None:
+                return self._iter_unexpired(list(self._documents), queue)
+
+            if isinstance(self._documents, dict):
+                return iter(list(self._documents.values()))
+
+            document_ids = list(self._documents)
+
+        return self._iter_by_id(document_ids)
+
+    def _iter_by_id(self, document_ids: list) -> Iterator[Document]:
+        for document_id in document_ids:
+            document = self._scan(document_id)
+
+            if document is not None:
+                yield document
+
+    def _iter_unexpired(
+        self, document_ids: list, queue: expiry.ExpiryQueue
+    ) -> Iterator[Document]:
+        for document_id in document_ids:
+            document = self._scan(document_id)
+
+            if document is not None and not queue.is_expired(document_id):
+                yield document
+
+    def _scan(self, document_id) -> Optional[Document]:
+        # Scans read through a memory budget without marking documents as
+        # recently used or reading spilled documents back into memory.
+        documents = self._documents
+
+        if isinstance(documents, budget.BudgetedDocumentStore):
+            return documents.scan(document_id)
+
+        return documents.get(document_id)
 
-    def add_document(self, document: Document):
+    def add_document(self, document: Document, ttl: Optional[float] = None):
         """
-        Adds a document to the container.
+        Adds a document to the container. A document with the same id is replaced.
         :param document: The document to add.
+        :param ttl: The number of seconds the document lives. When not specified,
+        the container's default time to live, if any, is used. Requires expiry
+        to be enabled, see enable_expiry.
         """
         ensure.not_none(
             document, errors.ObjectCreateError("Document cannot be of type None.")
         )
+
+        deadline = None
+
+        if ttl is not None or self._features.expiry is not None:
+            deadline = self._deadline(ttl)
+
+        collector = instrumentation.ACTIVE
+
+        if collector is None:
+            with self._lock.write():
+                self._store(document, deadline)
+        else:
+            with collector.timer("container.add_document"), self._lock.write():
+                self._store(document, deadline)
+
+    @instrumentation.timed("container.add_documents")
+    def add_documents(
+        self,
+        documents: Iterable,
+        batch_size: int = 1000,
+        progress: Callable[[int], None] = None,
+        ttl: Optional[float] = None,
+    ) -> BulkLoadResult:
+        """
+        Adds many documents to the container. Documents are validated and inserted
+        a batch at a time, so a batch containing an invalid document is not inserted.
+        :param documents: The documents to add. Each item is either a Document or
+        a (document_id, data) tuple, which is stored without building an
+        intermediate Document.
+        :param batch_size: The number of documents validated and inserted at a time.
+        :param progress: A callable called after every batch with the number of
+        documents added so far.
+        :param ttl: The number of seconds each document lives, see add_document.
+        :return: The number of inserted and replaced documents.
+        """
+        ensure.not_none(
+            documents, errors.ObjectCreateError("Documents cannot be of type None.")
+        )
+        ensure.greater_than_zero(
+            batch_size, errors.ObjectCreateError("Batch size must be greater than zero.")
+        )
+
+        if ttl is not None:
+            self._deadline(ttl)
+
+        inserted = 0
+        replaced = 0
+        items = iter(documents)
+
+        for batch in iter(lambda: list(islice(items, batch_size)), []):
+            batch = to_documents(batch)
+            deadline = None
+
+            if ttl is not None or self._features.expiry is not None:
+                deadline = self._deadline(ttl)
+
+            with self._lock.write():
+                batch_inserted, batch_replaced = self._store_batch(batch, deadline)
+
+            inserted += batch_inserted
+            replaced += batch_replaced
+
+            if progress is not None:
+                progress(inserted + replaced)
+
+        return BulkLoadResult(inserted, replaced)
+
+    @instrumentation.timed("container.export_jsonl")
+    def export_jsonl(self, filename: str, overwrite=False) -> int:
+        """
+        Exports the documents to a JSON Lines file, one '{"id": ..., "data": ...}'
+        object per line. Documents are written one at a time from a snapshot of
+        the container, so writers are not blocked during the export.
+        :param filename: The file name.
+        :param overwrite: When True and the file exists, the file is overwritten.
+        When False and the file exists, an error is raised.
+        :return: The number of exported documents.
+        """
+        return jsonl.write_records(
+            filename,
+            (
+                {"id": document.get_id(), "data": document.get_data()}
+                for document in self.iter_documents()
+            ),
+            overwrite,
+        )
+
+    @instrumentation.timed("container.import_jsonl")
+    def import_jsonl(
+        self,
+        filename: str,
+        batch_size: int = 1000,
+        progress: Callable[[int], None] = None,
+    ) -> BulkLoadResult:
+        """
+        Imports documents from a JSON Lines file written by export_jsonl. The file
+        is read a line at a time and the documents are added a batch at a time,
+        see add_documents.
+        :param filename: The file name.
+        :param batch_size: The number of documents added at a time.
+        :param progress: A callable called after every batch with the number of
+        documents imported so far.
+        :return: The number of inserted and replaced documents.
+        """
+        return self.add_documents(
+            (
+                (record["id"], record["data"])
+                for record in jsonl.read_records(filename, ("id", "data"))
+            ),
+            batch_size,
+            progress,
+        )
+
+    def _store(self, document: Document, deadline: Optional[float] = None):
+        container_features = self._features
+        previous = self._documents.get(document.get_id())
         self._documents[document.get_id()] = document
+        self._version += 1
+
+        for document_index in self._indexes.values():
+            document_index.add(document.get_id(), document.get_data())
+
+        if self._columns is not None:
+            self._columns.set(document.get_id(), document.get_data())
+
+        if container_features.expiry is not None:
+            container_features.expiry.set(document.get_id(), deadline)
+
+        if self._listeners:
+            self._notify(
+                events.Mutation(
+                    events.INSERT if previous is None else events.REPLACE,
+                    self,
+                    document,
+                    previous,
+                )
+            )
+
+        if container_features.budget is not None:
+            self._release_dropped()
+
+    def _store_batch(
+        self, documents: List[Document], deadline: Optional[float] = None
+    ) -> tuple:
+        if self._indexes or self._listeners or self._columns is not None:
+            # Counted per document, as a drop-mode memory budget may evict
+            # documents while the batch is stored.
+            inserted = 0
+
+            for document in documents:
+                if document.get_id() not in self._documents:
+                    inserted += 1
+
+                self._store(document, deadline)
+
+            return inserted, len(documents) - inserted
+
+        batch = {}
+        replaced = 0
+
+        for document in documents:
+            document_id = document.get_id()
+
+            if document_id in batch or document_id in self._documents:
+                replaced += 1
+
+            batch[document_id] = document
+
+        self._documents.update(batch)
+        self._version += len(documents)
+        queue = self._features.expiry
+
+        if queue is not None:
+            for document_id in batch:
+                queue.set(document_id, deadline)
+
+        if self._features.budget is not None:
+            self._release_dropped()
+
+        return len(documents) - replaced, replaced
 
     def get_document(self, document_id) -> Document:
         """
         Retrieves a document by its id.
         :param document_id: The document id.
-        :return: The document. If the document was not found,
-        a NoneDocument instance is returned instead.
+        :return: The document. If the document was not found, the shared
+        NONE_DOCUMENT instance is returned instead.
         """
-        ensure.id_specified(
-            document_id, errors.ObjectReadError("Document id not specified.")
-        )
+        id_type = type(document_id)
+
+        if id_type is not int and (id_type is not str or not document_id.strip()):
+            ensure.id_specified(
+                document_id, errors.ObjectReadError("Document id not specified.")
+            )
 
         document = self._documents.get(document_id)
+        queue = self._features.expiry
+
+        if queue is not None and document is not None and queue.is_expired(document_id):
+            document = None
+
+        collector = instrumentation.ACTIVE
+
+        if collector is not None:
+            collector.increment(
+                "container.get_document.misses"
+                if document is None
+                else "container.get_document.hits"
+            )
+
+        return NONE_DOCUMENT if document is None else document
+
+    def get_documents(self, document_ids: Iterable) -> List[Document]:
+        """
+        Retrieves several documents by their ids. The ids are validated as a
+        whole before any document is read, unless they are a DocumentIds
+        instance, see validate_ids.
+        :param document_ids: The document ids.
+        :return: The documents in the order of the ids. Each id that was not
+        found is marked by the shared NONE_DOCUMENT instance.
+        """
+        document_ids = validate_ids(document_ids)
+
+        if isinstance(self._documents, dict):
+            found = list(map(self._documents.get, document_ids))
+        elif hasattr(self._documents, "get_many"):
+            found = self._documents.get_many(document_ids)
+        else:
+            found = [self._documents.get(document_id) for document_id in document_ids]
+
+        queue = self._features.expiry
+
+        if queue is not None:
+            now = time.time()
+            found = [
+                None
+                if document is not None and queue.is_expired(document_id, now)
+                else document
+                for document_id, document in zip(document_ids, found)
+            ]
+
+        misses = found.count(None)
+
+        collector = instrumentation.ACTIVE
+
+        if collector is not None:
+            collector.increment("container.get_documents.hits", len(found) - misses)
+            collector.increment("container.get_documents.misses", misses)
+
+        if not misses:
+            return found
+
+        return [NONE_DOCUMENT if document is None else document for document in found]
+
+    @instrumentation.timed("container.add_index")
+    def add_index(self, path: str, index_type: str = index.HASH):
+        """
+        Adds a secondary index on a dotted attribute path, such as 'bio.name'.
+        Existing documents are indexed immediately.
+        :param path: The dotted attribute path to index.
+        :param index_type: The index type. A 'hash' index answers equality
+        queries. A 'sorted' index answers equality and range queries.
+        """
+        ensure.not_none_or_whitespace(
+            path, errors.ObjectCreateError("Index path not specified.")
+        )
+
+        document_index = index.create_index(path, index_type)
+
+        with self._lock.write():
+            if path in self._indexes:
+                raise errors.ObjectCreateError(
+                    f"An index on '{path}' already exists. "
+                    f"Only one index per attribute path is supported."
+                )
+
+            for document_id, document in self._documents.items():
+                document_index.add(document_id, document.get_data())
+
+            self._indexes[path] = document_index
+
+    def list_indexes(self) -> List[str]:
+        """
+        Lists the secondary indexes in the container.
+        :return: The indexed attribute paths.
+        """
+        return list(self._indexes.keys())
+
+    def get_index(self, path: str) -> Optional[index.Index]:
+        """
+        Retrieves the secondary index on an attribute path.
+        :param path: The dotted attribute path.
+        :return: The index, or None when the path is not indexed.
+        """
+        return self._indexes.get(path)
+
+    @instrumentation.timed("container.add_column")
+    def add_column(self, path: str):
+        """
+        Adds a columnar projection of a scalar numeric field, such as 'price'.
+        Comparisons and aggregates over columns are evaluated with NumPy.
+        Existing documents are projected immediately.
+        :param path: The dotted attribute path.
+        """
+        ensure.not_none_or_whitespace(
+            path, errors.ObjectCreateError("Column path not specified.")
+        )
+
+        with self._lock.write():
+            if self._columns is None:
+                self._columns = columns.ColumnStore()
+
+            if self._columns.has_column(path):
+                raise errors.ObjectCreateError(f"A column on '{path}' already exists.")
+
+            self._columns.add_column(
+                path,
+                (
+                    (document_id, document.get_data())
+                    for document_id, document in self._documents.items()
+                ),
+            )
+
+    def list_columns(self) -> List[str]:
+        """
+        Lists the columnar projections in the container.
+        :return: The column paths.
+        """
+        return [] if self._columns is None else self._columns.list_columns()
+
+    def get_column_store(self) -> Optional[columns.ColumnStore]:
+        """
+        Retrieves the container's column store.
+        :return: The column store, or None when no columns were added.
+        """
+        return self._columns
+
+    def get_version(self) -> int:
+        """
+        Retrieves the container version. The version increases with every
+        document written, so an unchanged version means unchanged documents.
+        :return: The container version.
+        """
+        return self._version
+
+    def _unlink(self, document: Document, kind: str):
+        document_id = document.get_id()
+        self._version += 1
+
+        for document_index in self._indexes.values():
+            document_index.remove(document_id)
+
+        if self._columns is not None:
+            self._columns.remove(document_id)
+
+        if self._listeners:
+            self._notify(events.Mutation(kind, self, document))
+
+
+class DocumentIds(list):
+    """
+    A list of document ids that passed validate_ids. Reads are given the ids
+    of a DocumentIds instance without validating them again.
+    """
+
+
+def validate_ids(
+    document_ids: Iterable, error_type: Type[errors.DockieError] = errors.ObjectReadError
+) -> DocumentIds:
+    """
+    Validates the document ids of a read, see Container.get_documents. Ids
+    that were already validated are returned as they are.
+    :param document_ids: The document ids.
+    :param error_type: The type of the error raised when an id is not specified.
+    :return: The validated document ids.
+    """
+    if isinstance(document_ids, DocumentIds):
+        return document_ids
+
+    return _validate_ids(document_ids, error_type)
+
+
+@instrumentation.timed("container.validate_ids")
+def _validate_ids(document_ids: Iterable, error_type: Type[errors.DockieError]) -> DocumentIds:
+    ensure.not_none(document_ids, error_type("Document ids cannot be of type None."))
+
+    document_ids = DocumentIds(document_ids)
+    ensure.ids_specified(document_ids, error_type("Document id not specified."))
+
+    return document_ids
+
+
+@instrumentation.timed("container.validate_documents")
+def to_documents(batch: list) -> List[Document]:
+    """
+    Validates a batch of documents, see Container.add_documents.
+    :param batch: Document instances and (document_id, data) tuples.
+    :return: The batch as Document instances.
+    """
+    raw_items = [item for item in batch if not isinstance(item, Document)]
+
+    if not raw_items:
+        return batch
+
+    for item in raw_items:
+        if not isinstance(item, tuple) or len(item) != 2:
+            raise errors.ObjectCreateError(
+                "Documents must be Document instances or (document_id, data) tuples."
+            )
+
+        if item[1] is None:
+            raise errors.ObjectCreateError(
+                "Document data cannot be of type None. "
+                "To create a document with no data, pass an empty dict, '{}'."
+            )
 
-        if document is None:
-            return NoneDocument(document_id, {})
+    ensure.ids_specified(
+        (item[0] for item in raw_items),
+        errors.ObjectCreateError("Document id not specified."),
+    )
 
-        return document
+    return [
+        item if isinstance(item, Document) else Document.from_validated(*item)
+        for item in batch
+    ]
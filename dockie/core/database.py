@@ -1,24 +1,55 @@
 """
 Database module.
 """
-from typing import Dict, List
+import threading
+from contextlib import ExitStack, contextmanager
+from itertools import groupby
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
-from dockie.core.container import Container
-from dockie.core import errors, ensure
+from dockie.core.container import BulkLoadResult, Container
+from dockie.core import budget, errors, ensure, events, instrumentation, jsonl
 
 
-class Database:
+class Database(events.Observable):
     """Database class. A database holds one or more Container instances."""
 
     def __init__(self):
+        super().__init__()
         self._containers: Dict[str, Container] = {}
+        self._memory_budget: Optional[tuple] = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["_lock"]
+        state["_memory_budget"] = None
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.__dict__.setdefault("_memory_budget", None)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def read_locked(self):
+        """
+        Holds every container's read lock, and blocks new containers from being
+        added, for the duration of a with block. This gives a consistent view of
+        the whole database.
+        """
+        with self._lock, ExitStack() as stack:
+            for name in sorted(self._containers):
+                stack.enter_context(self._containers[name].get_lock().read())
+
+            yield self
 
     def list_containers(self) -> List[str]:
         """
         List the containers in the database.
         :return: A list of the container names.
         """
-        return list(self._containers.keys())
+        with self._lock:
+            return list(self._containers.keys())
 
     def add_container(self, name):
         """
@@ -29,13 +60,60 @@ class Database:
             name, errors.ObjectCreateError("Container name not specified.")
         )
 
-        if self._containers.get(name) is not None:
-            raise errors.ObjectCreateError(
-                f"The container named '{name}' already exists. "
-                f"Container names must be unique within a database."
-            )
+        self.attach_container(Container(name))
+
+    @instrumentation.timed("database.attach_container")
+    def attach_container(self, container: Container):
+        """
+        Add an existing container instance to the database.
+        :param container: The container.
+        """
+        ensure.not_none(
+            container, errors.ObjectCreateError("Container cannot be of type None.")
+        )
+        name = container.get_name()
+
+        with self._lock:
+            if self._containers.get(name) is not None:
+                raise errors.ObjectCreateError(
+                    f"The container named '{name}' already exists. "
+                    f"Container names must be unique within a database."
+                )
+
+            self._containers[name] = container
 
-        self._containers[name] = Container(name)
+            if self._memory_budget is not None:
+                container.set_memory_budget(*self._memory_budget)
+
+            for listener in self._listeners:
+                container.add_listener(listener)
+
+            self._notify(events.Mutation(events.ADD_CONTAINER, container))
+
+    def set_memory_budget(
+        self,
+        max_bytes: int,
+        mode: str = budget.DROP,
+        spill_directory: Optional[str] = None,
+    ) -> budget.MemoryBudget:
+        """
+        Keeps the resident documents of all containers, including containers
+        added later, within one memory budget, see Container.set_memory_budget.
+        A container that writes over the budget evicts its own cold documents.
+        :param max_bytes: The approximate number of bytes the documents may use.
+        :param mode: 'drop' or 'spill'.
+        :param spill_directory: The directory of the spill files.
+        :return: The shared budget.
+        """
+        memory_budget = budget.MemoryBudget(max_bytes)
+
+        with self._lock:
+            for container in self._containers.values():
+                container.set_memory_budget(memory_budget, mode, spill_directory)
+
+            self._memory_budget = (memory_budget, mode, spill_directory)
+
+        return memory_budget
 
     def get_container(self, name: str):
         """
@@ -53,3 +131,114 @@ class Database:
             raise errors.ObjectNotFoundError(f"Container '{name}' was not found.")
 
         return container
+
+    @instrumentation.timed("database.bulk_load")
+    def bulk_load(
+        self, name: str, documents: Iterable, batch_size: int = 1000
+    ) -> BulkLoadResult:
+        """
+        Adds many documents to a container, see Container.add_documents.
+        :param name: The container name.
+        :param documents: The documents to add, as Document instances or
+        (document_id, data) tuples.
+        :param batch_size: The number of documents validated and inserted at a time.
+        :return: The number of inserted and replaced documents.
+        """
+        return self.get_container(name).add_documents(documents, batch_size)
+
+    @instrumentation.timed("database.export_jsonl")
+    def export_jsonl(self, filename: str, overwrite=False) -> int:
+        """
+        Exports every container to a single JSON Lines file. Each container is
+        written as a '{"container": ...}' line followed by one
+        '{"container": ..., "id": ..., "data": ...}' line per document. Each
+        container is exported from its own snapshot, so writers are not blocked.
+        :param filename: The file name.
+        :param overwrite: When True and the file exists, the file is overwritten.
+        When False and the file exists, an error is raised.
+        :return: The number of exported documents.
+        """
+        names = self.list_containers()
+
+        return jsonl.write_records(filename, self._export_records(names), overwrite) - len(
+            names
+        )
+
+    def _export_records(self, names: List[str]) -> Iterator[dict]:
+        for name in names:
+            yield {"container": name}
+
+            for document in self.get_container(name).iter_documents():
+                yield {"container": name, "id": document.get_id(), "data": document.get_data()}
+
+    @instrumentation.timed("database.import_jsonl")
+    def import_jsonl(
+        self,
+        filename: str,
+        batch_size: int = 1000,
+        progress: Callable[[int], None] = None,
+    ) -> BulkLoadResult:
+        """
+        Imports the containers and documents of a JSON Lines file written by
+        export_jsonl. Containers that do not exist are added. The file is read a
+        line at a time and documents are added a batch at a time.
+        :param filename: The file name.
+        :param batch_size: The number of documents added at a time.
+        :param progress: A callable called after every batch with the number of
+        documents imported so far.
+        :return: The number of inserted and replaced documents.
+        """
+        inserted = 0
+        replaced = 0
+
+        for name, records in groupby(
+            jsonl.read_records(filename, ("container",)),
+            key=lambda record: record["container"],
+        ):
+            if name not in self.list_containers():
+                self.add_container(name)
+
+            result = self.get_container(name).add_documents(
+                (
+                    (record.get("id"), record.get("data"))
+                    for record in records
+                    if "id" in record or "data" in record
+                ),
+                batch_size,
+                _offset_progress(progress, inserted + replaced),
+            )
+            inserted += result.inserted
+            replaced += result.replaced
+
+        return BulkLoadResult(inserted, replaced)
+
+    def add_listener(self, listener: Callable[[events.Mutation], None]):
+        """
+        Adds a listener that is called after every container and document mutation
+        in the database, including mutations of containers added later.
+        Listeners are not persisted with the database.
+        :param listener: A callable that accepts a Mutation.
+        """
+        with self._lock:
+            super().add_listener(listener)
+
+            for container in self._containers.values():
+                container.add_listener(listener)
+
+    def remove_listener(self, listener: Callable[[events.Mutation], None]):
+        """
+        Removes a listener from the database and its containers.
+        :param listener: The listener to remove.
+        """
+        with self._lock:
+            super().remove_listener(listener)
+
+            for container in self._containers.values():
+                container.remove_listener(listener)
+
+
+def _offset_progress(progress: Callable[[int], None], start: int):
+    if progress is None:
+        return None
+
+    return lambda count: progress(start + count)
@@ -1,12 +1,18 @@
 """
 Document module.
 """
+from types import MappingProxyType
+
 from dockie.core import errors, ensure
 
+_EMPTY_DATA = MappingProxyType({})
+
 
 class Document:
     """Document class. A document is the basic storage primitive in a document database."""
 
+    __slots__ = ("_document_id", "_data")
+
     def __init__(self, document_id, data: dict):
         """
         Creates a Document instance.
@@ -28,6 +34,30 @@ class Document:
         self._document_id = document_id
         self._data = data
 
+    @classmethod
+    def from_validated(cls, document_id, data: dict) -> "Document":
+        """
+        Creates a Document instance without validating its arguments. Callers
+        must have validated the id and data already, for example in bulk.
+        :param document_id: The document id.
+        :param data: The document data.
+        :return: The document.
+        """
+        document = cls.__new__(cls)
+        document._document_id = document_id
+        document._data = data
+        return document
+
+    def __getstate__(self):
+        return self._document_id, self._data
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Documents pickled before they were slotted carry their __dict__.
+            state = state["_document_id"], state["_data"]
+
+        self._document_id, self._data = state
+
     def get_id(self) -> str:
         """
         Retrieves the document's id.
@@ -45,5 +75,23 @@ class Document:
 
 class NoneDocument(Document):
     """
-    Represents a document that doesn't exist.
+    Represents a document that doesn't exist. Containers return the shared
+    NONE_DOCUMENT instance for every miss, whose id is None and whose data is
+    an empty read-only mapping.
     """
+
+    __slots__ = ()
+
+    def __init__(self, document_id=None, data: dict = None):
+        """
+        Creates a NoneDocument instance. The arguments are not validated.
+        :param document_id: The id that was not found.
+        :param data: The document data. When not specified, an empty read-only
+        mapping is used.
+        """
+        # pylint: disable=super-init-not-called
+        self._document_id = document_id
+        self._data = _EMPTY_DATA if data is None else data
+
+
+NONE_DOCUMENT = NoneDocument()
@@ -1,6 +1,8 @@
 """
 Ensure module. An 'Ensure' is used to validate pre-conditions and post-conditions.
 """
+from typing import Iterable
+
 from dockie.core import errors
 
 
@@ -38,7 +40,7 @@ def id_specified(document_id, error_to_raise: errors.DockieError):
     :param document_id: The document id to verify.
     :param error_to_raise: The error raised when the condition is not met.
     """
-    if type(document_id) not in [str, int]:
+    if type(document_id) not in (str, int):
         raise errors.IdTypeNotSupportedError(
             "Supported document_id types are 'int' and 'str'."
         )
@@ -46,3 +48,51 @@ def id_specified(document_id, error_to_raise: errors.DockieError):
     if isinstance(document_id, str):
         if _is_none_or_whitespace(document_id):
             raise error_to_raise
+
+
+def ids_specified(document_ids: Iterable, error_to_raise: errors.DockieError):
+    """
+    Ensures every document id in a batch is of a supported type. This is the
+    bulk equivalent of id_specified.
+    :param document_ids: The document ids to verify.
+    :param error_to_raise: The error raised when a string id is empty or whitespace.
+    """
+    if not isinstance(document_ids, (list, tuple)):
+        document_ids = list(document_ids)
+
+    # Batches of a single id type are checked without a Python level loop.
+    id_types = set(map(type, document_ids))
+
+    if id_types == {int} or (id_types == {str} and all(map(str.strip, document_ids))):
+        return
+
+    for document_id in document_ids:
+        id_type = type(document_id)
+
+        if id_type is str:
+            if not document_id.strip():
+                raise error_to_raise
+        elif id_type is not int:
+            raise errors.IdTypeNotSupportedError(
+                "Supported document_id types are 'int' and 'str'."
+            )
+
+
+def greater_than_zero(value: int, error_to_raise: errors.DockieError):
+    """
+    Ensures the value is a number greater than zero.
+    :param value: The value to verify.
+    :param error_to_raise: The error raised when the condition is not met.
+    """
+    if value is None or value <= 0:
+        raise error_to_raise
+
+
+def not_negative(value: int, error_to_raise: errors.DockieError):
+    """
+    Ensures the value is an integer that is zero or greater.
+    :param value: The value to verify.
+    :param error_to_raise: The error raised when the condition is not met.
+    """
+    if not isinstance(value, int) or value < 0:
+        raise error_to_raise
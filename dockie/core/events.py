@@ -0,0 +1,73 @@
+"""
+Events module. Databases and containers notify their listeners of every
+mutation so that logs, caches and feeds can follow changes as they happen.
+"""
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from dockie.core import ensure, errors
+
+ADD_CONTAINER = "add_container"
+INSERT = "insert"
+REPLACE = "replace"
+EXPIRE = "expire"
+EVICT = "evict"
+SET_EXPIRY = "set_expiry"
+
+
+class Mutation(NamedTuple):
+    """
+    Describes a single mutation.
+
+    kind: The mutation kind, one of 'add_container', 'insert', 'replace',
+    'expire', 'evict' or 'set_expiry'.
+    container: The container that was added or changed.
+    document: The document that was inserted, replaced, removed on expiry or
+    eviction, or whose expiry time was set, otherwise None.
+    previous: The document that was replaced, otherwise None.
+    """
+
+    kind: str
+    container: Any
+    document: Optional[Any] = None
+    previous: Optional[Any] = None
+
+
+class Observable:
+    """
+    Base class of objects that notify listeners of their mutations. Listeners
+    are not persisted when the object is pickled.
+    """
+
+    def __init__(self):
+        self._listeners: List[Callable[[Mutation], None]] = []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_listeners"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("_listeners", [])
+
+    def add_listener(self, listener: Callable[[Mutation], None]):
+        """
+        Adds a listener that is called after every mutation.
+        :param listener: A callable that accepts a Mutation.
+        """
+        ensure.not_none(
+            listener, errors.ObjectCreateError("Listener cannot be of type None.")
+        )
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Mutation], None]):
+        """
+        Removes a listener. Removing a listener that was never added has no effect.
+        :param listener: The listener to remove.
+        """
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, mutation: Mutation):
+        for listener in list(self._listeners):
+            listener(mutation)
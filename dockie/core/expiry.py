@@ -0,0 +1,296 @@
+"""
+Expiry module. Documents added with a time to live are tracked in a heap
+ordered by expiry time, so finding and removing the expired documents costs
+O(expired) rather than a scan of the container. A sweeper removes them in the
+background a batch at a time; until then, reads treat them as missing.
+"""
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dockie.core import ensure, errors
+
+
+class ExpiryQueue:
+    """
+    Tracks the expiry times of documents. Expiry times are wall clock times, as
+    returned by time.time, so they survive persistence. Changing an expiry
+    time leaves a stale heap entry behind, which is skipped when it is reached;
+    the heap is rebuilt when stale entries outnumber live ones. The heap has its
+    own lock, because has_expired discards stale entries while readers run.
+    """
+
+    def __init__(
+        self,
+        default_ttl: Optional[float] = None,
+        sweep_interval: Optional[float] = None,
+    ):
+        """
+        Creates an ExpiryQueue instance.
+        :param default_ttl: The time to live, in seconds, of documents added
+        without one. When not specified, such documents do not expire.
+        :param sweep_interval: The number of seconds between background sweeps.
+        When not specified, expired documents are only removed by expire.
+        """
+        if default_ttl is not None:
+            ensure.greater_than_zero(
+                default_ttl,
+                errors.ObjectCreateError("Time to live must be greater than zero."),
+            )
+
+        if sweep_interval is not None:
+            ensure.greater_than_zero(
+                sweep_interval,
+                errors.ObjectCreateError("Sweep interval must be greater than zero."),
+            )
+
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self._deadlines: Dict[object, float] = {}
+        self._heap: List[Tuple[float, int, object]] = []
+        self._sequence = itertools.count()
+        self._heap_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_heap"] = None
+        state["_sequence"] = None
+        state["_heap_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sequence = itertools.count()
+        self._heap_lock = threading.Lock()
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    @classmethod
+    def from_description(cls, description: dict) -> "ExpiryQueue":
+        """
+        Creates an expiry queue from a description written by describe.
+        :param description: The description.
+        :return: The expiry queue.
+        """
+        queue = cls(description["default_ttl"], description["sweep_interval"])
+
+        for document_id, deadline in description["deadlines"]:
+            queue.set(document_id, deadline)
+
+        return queue
+
+    def describe(self) -> dict:
+        """
+        Describes the queue as plain values that any codec can encode.
+        :return: The settings and the [document id, expiry time] pairs.
+        """
+        return {
+            "default_ttl": self.default_ttl,
+            "sweep_interval": self.sweep_interval,
+            "deadlines": [list(item) for item in self._deadlines.items()],
+        }
+
+    def deadline_for(self, ttl: Optional[float]) -> Optional[float]:
+        """
+        Computes the expiry time of a document added now.
+        :param ttl: The time to live of the document, in seconds. When not
+        specified, the default time to live is used.
+        :return: The expiry time, or None when the document does not expire.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+
+        return None if ttl is None else time.time() + ttl
+
+    def get(self, document_id) -> Optional[float]:
+        """
+        Retrieves the expiry time of a document.
+        :param document_id: The document id.
+        :return: The expiry time, or None when the document does not expire.
+        """
+        return self._deadlines.get(document_id)
+
+    def set(self, document_id, deadline: Optional[float]):
+        """
+        Sets, or clears, the expiry time of a document.
+        :param document_id: The document id.
+        :param deadline: The expiry time. When None, the document does not expire.
+        """
+        if deadline is None:
+            self._deadlines.pop(document_id, None)
+            return
+
+        self._deadlines[document_id] = deadline
+
+        with self._heap_lock:
+            heapq.heappush(self._heap, (deadline, next(self._sequence), document_id))
+
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._rebuild()
+
+    def is_expired(self, document_id, now: Optional[float] = None) -> bool:
+        """
+        Checks whether a document has expired.
+        :param document_id: The document id.
+        :param now: The current time. When not specified, time.time is used.
+        :return: True if the document has an expiry time that has passed.
+        """
+        deadline = self._deadlines.get(document_id)
+
+        return deadline is not None and deadline <= (time.time() if now is None else now)
+
+    def items(self) -> List[Tuple[object, float]]:
+        """
+        Lists the documents that expire.
+        :return: (document id, expiry time) tuples.
+        """
+        return list(self._deadlines.items())
+
+    def has_expired(self) -> bool:
+        """
+        Checks whether any document has expired, in amortized constant time.
+        Stale entries that have passed are discarded on the way.
+        :return: True if a document has an expiry time that has passed.
+        """
+        now = time.time()
+
+        with self._heap_lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, document_id = self._heap[0]
+
+                if self._deadlines.get(document_id) == deadline:
+                    return True
+
+                heapq.heappop(self._heap)
+
+        return False
+
+    def list_expired(self) -> List:
+        """
+        Lists the expired documents without removing them. Only the part of the
+        heap that has passed is visited, so the cost depends on the number of
+        expired documents.
+        :return: The ids of the expired documents.
+        """
+        now = time.time()
+        expired = []
+
+        with self._heap_lock:
+            heap = self._heap
+            positions = [0] if heap else []
+
+            while positions:
+                position = positions.pop()
+                deadline, _, document_id = heap[position]
+
+                if deadline > now:
+                    continue
+
+                if self._deadlines.get(document_id) == deadline:
+                    expired.append(document_id)
+
+                positions.extend(
+                    child
+                    for child in (2 * position + 1, 2 * position + 2)
+                    if child < len(heap)
+                )
+
+        return expired
+
+    def pop_expired(self, limit: Optional[int] = None) -> List:
+        """
+        Removes the expired documents from the queue, earliest first.
+        :param limit: The maximum number of documents to remove. When not
+        specified, every expired document is removed.
+        :return: The ids of the expired documents.
+        """
+        now = time.time()
+        expired = []
+
+        with self._heap_lock:
+            while self._heap and self._heap[0][0] <= now:
+                if limit is not None and len(expired) >= limit:
+                    break
+
+                deadline, _, document_id = heapq.heappop(self._heap)
+
+                if self._deadlines.get(document_id) == deadline:
+                    del self._deadlines[document_id]
+                    expired.append(document_id)
+
+        return expired
+
+    def _rebuild(self):
+        self._heap = [
+            (deadline, next(self._sequence), document_id)
+            for document_id, deadline in self._deadlines.items()
+        ]
+        heapq.heapify(self._heap)
+
+
+class Sweeper:
+    """
+    Removes expired documents from containers on a background thread. The
+    sweeper holds weak references, so it stops once its containers are gone.
+    Each container is swept a batch at a time, releasing its lock between
+    batches so writers are not held up by a large sweep.
+    """
+
+    def __init__(self, containers: Iterable, interval: float, batch_size: int = 1000):
+        """
+        Creates a Sweeper instance and starts its thread.
+        :param containers: The containers to sweep.
+        :param interval: The number of seconds between sweeps.
+        :param batch_size: The maximum number of documents removed per lock acquisition.
+        """
+        self._containers = [weakref.ref(container) for container in containers]
+        self._interval = interval
+        self._batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sweep_periodically, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the sweeper and waits for a running sweep to finish.
+        """
+        self._stop.set()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def is_running(self) -> bool:
+        """
+        Checks whether the sweeper is still sweeping. It stops when stop is
+        called or once its containers are gone.
+        :return: True if the sweeper is running, otherwise False.
+        """
+        return self._thread.is_alive()
+
+    def _sweep_periodically(self):
+        while not self._stop.wait(self._interval):
+            if not self._sweep():
+                return
+
+    def _sweep(self) -> bool:
+        alive = False
+
+        for reference in self._containers:
+            container = reference()
+
+            if container is None:
+                continue
+
+            alive = True
+
+            while (
+                not self._stop.is_set()
+                and container.expire(self._batch_size) == self._batch_size
+            ):
+                pass
+
+        return alive
@@ -0,0 +1,359 @@
+"""
+Container features module. The optional features of a container, result
+caching, change feeds, document expiry and memory budgets, keep their state in
+a ContainerFeatures instance and their methods in a mixin per feature, so the
+container classes stay focused on documents, indexes and columns.
+"""
+from typing import Iterable, MutableMapping, Optional, Union
+
+from dockie.core import budget, ensure, errors, events, expiry, feed, instrumentation, results
+
+
+class ContainerFeatures:
+    """
+    The state of the optional features of a container. Only the expiry queue
+    is persisted; it holds the expiry times of the documents.
+    """
+
+    __slots__ = ("result_cache", "change_feed", "expiry", "sweeper", "budget")
+
+    def __init__(self, expiry_queue: Optional[expiry.ExpiryQueue] = None):
+        """
+        Creates a ContainerFeatures instance with every feature disabled.
+        :param expiry_queue: An expiry queue that already tracks the documents.
+        """
+        self.result_cache: Optional[results.ResultCache] = None
+        self.change_feed: Optional[feed.ChangeFeed] = None
+        self.expiry: Optional[expiry.ExpiryQueue] = expiry_queue
+        self.sweeper: Optional[expiry.Sweeper] = None
+        self.budget: Optional[budget.BudgetedDocumentStore] = None
+
+    def __getstate__(self):
+        return {"expiry": self.expiry}
+
+    def __setstate__(self, state):
+        self.result_cache = None
+        self.change_feed = None
+        self.expiry = state.get("expiry")
+        self.sweeper = None
+        self.budget = None
+
+    def start_sweeper(self, containers: Iterable, sweep_interval: Optional[float]):
+        """
+        Starts a sweeper that removes the expired documents of containers,
+        replacing the running one.
+        :param containers: The containers to sweep.
+        :param sweep_interval: The number of seconds between sweeps. When None,
+        no sweeper is started.
+        """
+        self.stop_sweeper()
+
+        if sweep_interval is not None:
+            self.sweeper = expiry.Sweeper(containers, sweep_interval)
+
+    def stop_sweeper(self):
+        """
+        Stops the running sweeper, if any.
+        """
+        if self.sweeper is not None:
+            self.sweeper.stop()
+            self.sweeper = None
+
+
+class ResultCacheMixin:
+    """
+    Adds result caching to a container class.
+    """
+
+    def enable_result_cache(self, max_size: int = 128, ttl: Optional[float] = None):
+        """
+        Enables caching of attribute query results. A cached result is returned
+        while the container version is unchanged, so writes invalidate it.
+        Enabling the cache again replaces it with an empty one. The cache is
+        not persisted.
+        :param max_size: The maximum number of cached results.
+        :param ttl: The number of seconds a result is kept. When not specified,
+        results are kept until they are invalidated or evicted.
+        """
+        self._features.result_cache = results.ResultCache(max_size, ttl)
+
+    def disable_result_cache(self):
+        """
+        Disables and discards the result cache.
+        """
+        self._features.result_cache = None
+
+    def get_result_cache(self) -> Optional[results.ResultCache]:
+        """
+        Retrieves the container's result cache.
+        :return: The result cache, or None when caching is disabled.
+        """
+        return self._features.result_cache
+
+
+class ChangeFeedMixin:
+    """
+    Adds a change feed to a container class.
+    """
+
+    def enable_change_feed(self, retention: int = 10000) -> feed.ChangeFeed:
+        """
+        Enables a change feed, a sequenced log of the inserts, replacements,
+        expiries and evictions that consumers read from a checkpoint, so
+        finding what changed costs O(changes) rather than a scan. Enabling the
+        feed again replaces it with an empty one. The feed is not persisted.
+        :param retention: The number of changes retained.
+        :return: The change feed.
+        """
+        change_feed = feed.ChangeFeed(retention)
+        self.disable_change_feed()
+        self.add_listener(change_feed)
+        self._features.change_feed = change_feed
+
+        return change_feed
+
+    def disable_change_feed(self):
+        """
+        Disables and closes the change feed.
+        """
+        change_feed = self._features.change_feed
+
+        if change_feed is not None:
+            self.remove_listener(change_feed)
+            change_feed.close()
+            self._features.change_feed = None
+
+    def get_change_feed(self) -> Optional[feed.ChangeFeed]:
+        """
+        Retrieves the container's change feed.
+        :return: The change feed, or None when the feed is disabled.
+        """
+        return self._features.change_feed
+
+
+class ExpiryMixin:
+    """
+    Adds document expiry to Container. Removing a document on expiry goes
+    through the container's indexes, columns and listeners.
+    """
+
+    def enable_expiry(
+        self, default_ttl: Optional[float] = None, sweep_interval: Optional[float] = 1.0
+    ):
+        """
+        Enables document expiry. Enabling expiry again changes its settings and
+        keeps the expiry times of the documents.
+        :param default_ttl: The number of seconds documents added without a
+        time to live are kept. When not specified, they do not expire.
+        :param sweep_interval: The number of seconds between background sweeps
+        that remove expired documents. When None, no sweeper is started and
+        expired documents are only removed by expire.
+        """
+        queue = expiry.ExpiryQueue(default_ttl, sweep_interval)
+        self._features.stop_sweeper()
+
+        with self._lock.write():
+            if self._features.expiry is not None:
+                for document_id, deadline in self._features.expiry.items():
+                    queue.set(document_id, deadline)
+
+            self._features.expiry = queue
+
+        self._features.start_sweeper([self], sweep_interval)
+
+    def disable_expiry(self):
+        """
+        Disables document expiry. Expired documents are removed first, and the
+        remaining documents no longer expire.
+        """
+        self._features.stop_sweeper()
+
+        with self._lock.write():
+            self.expire()
+            self._features.expiry = None
+
+    def is_expiry_enabled(self) -> bool:
+        """
+        Checks whether document expiry is enabled.
+        :return: True if expiry is enabled, otherwise False.
+        """
+        return self._features.expiry is not None
+
+    def get_expiry_queue(self) -> Optional[expiry.ExpiryQueue]:
+        """
+        Retrieves the container's expiry queue.
+        :return: The expiry queue, or None when expiry is disabled.
+        """
+        return self._features.expiry
+
+    def has_expired_documents(self) -> bool:
+        """
+        Checks whether documents have expired but have not been removed yet.
+        :return: True if there are expired documents, otherwise False.
+        """
+        queue = self._features.expiry
+
+        return queue is not None and queue.has_expired()
+
+    def get_expiry(self, document_id) -> Optional[float]:
+        """
+        Retrieves the time a document expires at.
+        :param document_id: The document id.
+        :return: The expiry time, as returned by time.time, or None when the
+        document does not expire.
+        """
+        queue = self._features.expiry
+
+        return None if queue is None else queue.get(document_id)
+
+    def set_expiry(self, document_id, expires_at: Optional[float]) -> bool:
+        """
+        Sets the time a document expires at. Requires expiry to be enabled.
+        :param document_id: The document id.
+        :param expires_at: The expiry time, as returned by time.time. When None,
+        the document no longer expires.
+        :return: True if the document was found, otherwise False.
+        """
+        queue = self._features.expiry
+
+        if queue is None:
+            raise errors.ObjectCreateError(
+                "Expiry is not enabled. Enable it with enable_expiry."
+            )
+
+        with self._lock.write():
+            if document_id not in self._documents:
+                return False
+
+            queue.set(document_id, expires_at)
+            # Expiry decides whether reads see the document, so it is a change.
+            self._version = self.get_version() + 1
+
+            if self._listeners:
+                self._notify(
+                    events.Mutation(events.SET_EXPIRY, self, self._documents[document_id])
+                )
+
+        return True
+
+    def expire(self, limit: Optional[int] = None) -> int:
+        """
+        Removes expired documents, earliest expiry first. The cost depends on
+        the number of expired documents, not on the size of the container.
+        :param limit: The maximum number of documents to remove. When not
+        specified, every expired document is removed.
+        :return: The number of removed documents.
+        """
+        if limit is not None:
+            ensure.greater_than_zero(
+                limit, errors.ObjectReadError("Limit must be greater than zero.")
+            )
+
+        queue = self._features.expiry
+
+        if queue is None or not queue.has_expired():
+            return 0
+
+        with self._lock.write():
+            document_ids = queue.pop_expired(limit)
+
+            for document_id in document_ids:
+                self._remove(document_id)
+
+        collector = instrumentation.ACTIVE
+
+        if document_ids and collector is not None:
+            collector.increment("container.expired", len(document_ids))
+
+        return len(document_ids)
+
+    def _deadline(self, ttl: Optional[float]) -> Optional[float]:
+        if ttl is not None:
+            ensure.greater_than_zero(
+                ttl, errors.ObjectCreateError("Time to live must be greater than zero.")
+            )
+
+        if self._features.expiry is None:
+            raise errors.ObjectCreateError(
+                "Expiry is not enabled. Enable it with enable_expiry to add "
+                "documents with a time to live."
+            )
+
+        return self._features.expiry.deadline_for(ttl)
+
+    def _remove(self, document_id):
+        document = self._documents.pop(document_id, None)
+
+        if document is not None:
+            self._unlink(document, events.EXPIRE)
+
+
+class MemoryBudgetMixin:
+    """
+    Adds memory budgets to Container. Evicted documents are unlinked from the
+    container's indexes, columns and expiry queue.
+    """
+
+    def set_memory_budget(
+        self,
+        memory_budget: Union[int, budget.MemoryBudget],
+        mode: str = budget.DROP,
+        spill_directory: Optional[str] = None,
+    ):
+        """
+        Keeps the resident documents within a memory budget. When a write goes
+        over the budget, cold documents are evicted until it is met again.
+        Setting a budget again replaces the previous one. Budgets are not persisted.
+        :param memory_budget: The approximate number of bytes the documents may
+        use, or a MemoryBudget shared with other containers.
+        :param mode: 'drop' to remove evicted documents from the container, as
+        a cache does, or 'spill' to write them to a temporary file from which
+        get_document reads them back.
+        :param spill_directory: The directory of the spill file. When not
+        specified, the system's temporary directory is used.
+        """
+        if not isinstance(memory_budget, budget.MemoryBudget):
+            memory_budget = budget.MemoryBudget(memory_budget)
+
+        store = budget.BudgetedDocumentStore(memory_budget, mode, spill_directory)
+
+        with self._lock.write():
+            self._documents = self._move_documents(store)
+            self._features.budget = store
+            self._release_dropped()
+
+    def remove_memory_budget(self):
+        """
+        Removes the memory budget. Spilled documents are read back into memory.
+        """
+        with self._lock.write():
+            if self._features.budget is not None:
+                self._documents = self._move_documents({})
+                self._features.budget = None
+
+    def get_memory_stats(self) -> Optional[budget.MemoryStats]:
+        """
+        Retrieves the memory statistics, such as the number of evictions.
+        :return: The statistics, or None when the container has no memory budget.
+        """
+        store = self._features.budget
+
+        return None if store is None else store.get_stats()
+
+    def _move_documents(self, store: MutableMapping) -> MutableMapping:
+        previous = self._documents
+
+        for document_id in list(previous):
+            store[document_id] = previous.pop(document_id)
+
+        if self._features.budget is not None:
+            self._features.budget.close()
+
+        return store
+
+    def _release_dropped(self):
+        for document in self._features.budget.pop_dropped():
+            if self._features.expiry is not None:
+                self._features.expiry.set(document.get_id(), None)
+
+            self._unlink(document, events.EVICT)
@@ -0,0 +1,217 @@
+"""
+Change feed module. A change feed records the document mutations of a
+container in a sequenced log, so consumers can catch up from a checkpoint at
+a cost of O(changes) instead of scanning the container for what changed.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Iterator, List, NamedTuple, Optional
+
+from dockie.core import ensure, errors, events
+
+
+class Change(NamedTuple):
+    """
+    A recorded mutation.
+
+    sequence: The position of the change in the feed, starting at 1.
+    kind: The mutation kind, one of 'insert', 'replace', 'expire' or 'evict'.
+    document_id: The id of the document.
+    document: The document that was inserted, replaced, or removed on expiry
+    or eviction.
+    """
+
+    sequence: int
+    kind: str
+    document_id: Any
+    document: Any
+
+
+class ChangeFeed:
+    """
+    A bounded log of container mutations. The feed is a container listener, so
+    changes are recorded in the order the container applied them. Only the
+    most recent changes are retained; a consumer whose checkpoint has fallen
+    out of the feed must rescan the container and continue from get_sequence.
+    The feed is safe to use from multiple threads.
+    """
+
+    def __init__(self, retention: int = 10000):
+        """
+        Creates a ChangeFeed instance.
+        :param retention: The number of changes retained.
+        """
+        ensure.greater_than_zero(
+            retention,
+            errors.ObjectCreateError("Change feed retention must be greater than zero."),
+        )
+
+        self._retention = retention
+        self._changes: List[Change] = []
+        self._sequence = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._waiters = set()
+
+    def __call__(self, mutation: events.Mutation):
+        if mutation.kind in (events.ADD_CONTAINER, events.SET_EXPIRY):
+            return
+
+        with self._condition:
+            self._sequence += 1
+            self._changes.append(
+                Change(
+                    self._sequence,
+                    mutation.kind,
+                    mutation.document.get_id(),
+                    mutation.document,
+                )
+            )
+
+            # Trimming in bulk keeps appends amortized O(1).
+            if len(self._changes) >= 2 * self._retention:
+                del self._changes[: -self._retention]
+
+            self._wake()
+
+    def get_sequence(self) -> int:
+        """
+        Retrieves the sequence of the latest change, which is the checkpoint a
+        consumer that is up to date continues from.
+        :return: The sequence, 0 when nothing has changed.
+        """
+        return self._sequence
+
+    def get_retention(self) -> int:
+        """
+        Retrieves the number of changes retained.
+        :return: The retention.
+        """
+        return self._retention
+
+    def read(self, checkpoint: int = 0, limit: Optional[int] = None) -> List[Change]:
+        """
+        Reads the changes after a checkpoint.
+        :param checkpoint: The sequence of the last change the consumer has seen.
+        :param limit: The maximum number of changes read. When not specified,
+        every change after the checkpoint is read.
+        :return: The changes, oldest first.
+        """
+        ensure.not_none(
+            checkpoint, errors.ObjectReadError("Checkpoint cannot be of type None.")
+        )
+
+        with self._condition:
+            oldest = self._sequence - min(len(self._changes), self._retention)
+
+            if checkpoint < oldest:
+                raise errors.ObjectReadError(
+                    f"Changes after checkpoint {checkpoint} are no longer retained. "
+                    f"The oldest retained checkpoint is {oldest}."
+                )
+
+            start = max(len(self._changes) - (self._sequence - checkpoint), 0)
+            end = len(self._changes) if limit is None else start + limit
+
+            return self._changes[start:end]
+
+    def wait(self, checkpoint: int, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for a change after a checkpoint.
+        :param checkpoint: The sequence of the last change the consumer has seen.
+        :param timeout: The maximum number of seconds to wait. When not
+        specified, waits until a change is recorded or the feed is closed.
+        :return: True if there are changes after the checkpoint.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self._sequence > checkpoint, timeout
+            )
+
+            return self._sequence > checkpoint
+
+    def iter_changes(
+        self, checkpoint: int = 0, timeout: Optional[float] = None
+    ) -> Iterator[Change]:
+        """
+        Iterates over the changes after a checkpoint, waiting for new changes
+        as they are recorded.
+        :param checkpoint: The sequence of the last change the consumer has seen.
+        :param timeout: The maximum number of seconds to wait for a change.
+        When not specified, the iteration ends only when the feed is closed.
+        :return: An iterator over the changes.
+        """
+        while True:
+            changes = self.read(checkpoint)
+
+            if not changes:
+                if self._closed or not self.wait(checkpoint, timeout):
+                    return
+
+                continue
+
+            yield from changes
+            checkpoint = changes[-1].sequence
+
+    async def stream(
+        self, checkpoint: int = 0, timeout: Optional[float] = None
+    ) -> AsyncIterator[Change]:
+        """
+        Streams the changes after a checkpoint to a coroutine, see iter_changes.
+        Waiting for changes does not block the event loop or occupy a thread.
+        :param checkpoint: The sequence of the last change the consumer has seen.
+        :param timeout: The maximum number of seconds to wait for a change.
+        :return: An asynchronous iterator over the changes.
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+
+        with self._condition:
+            self._waiters.add(waiter)
+
+        try:
+            while True:
+                event.clear()
+                changes = self.read(checkpoint)
+
+                if changes:
+                    for change in changes:
+                        yield change
+
+                    checkpoint = changes[-1].sequence
+                    continue
+
+                if self._closed:
+                    return
+
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+
+    def close(self):
+        """
+        Closes the feed, ending the iterations and streams that wait for changes.
+        The retained changes can still be read.
+        """
+        with self._condition:
+            self._closed = True
+            self._wake()
+
+    def is_closed(self) -> bool:
+        """
+        Checks whether the feed is closed.
+        :return: True if the feed is closed, otherwise False.
+        """
+        return self._closed
+
+    def _wake(self):
+        self._condition.notify_all()
+
+        for loop, event in self._waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
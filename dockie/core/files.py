@@ -0,0 +1,70 @@
+"""
+Files module. Database files and exports are written to a temporary file in
+the directory of the destination that is renamed into place once it is
+complete, so a failed or interrupted write leaves the previous file intact.
+"""
+import contextlib
+import os
+import threading
+from typing import IO, Iterator
+
+from dockie.core import ensure, errors
+
+
+def validate_destination(filename: str, overwrite: bool, consequence: str):
+    """
+    Ensures a file can be written.
+    :param filename: The file name.
+    :param overwrite: When False and the file exists, an error is raised.
+    :param consequence: What is not done when the file exists, such as 'the
+    database will not be persisted'.
+    """
+    ensure.not_none_or_whitespace(
+        filename, errors.PersistenceError("File name not specified.")
+    )
+
+    if os.path.exists(filename) and not overwrite:
+        raise errors.PersistenceError(
+            f"File '{filename}' exists and overwrite is False, therefore {consequence}."
+        )
+
+
+def validate_source(filename: str):
+    """
+    Ensures a file can be read.
+    :param filename: The file name.
+    """
+    ensure.not_none_or_whitespace(
+        filename, errors.PersistenceError("File name not specified.")
+    )
+
+    if not os.path.exists(filename):
+        raise errors.PersistenceError(f"The file '{filename}' was not found.")
+
+
+@contextlib.contextmanager
+def replace_atomically(filename: str, mode: str = "wb", encoding: str = None) -> Iterator[IO]:
+    """
+    Opens a temporary file that replaces a file when the context exits without
+    an error. The temporary file is flushed to disk before it is renamed, and
+    removed when an error is raised.
+    :param filename: The name of the file to replace.
+    :param mode: The mode the temporary file is opened with, 'wb' or 'w'.
+    :param encoding: The encoding of a file opened in text mode.
+    :return: The temporary file.
+    """
+    # Concurrent writes of the same file each write their own temporary file.
+    temporary_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        with open(temporary_filename, mode, encoding=encoding) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+        raise
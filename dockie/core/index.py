@@ -0,0 +1,442 @@
+"""
+Secondary index module. A secondary index maps the values found at a dotted
+attribute path, such as 'bio.name', to the ids of the documents holding them.
+"""
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List
+
+from dictquery.datavalue import query_value
+
+from dockie.core import errors
+
+HASH = "hash"
+SORTED = "sorted"
+
+_NUMBER = "number"
+_STRING = "string"
+
+
+def extract_values(data, path: str) -> list:
+    """
+    Extracts the values found at a dotted attribute path. Lists along the path
+    are expanded the same way dictquery expands them when evaluating a query.
+    :param data: The document data.
+    :param path: The dotted attribute path.
+    :return: The values found at the path.
+    """
+    return query_value(data, path)
+
+
+def value_family(value):
+    """
+    Retrieves the family of mutually comparable values a value belongs to.
+    :param value: The value.
+    :return: The value family, or None when the value cannot be range indexed.
+    """
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else _NUMBER
+
+    if isinstance(value, str):
+        return _STRING
+
+    return None
+
+
+def id_key(document_id) -> tuple:
+    """
+    Computes the key that orders documents holding equal values: by id,
+    numbers before strings.
+    :param document_id: The document id.
+    :return: The key.
+    """
+    return isinstance(document_id, str), document_id
+
+
+class Index(ABC):
+    """
+    Represents a secondary index on a dotted attribute path. This class is the
+    base class for all index types.
+    """
+
+    index_type: str = None
+
+    def __init__(self, path: str):
+        """
+        Creates an Index instance.
+        :param path: The dotted attribute path to index.
+        """
+        self._path = path
+        self._values_by_id: Dict[object, list] = {}
+
+    def get_path(self) -> str:
+        """
+        Retrieves the indexed attribute path.
+        :return: The dotted attribute path.
+        """
+        return self._path
+
+    def add(self, document_id, data):
+        """
+        Indexes a document, replacing any entries of a previous version.
+        :param document_id: The document id.
+        :param data: The document data.
+        """
+        self.remove(document_id)
+
+        values = [
+            value
+            for value in extract_values(data, self._path)
+            if self.accepts(value)
+        ]
+
+        if not values:
+            return
+
+        self._values_by_id[document_id] = values
+
+        for value in values:
+            self.on_add(document_id, value)
+
+    def describe(self) -> list:
+        """
+        Describes the index as plain values that any codec can encode.
+        :return: The path, the index type and the [document id, values] pairs
+        of the indexed documents.
+        """
+        return [
+            self._path,
+            self.index_type,
+            [[document_id, values] for document_id, values in self._values_by_id.items()],
+        ]
+
+    def restore(self, entries: Iterable):
+        """
+        Fills an empty index from the entries of a description, without the
+        documents. Values the index does not accept, such as tuples a codec
+        decoded as lists, are skipped.
+        :param entries: The [document id, values] pairs.
+        """
+        for document_id, values in entries:
+            values = [value for value in values if self.accepts(value)]
+
+            if values:
+                self._values_by_id[document_id] = values
+
+        self.on_restore()
+
+    def on_restore(self):
+        """
+        Called by the base class once the entries of a description are restored.
+        Adds the value entries of every document.
+        """
+        for document_id, values in self._values_by_id.items():
+            for value in values:
+                self.on_add(document_id, value)
+
+    def get_values(self, document_id) -> list:
+        """
+        Retrieves the values a document is indexed under.
+        :param document_id: The document id.
+        :return: The indexed values, empty when the document is not indexed.
+        """
+        return self._values_by_id.get(document_id, [])
+
+    def remove(self, document_id):
+        """
+        Removes a document from the index.
+        :param document_id: The document id.
+        """
+        values = self._values_by_id.pop(document_id, None)
+
+        if values is None:
+            return
+
+        for value in values:
+            self.on_remove(document_id, value)
+
+    @abstractmethod
+    def accepts(self, value) -> bool:  # pragma: no cover
+        """
+        Checks whether a value can be stored in the index.
+        :param value: The value.
+        """
+
+    @abstractmethod
+    def on_add(self, document_id, value):  # pragma: no cover
+        """
+        Called by the base class. Adds a single value entry for the document.
+        :param document_id: The document id.
+        :param value: The value.
+        """
+
+    @abstractmethod
+    def on_remove(self, document_id, value):  # pragma: no cover
+        """
+        Called by the base class. Removes a single value entry for the document.
+        :param document_id: The document id.
+        :param value: The value.
+        """
+
+    @abstractmethod
+    def lookup(self, value) -> Iterable:  # pragma: no cover
+        """
+        Retrieves the ids of the documents holding a value.
+        :param value: The value.
+        """
+
+    @abstractmethod
+    def count(self, value) -> int:  # pragma: no cover
+        """
+        Counts the entries holding a value.
+        :param value: The value.
+        """
+
+
+class HashIndex(Index):
+    """
+    Represents a hash index. A hash index answers equality lookups.
+    """
+
+    index_type = HASH
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._entries: Dict[object, Dict[object, None]] = {}
+
+    def accepts(self, value) -> bool:
+        try:
+            hash(value)
+        except TypeError:
+            return False
+
+        return not (isinstance(value, float) and math.isnan(value))
+
+    def on_add(self, document_id, value):
+        self._entries.setdefault(value, {})[document_id] = None
+
+    def on_remove(self, document_id, value):
+        document_ids = self._entries.get(value)
+
+        if document_ids is None:
+            return
+
+        document_ids.pop(document_id, None)
+
+        if not document_ids:
+            del self._entries[value]
+
+    def lookup(self, value) -> Iterable:
+        if not self.accepts(value):
+            return ()
+
+        return self._entries.get(value, ())
+
+    def count(self, value) -> int:
+        return len(self.lookup(value))
+
+
+class SortedIndex(Index):
+    """
+    Represents a sorted index. A sorted index answers equality and range
+    lookups over numbers and strings. Entries with equal values are kept in
+    id order, see id_key, so the order does not depend on when documents
+    were written.
+    """
+
+    index_type = SORTED
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._values: Dict[str, list] = {_NUMBER: [], _STRING: []}
+        self._ids: Dict[str, list] = {_NUMBER: [], _STRING: []}
+
+    def accepts(self, value) -> bool:
+        return value_family(value) is not None
+
+    def on_add(self, document_id, value):
+        family = value_family(value)
+        values = self._values[family]
+        ids = self._ids[family]
+        low = bisect_left(values, value)
+        high = bisect_right(values, value, low)
+        key = id_key(document_id)
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if id_key(ids[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        values.insert(low, value)
+        ids.insert(low, document_id)
+
+    def on_restore(self):
+        # Sorting once is faster than inserting every entry into its place.
+        for family in (_NUMBER, _STRING):
+            entries = sorted(
+                (value, id_key(document_id), document_id)
+                for document_id, values in self._values_by_id.items()
+                for value in values
+                if value_family(value) == family
+            )
+            self._values[family] = [value for value, _, _ in entries]
+            self._ids[family] = [document_id for _, _, document_id in entries]
+
+    def on_remove(self, document_id, value):
+        family = value_family(value)
+        values = self._values[family]
+        ids = self._ids[family]
+
+        for position in range(
+            bisect_left(values, value), bisect_right(values, value)
+        ):
+            if ids[position] == document_id:
+                del values[position]
+                del ids[position]
+                return
+
+    def lookup(self, value) -> Iterable:
+        return self.range(value, True, value, True)
+
+    def count(self, value) -> int:
+        return self.count_range(value, True, value, True)
+
+    def range(
+        self, lower=None, lower_inclusive=True, upper=None, upper_inclusive=True
+    ) -> List:
+        """
+        Retrieves the ids of the documents holding a value within a range, in
+        ascending value order. Either bound may be None for an open range, but
+        not both.
+        :param lower: The lower bound.
+        :param lower_inclusive: When True, the lower bound is included.
+        :param upper: The upper bound.
+        :param upper_inclusive: When True, the upper bound is included.
+        :return: The document ids.
+        """
+        family, start, end = self._bounds(
+            lower, lower_inclusive, upper, upper_inclusive
+        )
+
+        if family is None:
+            return []
+
+        return self._ids[family][start:end]
+
+    def iter_ordered(
+        self,
+        lower=None,
+        lower_inclusive=True,
+        upper=None,
+        upper_inclusive=True,
+        descending=False,
+    ) -> Iterator:
+        """
+        Iterates over the ids of the documents holding a value within a range,
+        in value order, without copying the range. Numbers come before strings.
+        When both bounds are None, every entry is visited. Entries with equal
+        values are visited in id order, reversed in descending order. A document
+        holding several values is visited once per value. Callers hold the
+        container's read lock while iterating.
+        :param lower: The lower bound.
+        :param lower_inclusive: When True, the lower bound is included.
+        :param upper: The upper bound.
+        :param upper_inclusive: When True, the upper bound is included.
+        :param descending: When True, the entries are visited in descending order.
+        :return: An iterator over the document ids.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if lower is None and upper is None:
+            ranges = [(family, 0, len(self._ids[family])) for family in (_NUMBER, _STRING)]
+        else:
+            ranges = [self._bounds(lower, lower_inclusive, upper, upper_inclusive)]
+
+        if descending:
+            ranges.reverse()
+
+        for family, start, end in ranges:
+            if family is None:
+                continue
+
+            ids = self._ids[family]
+            positions = range(end - 1, start - 1, -1) if descending else range(start, end)
+
+            for position in positions:
+                yield ids[position]
+
+    def count_range(
+        self, lower=None, lower_inclusive=True, upper=None, upper_inclusive=True
+    ) -> int:
+        """
+        Counts the entries within a range.
+        :param lower: The lower bound.
+        :param lower_inclusive: When True, the lower bound is included.
+        :param upper: The upper bound.
+        :param upper_inclusive: When True, the upper bound is included.
+        :return: The number of entries.
+        """
+        family, start, end = self._bounds(
+            lower, lower_inclusive, upper, upper_inclusive
+        )
+
+        return 0 if family is None else max(end - start, 0)
+
+    def _bounds(self, lower, lower_inclusive, upper, upper_inclusive):
+        family = value_family(lower if lower is not None else upper)
+
+        if family is None or (
+            lower is not None
+            and upper is not None
+            and value_family(upper) != family
+        ):
+            return None, 0, 0
+
+        values = self._values[family]
+        start = 0
+        end = len(values)
+
+        if lower is not None:
+            start = (bisect_left if lower_inclusive else bisect_right)(values, lower)
+
+        if upper is not None:
+            end = (bisect_right if upper_inclusive else bisect_left)(values, upper)
+
+        return family, start, end
+
+
+_index_types = {HASH: HashIndex, SORTED: SortedIndex}
+
+
+def create_index(path: str, index_type: str) -> Index:
+    """
+    Creates an empty index.
+    :param path: The dotted attribute path to index.
+    :param index_type: The index type, either 'hash' or 'sorted'.
+    :return: The index.
+    """
+    index_class = _index_types.get(index_type)
+
+    if index_class is None:
+        raise errors.ObjectCreateError(
+            f"Index type '{index_type}' is not supported. "
+            f"Supported index types are '{HASH}' and '{SORTED}'."
+        )
+
+    return index_class(path)
+
+
+def restore_index(description: list) -> Index:
+    """
+    Creates an index from a description written by Index.describe.
+    :param description: The description.
+    :return: The index.
+    """
+    path, index_type, entries = description
+    document_index = create_index(path, index_type)
+    document_index.restore(entries)
+
+    return document_index
@@ -0,0 +1,429 @@
+"""
+Instrumentation module. When enabled, databases, containers, queries and
+persistence report counters, timing histograms and query profiles to an
+Instrumentation instance, which keeps a log of slow queries and passes every
+event on to its callbacks. Instrumentation is disabled by default; the
+instrumented calls then only check the module's 'ACTIVE' attribute. Calls read
+it into a local once, so disabling instrumentation during a call is safe.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from dockie.core import ensure, errors
+
+ACTIVE: Optional["Instrumentation"] = None
+
+BUCKETS = tuple(0.000001 * 2 ** exponent for exponent in range(28))
+
+
+class Event(NamedTuple):
+    """
+    An instrumented call.
+
+    name: The operation, such as 'container.add_document' or 'query.execute'.
+    seconds: The duration of the call.
+    attributes: Details of the call, such as the container name or, for
+    queries, the documents scanned and returned.
+    """
+
+    name: str
+    seconds: float
+    attributes: Mapping[str, Any]
+
+
+class SlowQuery(NamedTuple):
+    """
+    A query that took at least the slow query threshold.
+    """
+
+    query_type: str
+    container: str
+    query: Optional[str]
+    seconds: float
+    parse_seconds: float
+    plan: Optional[str]
+    scanned: Optional[int]
+    returned: int
+    timestamp: float
+
+
+class QueryProfile:
+    """
+    The profile of a query being executed. Queries fill it in as they run.
+    """
+
+    __slots__ = (
+        "query_type",
+        "container",
+        "query",
+        "parse_seconds",
+        "plan",
+        "scanned",
+        "returned",
+    )
+
+    def __init__(self, query_type: str, container: str, query: Optional[str]):
+        self.query_type = query_type
+        self.container = container
+        self.query = query
+        self.parse_seconds = 0.0
+        self.plan: Optional[str] = None
+        self.scanned: Optional[int] = None
+        self.returned = 0
+
+    def count_scanned(self, documents):
+        """
+        Counts the documents of an iterable as they are scanned.
+        :param documents: The documents produced by the query plan.
+        :return: An iterator over the documents.
+        """
+        self.scanned = self.scanned or 0
+
+        for document in documents:
+            self.scanned += 1
+            yield document
+
+    def to_slow_query(self, seconds: float) -> SlowQuery:
+        """
+        Creates the slow query log entry of the query.
+        :param seconds: The duration of the query.
+        :return: The slow query.
+        """
+        return SlowQuery(
+            self.query_type,
+            self.container,
+            self.query,
+            seconds,
+            self.parse_seconds,
+            self.plan,
+            self.scanned,
+            self.returned,
+            time.time(),
+        )
+
+
+class Histogram:
+    """
+    A timing histogram with exponential buckets from one microsecond to about
+    two minutes. Percentiles are estimated by the upper bound of their bucket.
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS):
+        """
+        Creates a Histogram instance.
+        :param bounds: The ascending upper bounds of the buckets, in seconds.
+        Durations above the last bound are counted in an overflow bucket.
+        """
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, seconds: float):
+        """
+        Records a duration.
+        :param seconds: The duration.
+        """
+        low, high = 0, len(self._bounds)
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self._bounds[middle] < seconds:
+                low = middle + 1
+            else:
+                high = middle
+
+        self._counts[low] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def mean(self) -> Optional[float]:
+        """
+        Computes the mean duration.
+        :return: The mean, or None when nothing was recorded.
+        """
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Estimates a percentile.
+        :param percent: The percentile, between 0 and 100.
+        :return: The upper bound of the bucket holding the percentile, capped
+        at the maximum duration, or None when nothing was recorded.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, percent / 100 * self.count)
+        seen = 0
+
+        for bound, count in zip(self._bounds, self._counts):
+            seen += count
+
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def get_buckets(self) -> List[Tuple[float, int]]:
+        """
+        Lists the buckets.
+        :return: (upper bound, count) tuples. The overflow bucket has an
+        infinite upper bound.
+        """
+        return list(zip(self._bounds + (float("inf"),), self._counts))
+
+
+class Instrumentation:
+    """
+    Collects counters, timing histograms and slow queries, and passes every
+    event on to its callbacks. Callbacks run on the thread that made the call,
+    so they should be quick. The collector is safe to use from multiple threads.
+    """
+
+    def __init__(
+        self, slow_query_seconds: Optional[float] = None, slow_query_log_size: int = 100
+    ):
+        """
+        Creates an Instrumentation instance.
+        :param slow_query_seconds: Queries taking at least this many seconds are
+        kept in the slow query log. When not specified, no queries are logged.
+        :param slow_query_log_size: The maximum number of slow queries kept.
+        The oldest slow queries are dropped first.
+        """
+        ensure.greater_than_zero(
+            slow_query_log_size,
+            errors.ObjectCreateError("Slow query log size must be greater than zero."),
+        )
+
+        self._slow_query_seconds = slow_query_seconds
+        self._slow_queries: "deque[SlowQuery]" = deque(maxlen=slow_query_log_size)
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._callbacks: List[Callable[[Event], None]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_callback(self, callback: Callable[[Event], None]):
+        """
+        Adds a callback that is called with every event.
+        :param callback: A callable that accepts an Event.
+        """
+        ensure.not_none(callback, errors.ObjectCreateError("Callback cannot be of type None."))
+
+        with self._lock:
+            self._callbacks = self._callbacks + [callback]
+
+    def remove_callback(self, callback: Callable[[Event], None]):
+        """
+        Removes a callback.
+        :param callback: The callback to remove.
+        """
+        with self._lock:
+            self._callbacks = [item for item in self._callbacks if item != callback]
+
+    def increment(self, name: str, amount: int = 1):
+        """
+        Increments a counter.
+        :param name: The counter name.
+        :param amount: The amount to add.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float, **attributes):
+        """
+        Records a timed call: its counter is incremented, its duration is added
+        to its histogram and the callbacks are called.
+        :param name: The operation name.
+        :param seconds: The duration of the call.
+        :param attributes: Details of the call.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            histogram = self._histograms.get(name)
+
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+
+            histogram.add(seconds)
+            callbacks = self._callbacks
+
+        if callbacks:
+            event = Event(name, seconds, attributes)
+
+            for callback in callbacks:
+                callback(event)
+
+    @contextmanager
+    def timer(self, name: str, **attributes):
+        """
+        Times a with block and records it with observe. Blocks that raise are
+        counted as '<name>.errors' instead.
+        :param name: The operation name.
+        :param attributes: Details of the call.
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        except Exception:
+            self.increment(f"{name}.errors")
+            raise
+
+        self.observe(name, time.perf_counter() - start, **attributes)
+
+    @contextmanager
+    def profile_query(self, query_type: str, container: str, query: Optional[str]):
+        """
+        Profiles a query executed in a with block. The profile is the current
+        query profile of the thread until the block ends, and is recorded as a
+        'query.execute' event.
+        :param query_type: The query class name.
+        :param container: The container name.
+        :param query: The query string, if any.
+        :return: The query profile.
+        """
+        profile = QueryProfile(query_type, container, query)
+        outer = getattr(self._local, "profile", None)
+        self._local.profile = profile
+        start = time.perf_counter()
+
+        try:
+            yield profile
+        except Exception:
+            self.increment("query.execute.errors")
+            raise
+        finally:
+            self._local.profile = outer
+
+        seconds = time.perf_counter() - start
+        self._record_query(profile, seconds)
+
+    def current_query(self) -> Optional[QueryProfile]:
+        """
+        Retrieves the profile of the query being executed on this thread.
+        :return: The query profile, or None.
+        """
+        return getattr(self._local, "profile", None)
+
+    def _record_query(self, profile: QueryProfile, seconds: float):
+        with self._lock:
+            self._counters["query.returned"] = (
+                self._counters.get("query.returned", 0) + profile.returned
+            )
+
+            if profile.scanned is not None:
+                self._counters["query.scanned"] = (
+                    self._counters.get("query.scanned", 0) + profile.scanned
+                )
+
+            if self._slow_query_seconds is not None and seconds >= self._slow_query_seconds:
+                self._slow_queries.append(profile.to_slow_query(seconds))
+
+        self.observe(
+            "query.execute",
+            seconds,
+            query_type=profile.query_type,
+            container=profile.container,
+            query=profile.query,
+            parse_seconds=profile.parse_seconds,
+            plan=profile.plan,
+            scanned=profile.scanned,
+            returned=profile.returned,
+        )
+
+    def get_counters(self) -> Dict[str, int]:
+        """
+        Retrieves the counters.
+        :return: A copy of the counters by name.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def get_histogram(self, name: str) -> Optional[Histogram]:
+        """
+        Retrieves the timing histogram of an operation.
+        :param name: The operation name.
+        :return: The histogram, or None when the operation was not recorded.
+        """
+        with self._lock:
+            return self._histograms.get(name)
+
+    def list_histograms(self) -> List[str]:
+        """
+        Lists the operations that have a timing histogram.
+        :return: The operation names.
+        """
+        with self._lock:
+            return sorted(self._histograms)
+
+    def get_slow_queries(self) -> List[SlowQuery]:
+        """
+        Retrieves the slow query log.
+        :return: The slow queries, oldest first.
+        """
+        with self._lock:
+            return list(self._slow_queries)
+
+    def reset(self):
+        """
+        Clears the counters, histograms and slow query log.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._slow_queries.clear()
+
+
+def enable(instrumentation: Optional[Instrumentation] = None) -> Instrumentation:
+    """
+    Enables instrumentation for the whole process.
+    :param instrumentation: The collector. When not specified, a new collector
+    without a slow query threshold is created.
+    :return: The active collector.
+    """
+    global ACTIVE  # pylint: disable=global-statement
+    ACTIVE = instrumentation if instrumentation is not None else Instrumentation()
+
+    return ACTIVE
+
+
+def disable():
+    """
+    Disables instrumentation.
+    """
+    global ACTIVE  # pylint: disable=global-statement
+    ACTIVE = None
+
+
+def timed(name: str):
+    """
+    Decorates a function so its calls are timed while instrumentation is enabled.
+    :param name: The operation name.
+    :return: The decorator.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            collector = ACTIVE
+
+            if collector is None:
+                return function(*args, **kwargs)
+
+            with collector.timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
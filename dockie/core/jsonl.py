@@ -0,0 +1,69 @@
+"""
+JSON Lines module. Containers and databases are exported one document per
+line and imported line by line, so moving a dataset never holds more than one
+batch of decoded documents in memory.
+"""
+import json
+from typing import Iterable, Iterator, Tuple
+
+from dockie.core import errors, files
+
+
+def write_records(filename: str, records: Iterable[dict], overwrite=False) -> int:
+    """
+    Writes records to a JSON Lines file, one record per line. The records are
+    written to a temporary file that replaces the file once every record is
+    written, so a failed export leaves an existing file intact.
+    :param filename: The file name.
+    :param records: The records.
+    :param overwrite: When True and the file exists, the file is overwritten.
+    When False and the file exists, an error is raised.
+    :return: The number of records written.
+    """
+    files.validate_destination(filename, overwrite, "the documents will not be exported")
+    count = 0
+
+    with files.replace_atomically(filename, "w", "utf-8") as file:
+        for record in records:
+            try:
+                line = json.dumps(record, separators=(",", ":"))
+            except (TypeError, ValueError) as error:
+                raise errors.PersistenceError(
+                    f"Document '{record.get('id')}' cannot be encoded as JSON."
+                ) from error
+
+            file.write(line)
+            file.write("\n")
+            count += 1
+
+    return count
+
+
+def read_records(filename: str, fields: Tuple[str, ...]) -> Iterator[dict]:
+    """
+    Reads records from a JSON Lines file one line at a time. Blank lines are skipped.
+    :param filename: The file name.
+    :param fields: The fields every record must have.
+    :return: An iterator over the records.
+    """
+    files.validate_source(filename)
+
+    with open(filename, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise errors.PersistenceError(
+                    f"Line {line_number} of '{filename}' is not valid JSON."
+                ) from error
+
+            if not isinstance(record, dict) or any(field not in record for field in fields):
+                raise errors.PersistenceError(
+                    f"Line {line_number} of '{filename}' must be an object with "
+                    f"the fields {', '.join(fields)}."
+                )
+
+            yield record
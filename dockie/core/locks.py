@@ -0,0 +1,147 @@
+"""
+Locks module.
+"""
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, Optional
+
+
+class ReadWriteLock:
+    """
+    A readers-writer lock. Any number of threads may hold the lock for reading,
+    while a writer holds it exclusively. Waiting writers are preferred over new
+    readers so a steady stream of readers cannot starve them.
+
+    The lock is reentrant: a thread may acquire the read lock again while it
+    holds it, and the thread holding the write lock may acquire either lock
+    again. A thread holding only the read lock cannot upgrade to the write lock.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the lock for reading for the duration of a with block.
+        """
+        self.acquire_read()
+
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the lock for writing for the duration of a with block.
+        """
+        self.acquire_write()
+
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+    def acquire_read(self):
+        """
+        Acquires the lock for reading, waiting while a writer holds or waits for it.
+        """
+        thread_id = threading.get_ident()
+
+        with self._condition:
+            if self._writer != thread_id and thread_id not in self._readers:
+                self._condition.wait_for(
+                    lambda: self._writer is None and not self._waiting_writers
+                )
+
+            self._readers[thread_id] = self._readers.get(thread_id, 0) + 1
+
+    def release_read(self):
+        """
+        Releases the lock acquired for reading.
+        """
+        thread_id = threading.get_ident()
+
+        with self._condition:
+            count = self._readers[thread_id] - 1
+
+            if count:
+                self._readers[thread_id] = count
+            else:
+                del self._readers[thread_id]
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Acquires the lock for writing, waiting until no other thread holds it.
+        """
+        thread_id = threading.get_ident()
+
+        with self._condition:
+            if self._writer == thread_id:
+                self._write_depth += 1
+                return
+
+            if thread_id in self._readers:
+                raise RuntimeError("A read lock cannot be upgraded to a write lock.")
+
+            self._waiting_writers += 1
+
+            try:
+                self._condition.wait_for(
+                    lambda: self._writer is None and not self._readers
+                )
+            finally:
+                self._waiting_writers -= 1
+
+            self._writer = thread_id
+            self._write_depth = 1
+
+    def release_write(self):
+        """
+        Releases the lock acquired for writing.
+        """
+        with self._condition:
+            self._write_depth -= 1
+
+            if not self._write_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class ReadWriteLockGroup:
+    """
+    Holds a group of readers-writer locks together. The locks are always
+    acquired in the same order, so two groups over the same locks cannot deadlock.
+    """
+
+    def __init__(self, locks: List[ReadWriteLock]):
+        self._locks = locks
+
+    @contextmanager
+    def read(self):
+        """
+        Holds every lock for reading for the duration of a with block.
+        """
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock.read())
+
+            yield self
+
+    @contextmanager
+    def write(self):
+        """
+        Holds every lock for writing for the duration of a with block.
+        """
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock.write())
+
+            yield self
@@ -0,0 +1,483 @@
+"""
+Partitioned container module. A partitioned container spreads its documents
+over a fixed number of containers by a stable hash of the document id, so no
+single dict has to hold, resize or persist the whole dataset.
+"""
+import functools
+import threading
+import zlib
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Union
+
+from dockie.core import budget, ensure, errors, events, features, index
+from dockie.core.container import (
+    BulkLoadResult,
+    Container,
+    DocumentIds,
+    to_documents,
+    validate_ids,
+)
+from dockie.core.document import NONE_DOCUMENT, Document
+from dockie.core.locks import ReadWriteLockGroup
+
+
+def partition_of(document_id, partitions: int) -> int:
+    """
+    Maps a document id to a partition. The mapping does not depend on the
+    process, so documents stay in the same partition across restarts.
+    :param document_id: The document id.
+    :param partitions: The number of partitions.
+    :return: The partition number.
+    """
+    return zlib.crc32(str(document_id).encode("utf-8")) % partitions
+
+
+# PartitionedContainer is a drop-in replacement for Container, so it has the
+# same public API; most of its methods forward to the partitions.
+class PartitionedContainer(  # pylint: disable=too-many-public-methods
+    features.ResultCacheMixin, features.ChangeFeedMixin, events.Observable
+):
+    """
+    A container whose documents are hash-partitioned by id over several
+    containers. It has the same document API as Container, and attribute
+    queries fan out across the partitions.
+
+    Each partition has its own readers-writer lock, so writers to different
+    partitions do not block each other. Indexes and columns are kept per
+    partition. Listeners receive the mutations of every partition; mutations
+    name the partition, which has the same name as this container. The result
+    cache and the change feed cover the container as a whole: one feed
+    sequences the changes of every partition.
+    """
+
+    def __init__(self, name: str, partitions: int = 8):
+        """
+        Creates a PartitionedContainer instance.
+        :param name: The container name.
+        :param partitions: The number of partitions.
+        """
+        super().__init__()
+        ensure.not_none_or_whitespace(
+            name, errors.ObjectCreateError("Container name not specified.")
+        )
+        ensure.greater_than_zero(
+            partitions,
+            errors.ObjectCreateError("Number of partitions must be greater than zero."),
+        )
+
+        self._name = name
+        self._partitions = [Container(name) for _ in range(partitions)]
+        self._dirty: Set[int] = set(range(partitions))
+        self._dirty_lock = threading.Lock()
+        # Expiry is kept by the partitions; only their sweeper is shared.
+        self._features = features.ContainerFeatures()
+        self._track_partitions()
+
+    @classmethod
+    def from_partitions(cls, name: str, partitions: List[Container]) -> "PartitionedContainer":
+        """
+        Creates a PartitionedContainer instance from populated partitions, for
+        example partitions loaded from files. The partitions are not marked as changed.
+        :param name: The container name.
+        :param partitions: The partitions, in partition order.
+        :return: The PartitionedContainer instance.
+        """
+        container = cls(name, len(partitions))
+        container._partitions = list(partitions)
+        container._dirty.clear()
+        container._track_partitions()
+        return container
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["_dirty_lock"]
+        return state
+
+    def __setstate__(self, state):
+        # Containers pickled before the features were grouped kept them apart.
+        for name in ("_result_cache", "_sweeper", "_feed"):
+            state.pop(name, None)
+
+        super().__setstate__(state)
+        self.__dict__.setdefault("_features", features.ContainerFeatures())
+        self._dirty_lock = threading.Lock()
+        self._track_partitions()
+
+    def _track_partitions(self):
+        for number, partition in enumerate(self._partitions):
+            partition.add_listener(functools.partial(self._on_mutation, number))
+
+            for listener in self._listeners:
+                partition.add_listener(listener)
+
+    def _on_mutation(self, number: int, _: events.Mutation):
+        with self._dirty_lock:
+            self._dirty.add(number)
+
+    def get_lock(self) -> ReadWriteLockGroup:
+        """
+        Retrieves a lock over every partition.
+        :return: The lock group.
+        """
+        return ReadWriteLockGroup([partition.get_lock() for partition in self._partitions])
+
+    def get_name(self) -> str:
+        """
+        Retrieves the container name.
+        :return: The container name.
+        """
+        return self._name
+
+    def count_partitions(self) -> int:
+        """
+        Counts the partitions.
+        :return: The number of partitions.
+        """
+        return len(self._partitions)
+
+    def list_partitions(self) -> List[Container]:
+        """
+        Lists the partitions in partition order.
+        :return: The partitions.
+        """
+        return list(self._partitions)
+
+    def get_partition(self, document_id) -> Container:
+        """
+        Retrieves the partition that holds a document id.
+        :param document_id: The document id.
+        :return: The partition.
+        """
+        return self._partitions[partition_of(document_id, len(self._partitions))]
+
+    def list_dirty_partitions(self) -> List[int]:
+        """
+        Lists the partitions changed since they were last marked clean.
+        :return: The partition numbers.
+        """
+        with self._dirty_lock:
+            return sorted(self._dirty)
+
+    def mark_clean(self, number: int):
+        """
+        Marks a partition as saved. Callers hold the partition's read lock while
+        saving it, so no change can be missed.
+        :param number: The partition number.
+        """
+        with self._dirty_lock:
+            self._dirty.discard(number)
+
+    def list_documents(self):
+        """
+        Lists the documents in the container.
+        :return: The id's of the documents in the container, partition by partition.
+        """
+        return [
+            document_id
+            for partition in self._partitions
+            for document_id in partition.list_documents()
+        ]
+
+    def count_documents(self) -> int:
+        """
+        Counts the documents in the container.
+        :return: The number of documents.
+        """
+        return sum(partition.count_documents() for partition in self._partitions)
+
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        Iterates over the documents partition by partition. Each partition is
+        read from its own snapshot, taken when the iteration reaches it.
+        :return: An iterator over the documents.
+        """
+        return chain.from_iterable(
+            partition.iter_documents() for partition in self._partitions
+        )
+
+    def add_document(self, document: Document, ttl: Optional[float] = None):
+        """
+        Adds a document to its partition. A document with the same id is replaced.
+        :param document: The document to add.
+        :param ttl: The number of seconds the document lives, see Container.add_document.
+        """
+        ensure.not_none(
+            document, errors.ObjectCreateError("Document cannot be of type None.")
+        )
+
+        self.get_partition(document.get_id()).add_document(document, ttl)
+
+    def add_documents(
+        self,
+        documents: Iterable,
+        batch_size: int = 1000,
+        progress: Callable[[int], None] = None,
+        ttl: Optional[float] = None,
+    ) -> BulkLoadResult:
+        """
+        Adds many documents, see Container.add_documents. Each batch is validated
+        as a whole before it is split across the partitions.
+        :param documents: The documents to add, as Document instances or
+        (document_id, data) tuples.
+        :param batch_size: The number of documents validated and inserted at a time.
+        :param progress: A callable called after every batch with the number of
+        documents added so far.
+        :param ttl: The number of seconds each document lives, see Container.add_document.
+        :return: The number of inserted and replaced documents.
+        """
+        ensure.not_none(
+            documents, errors.ObjectCreateError("Documents cannot be of type None.")
+        )
+        ensure.greater_than_zero(
+            batch_size, errors.ObjectCreateError("Batch size must be greater than zero.")
+        )
+
+        inserted = 0
+        replaced = 0
+        items = iter(documents)
+
+        for batch in iter(lambda: list(islice(items, batch_size)), []):
+            groups: List[List[Document]] = [[] for _ in self._partitions]
+
+            for document in to_documents(batch):
+                groups[partition_of(document.get_id(), len(groups))].append(document)
+
+            for partition, group in zip(self._partitions, groups):
+                if group:
+                    result = partition.add_documents(group, len(group), ttl=ttl)
+                    inserted += result.inserted
+                    replaced += result.replaced
+
+            if progress is not None:
+                progress(inserted + replaced)
+
+        return BulkLoadResult(inserted, replaced)
+
+    def get_document(self, document_id) -> Document:
+        """
+        Retrieves a document by its id from its partition.
+        :param document_id: The document id.
+        :return: The document. If the document was not found, the shared
+        NONE_DOCUMENT instance is returned instead.
+        """
+        return self.get_partition(document_id).get_document(document_id)
+
+    def get_documents(self, document_ids: Iterable) -> List[Document]:
+        """
+        Retrieves several documents by their ids, see Container.get_documents.
+        The ids are grouped by partition and each partition reads its group at once.
+        :param document_ids: The document ids.
+        :return: The documents in the order of the ids. Each id that was not
+        found is marked by the shared NONE_DOCUMENT instance.
+        """
+        document_ids = validate_ids(document_ids)
+        groups: List[List[int]] = [[] for _ in self._partitions]
+
+        for position, document_id in enumerate(document_ids):
+            groups[partition_of(document_id, len(groups))].append(position)
+
+        found: List[Document] = [NONE_DOCUMENT] * len(document_ids)
+
+        for partition, positions in zip(self._partitions, groups):
+            if positions:
+                documents = partition.get_documents(
+                    DocumentIds(document_ids[position] for position in positions)
+                )
+
+                for position, document in zip(positions, documents):
+                    found[position] = document
+
+        return found
+
+    def add_index(self, path: str, index_type: str = index.HASH):
+        """
+        Adds a secondary index to every partition, see Container.add_index.
+        :param path: The dotted attribute path.
+        :param index_type: The index type, 'hash' or 'sorted'.
+        """
+        for partition in self._partitions:
+            partition.add_index(path, index_type)
+
+        self._mark_all_dirty()
+
+    def list_indexes(self) -> List[str]:
+        """
+        Lists the indexed attribute paths.
+        :return: The indexed attribute paths.
+        """
+        return self._partitions[0].list_indexes()
+
+    def get_index_type(self, path: str) -> Optional[str]:
+        """
+        Retrieves the type of the partitions' index on an attribute path.
+        :param path: The dotted attribute path.
+        :return: The index type, or None when the path is not indexed.
+        """
+        document_index = self._partitions[0].get_index(path)
+
+        return None if document_index is None else document_index.index_type
+
+    def add_column(self, path: str):
+        """
+        Adds a columnar projection to every partition, see Container.add_column.
+        :param path: The dotted attribute path.
+        """
+        for partition in self._partitions:
+            partition.add_column(path)
+
+        self._mark_all_dirty()
+
+    def list_columns(self) -> List[str]:
+        """
+        Lists the columnar projections.
+        :return: The column paths.
+        """
+        return self._partitions[0].list_columns()
+
+    def get_version(self) -> int:
+        """
+        Retrieves the container version, the sum of the partition versions.
+        :return: The container version.
+        """
+        return sum(partition.get_version() for partition in self._partitions)
+
+    def enable_expiry(
+        self, default_ttl: Optional[float] = None, sweep_interval: Optional[float] = 1.0
+    ):
+        """
+        Enables document expiry on every partition, see Container.enable_expiry.
+        A single sweeper removes the expired documents of all partitions.
+        :param default_ttl: The number of seconds documents added without a
+        time to live are kept. When not specified, they do not expire.
+        :param sweep_interval: The number of seconds between background sweeps.
+        When None, expired documents are only removed by expire.
+        """
+        if sweep_interval is not None:
+            ensure.greater_than_zero(
+                sweep_interval,
+                errors.ObjectCreateError("Sweep interval must be greater than zero."),
+            )
+
+        self._features.stop_sweeper()
+
+        for partition in self._partitions:
+            partition.enable_expiry(default_ttl, None)
+            partition.get_expiry_queue().sweep_interval = sweep_interval
+
+        self._features.start_sweeper(self._partitions, sweep_interval)
+
+    def disable_expiry(self):
+        """
+        Disables document expiry on every partition, see Container.disable_expiry.
+        """
+        self._features.stop_sweeper()
+
+        for partition in self._partitions:
+            partition.disable_expiry()
+
+    def is_expiry_enabled(self) -> bool:
+        """
+        Checks whether document expiry is enabled.
+        :return: True if expiry is enabled, otherwise False.
+        """
+        return self._partitions[0].is_expiry_enabled()
+
+    def has_expired_documents(self) -> bool:
+        """
+        Checks whether a partition has expired documents that have not been
+        removed yet.
+        :return: True if there are expired documents, otherwise False.
+        """
+        return any(partition.has_expired_documents() for partition in self._partitions)
+
+    def get_expiry(self, document_id) -> Optional[float]:
+        """
+        Retrieves the time a document expires at, see Container.get_expiry.
+        :param document_id: The document id.
+        :return: The expiry time, or None when the document does not expire.
+        """
+        return self.get_partition(document_id).get_expiry(document_id)
+
+    def set_expiry(self, document_id, expires_at: Optional[float]) -> bool:
+        """
+        Sets the time a document expires at, see Container.set_expiry.
+        :param document_id: The document id.
+        :param expires_at: The expiry time. When None, the document no longer expires.
+        :return: True if the document was found, otherwise False.
+        """
+        return self.get_partition(document_id).set_expiry(document_id, expires_at)
+
+    def expire(self, limit: Optional[int] = None) -> int:
+        """
+        Removes expired documents from every partition, see Container.expire.
+        :param limit: The maximum number of documents to remove per partition.
+        :return: The number of removed documents.
+        """
+        return sum(partition.expire(limit) for partition in self._partitions)
+
+    def set_memory_budget(
+        self,
+        memory_budget: Union[int, budget.MemoryBudget],
+        mode: str = budget.DROP,
+        spill_directory: Optional[str] = None,
+    ):
+        """
+        Keeps the resident documents of all partitions within one memory budget,
+        see Container.set_memory_budget.
+        :param memory_budget: The approximate number of bytes the documents may
+        use, or a MemoryBudget shared with other containers.
+        :param mode: 'drop' or 'spill'.
+        :param spill_directory: The directory of the spill files.
+        """
+        if not isinstance(memory_budget, budget.MemoryBudget):
+            memory_budget = budget.MemoryBudget(memory_budget)
+
+        for partition in self._partitions:
+            partition.set_memory_budget(memory_budget, mode, spill_directory)
+
+    def remove_memory_budget(self):
+        """
+        Removes the memory budget of every partition.
+        """
+        for partition in self._partitions:
+            partition.remove_memory_budget()
+
+    def get_memory_stats(self) -> Optional[budget.MemoryStats]:
+        """
+        Retrieves the memory statistics of all partitions combined.
+        :return: The statistics, or None when the container has no memory budget.
+        """
+        stats = [partition.get_memory_stats() for partition in self._partitions]
+
+        if stats[0] is None:
+            return None
+
+        return budget.MemoryStats(
+            stats[0].max_bytes,
+            stats[0].used_bytes,
+            *(sum(counts) for counts in list(zip(*stats))[2:]),
+        )
+
+    def add_listener(self, listener: Callable[[events.Mutation], None]):
+        """
+        Adds a listener that is called after every mutation of any partition.
+        :param listener: A callable that accepts a Mutation.
+        """
+        super().add_listener(listener)
+
+        for partition in self._partitions:
+            partition.add_listener(listener)
+
+    def remove_listener(self, listener: Callable[[events.Mutation], None]):
+        """
+        Removes a listener from the container and its partitions.
+        :param listener: The listener to remove.
+        """
+        super().remove_listener(listener)
+
+        for partition in self._partitions:
+            partition.remove_listener(listener)
+
+    def _mark_all_dirty(self):
+        with self._dirty_lock:
+            self._dirty.update(range(len(self._partitions)))
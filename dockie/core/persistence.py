@@ -1,47 +1,543 @@
 """
-Persistence module.
+Persistence module. A database file starts with a header that records the
+codec and compression the rest of the file was written with. The payload is a
+plain description of the containers, their documents, indexes and columns, so
+files do not depend on the Python class layout of the database.
+
+Documents are replaced rather than changed in place, so holding references to
+the documents is a point-in-time view of a container. Saves capture that view
+while writers are blocked and encode and write it afterwards, to a temporary
+file that is renamed into place, which also lets saves run in the background.
 """
+import json
 import os.path
 import pickle
+import struct
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
 
-from dockie.core import ensure, errors
+from dockie.core import codecs, ensure, errors, events, files, instrumentation
+from dockie.core.container import Container
 from dockie.core.database import Database
+from dockie.core.partition import PartitionedContainer
+
+MAGIC = b"DOCKIEDB"
+VERSION = 1
+
+MANIFEST_FILENAME = "manifest.json"
+
+_HEADER = struct.Struct(">8sI16sI16s")
 
 
-def persist_to_file(database: Database, filename: str, overwrite=False):
+def validate_destination(database: Database, filename: str, overwrite: bool):
     """
-    Persists the database to a pickle file.
+    Ensures a database can be persisted to a file.
     :param database: The database.
     :param filename: The file name.
-    :param overwrite: When True and the file exists, the file is overwritten.
-    When False and the file exists, an error is raised.
+    :param overwrite: When False and the file exists, an error is raised.
     """
     ensure.not_none(database, errors.PersistenceError("Database not specified."))
-    ensure.not_none_or_whitespace(
-        filename, errors.PersistenceError("File name not specified.")
+    files.validate_destination(
+        filename, overwrite, "the database will not be persisted"
     )
 
-    if os.path.exists(filename) and not overwrite:
+
+def validate_source(filename: str):
+    """
+    Ensures a database can be loaded from a file.
+    :param filename: The file name.
+    """
+    files.validate_source(filename)
+
+
+def ensure_pickle_allowed(filename: str, allow_pickle: bool):
+    """
+    Ensures a file encoded with pickle may be loaded.
+    :param filename: The file name.
+    :param allow_pickle: When False, an error is raised.
+    """
+    if not allow_pickle:
         raise errors.PersistenceError(
-            f"File '{filename}' exists and overwrite is False, "
-            f"therefore the database will not be persisted."
+            f"The file '{filename}' is encoded with pickle, which can run arbitrary "
+            f"code when it is loaded. Pass allow_pickle=True to load files you trust."
         )
 
-    with open(filename, "wb") as file:
-        pickle.dump(database, file)
 
+@instrumentation.timed("persistence.persist_to_file")
+def persist_to_file(
+    database: Database,
+    filename: str,
+    overwrite=False,
+    codec: str = codecs.DEFAULT,
+    compression: str = None,
+):
+    """
+    Persists the database to a file. Writers are blocked only while the
+    documents are captured, so the file holds a consistent view of the database.
+    :param database: The database.
+    :param filename: The file name.
+    :param overwrite: When True and the file exists, the file is overwritten.
+    When False and the file exists, an error is raised.
+    :param codec: The name of the codec that encodes the database, such as
+    'json', 'msgpack' or 'pickle'. JSON is used when not specified; pickle
+    supports any Python value, but its files are only loaded with allow_pickle.
+    :param compression: The name of the compression applied to the encoded
+    database, such as 'zlib' or 'lz4'. When not specified, the file is not compressed.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    validate_destination(database, filename, overwrite)
+    document_codec = codecs.get_codec(codec)
+    document_compression = codecs.get_compression(compression)
+
+    payload = document_codec.encode(_capture(database))
+    _write_payload(filename, payload, document_codec, document_compression)
+
+
+def persist_in_background(
+    database: Database,
+    filename: str,
+    overwrite=False,
+    codec: str = codecs.DEFAULT,
+    compression: str = None,
+) -> Future:
+    """
+    Persists the database to a file on a background thread. The database is
+    captured before this function returns, so the file holds the database as
+    it was at the call; mutations made while the file is written are not included.
+    The capture refers to the data of the documents rather than copying it, so
+    document data must not be changed in place; replace documents instead.
+    :param database: The database.
+    :param filename: The file name.
+    :param overwrite: When True and the file exists, the file is overwritten.
+    When False and the file exists, an error is raised.
+    :param codec: The name of the codec that encodes the database.
+    :param compression: The name of the compression applied to the encoded database.
+    :return: A future that completes with the file name once the file is in place.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    validate_destination(database, filename, overwrite)
+    document_codec = codecs.get_codec(codec)
+    document_compression = codecs.get_compression(compression)
+    description = _capture(database)
+    future = Future()
+
+    def write():
+        try:
+            _encode_and_write(description, filename, document_codec, document_compression)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            future.set_exception(error)
+        else:
+            future.set_result(filename)
+
+    future.set_running_or_notify_cancel()
+    threading.Thread(target=write, daemon=True).start()
+
+    return future
+
+
+class SnapshotScheduler:  # pylint: disable=too-many-instance-attributes
+    """
+    Persists a database in the background every so many seconds, after every
+    so many mutations, or both. A save only runs when the database has changed
+    since the last one, and saves never overlap. Each save captures the
+    database while writers are blocked and writes it without blocking them.
+    As with persist_in_background, document data must not be changed in place.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        filename: str,
+        interval: Optional[float] = None,
+        mutations: Optional[int] = None,
+        codec: str = codecs.DEFAULT,
+        compression: str = None,
+    ):
+        """
+        Creates a SnapshotScheduler instance and starts its thread.
+        :param database: The database.
+        :param filename: The file name. The file is overwritten by every save.
+        :param interval: The number of seconds between saves.
+        :param mutations: The number of mutations that triggers a save.
+        :param codec: The name of the codec that encodes the database.
+        :param compression: The name of the compression applied to the encoded database.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        validate_destination(database, filename, overwrite=True)
+
+        if interval is None and mutations is None:
+            raise errors.PersistenceError(
+                "Snapshot schedule not specified. Specify an interval, a number "
+                "of mutations, or both."
+            )
+
+        for setting, name in ((interval, "interval"), (mutations, "mutation count")):
+            if setting is not None:
+                ensure.greater_than_zero(
+                    setting,
+                    errors.PersistenceError(f"Snapshot {name} must be greater than zero."),
+                )
+
+        self._database = database
+        self._filename = filename
+        self._interval = interval
+        self._mutations = mutations
+        self._codec = codecs.get_codec(codec)
+        self._compression = codecs.get_compression(compression)
+        self._pending = 0
+        self._saves = 0
+        self._last_error: Optional[Exception] = None
+        self._state_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._database.add_listener(self._on_mutation)
+        self._thread = threading.Thread(target=self._save_periodically, daemon=True)
+        self._thread.start()
+
+    def save(self):
+        """
+        Saves the database on the calling thread, whether or not it changed.
+        """
+        with self._save_lock:
+            with self._state_lock:
+                self._pending = 0
+
+            _encode_and_write(
+                _capture(self._database), self._filename, self._codec, self._compression
+            )
+
+            with self._state_lock:
+                self._saves += 1
+
+    def get_save_count(self) -> int:
+        """
+        Retrieves the number of completed saves.
+        :return: The number of saves.
+        """
+        with self._state_lock:
+            return self._saves
+
+    def get_last_error(self) -> Optional[Exception]:
+        """
+        Retrieves the error raised by the last scheduled save.
+        :return: The error, or None when the last save succeeded.
+        """
+        with self._state_lock:
+            return self._last_error
+
+    def stop(self, save: bool = True):
+        """
+        Stops the schedule and waits for a running save to finish.
+        :param save: When True and the database changed since the last save,
+        a final save runs before this method returns.
+        """
+        self._database.remove_listener(self._on_mutation)
 
-def load_from_file(filename: str) -> Database:
+        with self._state_lock:
+            self._stopped = True
+
+        self._wake.set()
+        self._thread.join()
+
+        with self._state_lock:
+            pending = self._pending
+
+        if save and pending:
+            self.save()
+
+    def _on_mutation(self, _: events.Mutation):
+        with self._state_lock:
+            self._pending += 1
+
+            if self._mutations is not None and self._pending >= self._mutations:
+                self._wake.set()
+
+    def _save_periodically(self):
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+
+            with self._state_lock:
+                stopped, pending = self._stopped, self._pending
+
+            if stopped:
+                return
+
+            if not pending:
+                continue
+
+            try:
+                self.save()
+                error = None
+            except Exception as save_error:  # pylint: disable=broad-exception-caught
+                error = save_error
+
+            with self._state_lock:
+                self._last_error = error
+
+
+@instrumentation.timed("persistence.load_from_file")
+def load_from_file(filename: str, allow_pickle: bool = False) -> Database:
     """
-    Loads the database from a pickle file.
+    Loads the database from a file written by persist_to_file. Loading pickle
+    can run arbitrary code, so files encoded with pickle, and files written
+    before databases recorded their codec, are only loaded when allowed.
     :param filename: The file name.
+    :param allow_pickle: When True, files encoded with pickle are loaded. Only
+    allow pickle for files you trust.
     :return: The Database instance.
     """
+    validate_source(filename)
+
+    with open(filename, "rb") as file:
+        header = file.read(_HEADER.size)
+
+        if len(header) < _HEADER.size or not header.startswith(MAGIC):
+            ensure_pickle_allowed(filename, allow_pickle)
+            file.seek(0)
+            return pickle.load(file)
+
+    database = Database()
+
+    for entry in _read_payload(filename, allow_pickle)["containers"]:
+        database.attach_container(_build_container(entry))
+
+    return database
+
+
+@instrumentation.timed("persistence.save_partitions")
+def save_partitions(
+    container: PartitionedContainer,
+    directory: str,
+    codec: str = codecs.DEFAULT,
+    compression: str = None,
+) -> List[int]:
+    """
+    Saves a partitioned container to a directory holding a manifest and one
+    file per partition. Only the partitions changed since the last save, and
+    partitions whose file is missing, are written. Each partition is written
+    while its own writers are blocked, to a temporary file that is renamed into place.
+    :param container: The partitioned container.
+    :param directory: The directory. It is created when it does not exist.
+    :param codec: The name of the codec that encodes each partition.
+    :param compression: The name of the compression applied to each partition.
+    :return: The numbers of the partitions that were written.
+    """
+    ensure.not_none(container, errors.PersistenceError("Container not specified."))
+    ensure.not_none_or_whitespace(
+        directory, errors.PersistenceError("Directory not specified.")
+    )
+    document_codec = codecs.get_codec(codec)
+    document_compression = codecs.get_compression(compression)
+    os.makedirs(directory, exist_ok=True)
+
+    dirty = set(container.list_dirty_partitions())
+    written = []
+
+    for number, partition in enumerate(container.list_partitions()):
+        filename = _partition_filename(directory, number)
+
+        if number not in dirty and os.path.exists(filename):
+            continue
+
+        with partition.get_lock().read():
+            payload = document_codec.encode({"containers": [_describe_container(partition)]})
+            _write_payload(filename, payload, document_codec, document_compression)
+            container.mark_clean(number)
+
+        written.append(number)
+
+    with open(os.path.join(directory, MANIFEST_FILENAME), "w", encoding="utf-8") as file:
+        json.dump(
+            {"name": container.get_name(), "partitions": container.count_partitions()},
+            file,
+        )
+
+    return written
+
+
+@instrumentation.timed("persistence.load_partitions")
+def load_partitions(directory: str, allow_pickle: bool = False) -> PartitionedContainer:
+    """
+    Loads a partitioned container saved by save_partitions.
+    :param directory: The directory.
+    :param allow_pickle: When True, partitions encoded with pickle are loaded,
+    see load_from_file.
+    :return: The PartitionedContainer instance.
+    """
     ensure.not_none_or_whitespace(
-        filename, errors.PersistenceError("File name not specified.")
+        directory, errors.PersistenceError("Directory not specified.")
     )
+    manifest_filename = os.path.join(directory, MANIFEST_FILENAME)
+    validate_source(manifest_filename)
+
+    with open(manifest_filename, encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    partitions = []
+    settings = None
+
+    for number in range(manifest["partitions"]):
+        filename = _partition_filename(directory, number)
+        validate_source(filename)
+        (entry,) = _read_payload(filename, allow_pickle)["containers"]
+        partitions.append(_build_container(entry, sweep=False))
+        settings = entry.get("expiry", settings)
+
+    container = PartitionedContainer.from_partitions(manifest["name"], partitions)
+
+    if settings is not None:
+        container.enable_expiry(settings["default_ttl"], settings["sweep_interval"])
+
+    return container
+
+
+def _partition_filename(directory: str, number: int) -> str:
+    return os.path.join(directory, f"partition-{number:04d}.db")
+
+
+def _write_payload(
+    filename: str,
+    payload: bytes,
+    document_codec: codecs.Codec,
+    document_compression: Optional[codecs.Compression],
+):
+    if document_compression is not None:
+        payload = document_compression.compress(payload)
+
+    with files.replace_atomically(filename) as file:
+        file.write(
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                document_codec.name.encode("utf-8"),
+                document_codec.version,
+                (document_compression.name if document_compression else "").encode("utf-8"),
+            )
+        )
+        file.write(payload)
+
+
+def _read_payload(filename: str, allow_pickle: bool):
+    with open(filename, "rb") as file:
+        header = file.read(_HEADER.size)
+        payload = file.read()
+
+    if len(header) < _HEADER.size or not header.startswith(MAGIC):
+        raise errors.PersistenceError(f"The file '{filename}' is not a DockieDb file.")
+
+    _, version, codec, codec_version, compression = _HEADER.unpack(header)
+    codec = codecs.get_codec(codec.rstrip(b"\0").decode("utf-8"))
+    compression = compression.rstrip(b"\0").decode("utf-8")
+
+    if codec.name == codecs.PICKLE:
+        ensure_pickle_allowed(filename, allow_pickle)
+
+    if version > VERSION or codec_version > codec.version:
+        raise errors.PersistenceError(
+            f"The file '{filename}' was written by a newer version of DockieDb."
+        )
+
+    if compression:
+        payload = codecs.get_compression(compression).decompress(payload)
+
+    return codec.decode(payload)
+
+
+@instrumentation.timed("persistence.write_in_background")
+def _encode_and_write(
+    description: dict,
+    filename: str,
+    document_codec: codecs.Codec,
+    document_compression: Optional[codecs.Compression],
+):
+    payload = document_codec.encode(description)
+    _write_payload(filename, payload, document_codec, document_compression)
+
+
+def _capture(database: Database) -> dict:
+    with database.read_locked():
+        entries = [
+            _describe_container(database.get_container(name), pairs=False)
+            for name in database.list_containers()
+        ]
+
+    # Pairing ids with data is left until writers are no longer blocked.
+    for entry in entries:
+        entry["documents"] = [
+            [document.get_id(), document.get_data()] for document in entry["documents"]
+        ]
+
+    return {"containers": entries}
+
+
+def _describe_container(container, pairs: bool = True) -> dict:
+    partitioned = isinstance(container, PartitionedContainer)
+    declarations = container.list_partitions()[0] if partitioned else container
+    documents = list(container.iter_documents())
+    entry = {
+        "name": container.get_name(),
+        "documents": (
+            [[document.get_id(), document.get_data()] for document in documents]
+            if pairs
+            else documents
+        ),
+        "indexes": [
+            [path, declarations.get_index(path).index_type]
+            for path in declarations.list_indexes()
+        ],
+        "columns": declarations.list_columns(),
+    }
+
+    if partitioned:
+        entry["partitions"] = container.count_partitions()
+
+    queue = declarations.get_expiry_queue()
+
+    if queue is not None:
+        queues = (
+            [partition.get_expiry_queue() for partition in container.list_partitions()]
+            if partitioned
+            else [queue]
+        )
+        entry["expiry"] = {
+            "default_ttl": queue.default_ttl,
+            "sweep_interval": queue.sweep_interval,
+            "deadlines": [
+                [document_id, deadline]
+                for partition_queue in queues
+                for document_id, deadline in partition_queue.items()
+            ],
+        }
+
+    return entry
+
+
+def _build_container(entry: dict, sweep: bool = True):
+    if "partitions" in entry:
+        container = PartitionedContainer(entry["name"], entry["partitions"])
+    else:
+        container = Container(entry["name"])
+
+    container.add_documents(
+        (document_id, data) for document_id, data in entry["documents"]
+    )
+
+    for path, index_type in entry["indexes"]:
+        container.add_index(path, index_type)
+
+    for path in entry["columns"]:
+        container.add_column(path)
+
+    if "expiry" in entry:
+        settings = entry["expiry"]
+        container.enable_expiry(
+            settings["default_ttl"], settings["sweep_interval"] if sweep else None
+        )
 
-    if not os.path.exists(filename):
-        raise errors.PersistenceError(f"The file '{filename}' was not found.")
+        for document_id, deadline in settings["deadlines"]:
+            container.set_expiry(document_id, deadline)
 
-    return pickle.load(open(filename, "rb"))
+    return container
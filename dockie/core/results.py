@@ -0,0 +1,149 @@
+"""
+Result cache module. A result cache keeps the results of repeated queries
+against a container, tagged with the container version they were computed
+at. Every write bumps the container version, so a cached result is only
+returned while the container is unchanged.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Hashable, NamedTuple, Optional, Sequence
+
+from dockie.core import ensure, errors
+
+
+class ResultCacheStats(NamedTuple):
+    """
+    Result cache statistics.
+
+    hits: Lookups answered from the cache.
+    misses: Lookups that were not answered from the cache, including stale and expired entries.
+    invalidations: Entries dropped because the container changed.
+    expirations: Entries dropped because they outlived the time to live.
+    evictions: Entries dropped to stay within the maximum size.
+    size: The number of cached results.
+    max_size: The maximum number of cached results.
+    """
+
+    hits: int
+    misses: int
+    invalidations: int
+    expirations: int
+    evictions: int
+    size: int
+    max_size: int
+
+
+class _Entry(NamedTuple):
+    version: int
+    expires: float
+    results: tuple
+
+
+class ResultCache:
+    """
+    A bounded LRU cache of query results. Entries can also expire after a time
+    to live, which bounds how long a result is kept for a container that is
+    never written to. The cache is safe to use from multiple threads.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 128,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Creates a ResultCache instance.
+        :param max_size: The maximum number of cached results.
+        :param ttl: The number of seconds a result is kept. When not specified,
+        results are kept until they are invalidated or evicted.
+        :param clock: The clock used for expiry, in seconds.
+        """
+        ensure.greater_than_zero(
+            max_size, errors.QueryError("Cache size must be greater than zero.")
+        )
+
+        if ttl is not None:
+            ensure.greater_than_zero(
+                ttl, errors.QueryError("Time to live must be greater than zero.")
+            )
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The counts of hits, misses, invalidations, expirations and evictions.
+        self._counts: Counter = Counter()
+
+    def get(self, key: Hashable, version: int) -> Optional[tuple]:
+        """
+        Retrieves a cached result.
+        :param key: The cache key.
+        :param version: The current container version.
+        :return: The cached result, or None when it is missing, stale or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+
+            if entry.version != version:
+                del self._entries[key]
+                self._counts["invalidations"] += 1
+                self._counts["misses"] += 1
+                return None
+
+            if entry.expires <= self._clock():
+                del self._entries[key]
+                self._counts["expirations"] += 1
+                self._counts["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return entry.results
+
+    def put(self, key: Hashable, version: int, results: Sequence):
+        """
+        Caches a result.
+        :param key: The cache key.
+        :param version: The container version the result was computed at.
+        :param results: The result.
+        """
+        expires = float("inf") if self._ttl is None else self._clock() + self._ttl
+
+        with self._lock:
+            self._entries[key] = _Entry(version, expires, tuple(results))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def clear(self):
+        """
+        Removes all cached results and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._counts.clear()
+
+    def get_stats(self) -> ResultCacheStats:
+        """
+        Retrieves the cache statistics.
+        :return: The cache statistics.
+        """
+        with self._lock:
+            return ResultCacheStats(
+                self._counts["hits"],
+                self._counts["misses"],
+                self._counts["invalidations"],
+                self._counts["expirations"],
+                self._counts["evictions"],
+                len(self._entries),
+                self._max_size,
+            )
@@ -0,0 +1,318 @@
+"""
+Snapshot module. A snapshot stores every document as an individually encoded
+record followed by a per-container offset index. Opening a snapshot maps the
+file into memory and only reads the offset index, so the database can serve
+reads immediately and documents are decoded on first access.
+"""
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional
+
+from dockie.core import codecs, columns, ensure, errors, expiry, files, index, instrumentation
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.partition import PartitionedContainer
+from dockie.core.persistence import ensure_pickle_allowed, validate_destination, validate_source
+
+MAGIC = b"DOCKIEMM"
+VERSION = 3
+
+_HEADER = struct.Struct(">8sI16sIQQ")
+_OVERLAY = -1
+
+
+class MappedDocumentStore(MutableMapping):  # pylint: disable=too-many-instance-attributes
+    """
+    A mapping of document ids to documents backed by a memory-mapped snapshot.
+    Documents are decoded on first access and kept in a resident set. Documents
+    added after the snapshot was opened are held in memory. The store is safe to
+    read from multiple threads.
+    """
+
+    def __init__(
+        self,
+        mapping: mmap.mmap,
+        slots: Dict[object, int],
+        offsets: array,
+        lengths: array,
+        max_resident: Optional[int] = None,
+        codec: Optional[codecs.Codec] = None,
+    ):
+        """
+        Creates a MappedDocumentStore instance.
+        :param mapping: The memory-mapped snapshot.
+        :param slots: The document ids mapped to their positions in the offset index.
+        :param offsets: The offsets of the encoded documents.
+        :param lengths: The lengths of the encoded documents.
+        :param max_resident: The maximum number of decoded documents kept in memory.
+        When exceeded, the least recently used documents are evicted back to the
+        mapping. When not specified, decoded documents are never evicted.
+        :param codec: The codec the documents were encoded with. When not
+        specified, the default codec is used.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if max_resident is not None:
+            ensure.greater_than_zero(
+                max_resident,
+                errors.PersistenceError("Resident set size must be greater than zero."),
+            )
+
+        self._mapping = mapping
+        self._slots = slots
+        self._offsets = offsets
+        self._lengths = lengths
+        self._max_resident = max_resident
+        self._codec = codec or codecs.get_codec(codecs.DEFAULT)
+        self._resident: "OrderedDict[object, Document]" = OrderedDict()
+        self._overlay: Dict[object, Document] = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return dict, (list(self.items()),)
+
+    def __getitem__(self, document_id) -> Document:
+        with self._lock:
+            return self._load(document_id, self._slots[document_id])
+
+    def get_many(self, document_ids: Iterable) -> List[Optional[Document]]:
+        """
+        Retrieves several documents while holding the lock once.
+        :param document_ids: The document ids.
+        :return: The documents in the order of the ids, with None for the ids
+        that were not found.
+        """
+        slots = self._slots
+        found: List[Optional[Document]] = []
+
+        with self._lock:
+            for document_id in document_ids:
+                slot = slots.get(document_id)
+                found.append(None if slot is None else self._load(document_id, slot))
+
+        return found
+
+    def _load(self, document_id, slot: int) -> Document:
+        if slot == _OVERLAY:
+            return self._overlay[document_id]
+
+        document = self._resident.get(document_id)
+
+        if document is not None:
+            self._resident.move_to_end(document_id)
+            return document
+
+        offset = self._offsets[slot]
+        document = Document(
+            document_id,
+            self._codec.decode(self._mapping[offset:offset + self._lengths[slot]]),
+        )
+        self._resident[document_id] = document
+
+        if (
+            self._max_resident is not None
+            and len(self._resident) > self._max_resident
+        ):
+            self._resident.popitem(last=False)
+
+        return document
+
+    def __setitem__(self, document_id, document: Document):
+        with self._lock:
+            self._slots[document_id] = _OVERLAY
+            self._overlay[document_id] = document
+            self._resident.pop(document_id, None)
+
+    def __delitem__(self, document_id):
+        with self._lock:
+            del self._slots[document_id]
+            self._overlay.pop(document_id, None)
+            self._resident.pop(document_id, None)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, document_id) -> bool:
+        return document_id in self._slots
+
+    def count_resident(self) -> int:
+        """
+        Counts the documents that are currently decoded.
+        :return: The number of decoded documents, including documents added
+        after the snapshot was opened.
+        """
+        return len(self._resident) + len(self._overlay)
+
+
+@instrumentation.timed("snapshot.write_snapshot")
+def write_snapshot(
+    database: Database, filename: str, overwrite=False, codec: str = codecs.DEFAULT
+):
+    """
+    Writes the database to a memory-mappable snapshot file. The snapshot is
+    written to a temporary file and renamed into place.
+    :param database: The database.
+    :param filename: The file name.
+    :param overwrite: When True and the file exists, the file is overwritten.
+    When False and the file exists, an error is raised.
+    :param codec: The name of the codec that encodes each document, such as
+    'json', 'msgpack' or 'pickle'. JSON is used when not specified. The codec
+    is recorded in the snapshot header.
+    """
+    validate_destination(database, filename, overwrite)
+    document_codec = codecs.get_codec(codec)
+
+    for name in database.list_containers():
+        if isinstance(database.get_container(name), PartitionedContainer):
+            raise errors.PersistenceError(
+                f"Container '{name}' is partitioned. Save partitioned containers "
+                f"with persistence.save_partitions."
+            )
+
+    directory = []
+
+    with database.read_locked(), files.replace_atomically(filename) as file:
+        file.write(_pack_header(document_codec, 0, 0))
+
+        for name in database.list_containers():
+            directory.append(
+                _write_container(file, database.get_container(name), document_codec)
+            )
+
+        directory_offset = file.tell()
+        file.write(document_codec.encode(directory))
+        directory_length = file.tell() - directory_offset
+
+        file.seek(0)
+        file.write(_pack_header(document_codec, directory_offset, directory_length))
+
+
+@instrumentation.timed("snapshot.open_snapshot")
+def open_snapshot(
+    filename: str, max_resident: Optional[int] = None, allow_pickle: bool = False
+) -> Database:
+    """
+    Opens a snapshot file. Only the offset index is read; documents are decoded
+    the first time they are accessed.
+    :param filename: The file name.
+    :param max_resident: The maximum number of decoded documents kept in memory
+    per container. When not specified, decoded documents are never evicted.
+    :param allow_pickle: When True, snapshots encoded with pickle are opened.
+    Loading pickle can run arbitrary code, so only allow it for files you trust.
+    :return: The Database instance.
+    """
+    validate_source(filename)
+
+    if os.path.getsize(filename) < _HEADER.size:
+        raise errors.PersistenceError(f"The file '{filename}' is not a snapshot.")
+
+    with open(filename, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    database = Database()
+    document_codec, directory = _read_directory(mapping, filename, allow_pickle)
+
+    for entry in directory:
+        store = MappedDocumentStore(
+            mapping,
+            {document_id: slot for slot, document_id in enumerate(entry["documents"])},
+            array("q", entry["offsets"]),
+            array("q", entry["lengths"]),
+            max_resident,
+            document_codec,
+        )
+        database.attach_container(
+            Container(
+                entry["name"],
+                store,
+                [index.restore_index(description) for description in entry["indexes"]],
+                (
+                    None
+                    if entry["columns"] is None
+                    else columns.ColumnStore.from_description(entry["columns"])
+                ),
+                (
+                    None
+                    if entry["expiry"] is None
+                    else expiry.ExpiryQueue.from_description(entry["expiry"])
+                ),
+            )
+        )
+
+    return database
+
+
+def _write_container(file, container: Container, document_codec: codecs.Codec) -> dict:
+    document_ids = []
+    offsets = []
+    lengths = []
+
+    for document in container.iter_documents():
+        payload = document_codec.encode(document.get_data())
+        document_ids.append(document.get_id())
+        offsets.append(file.tell())
+        lengths.append(len(payload))
+        file.write(payload)
+
+    column_store = container.get_column_store()
+    queue = container.get_expiry_queue()
+
+    # The directory holds plain values, so it is encoded with the document
+    # codec and does not depend on the layout of the index and column classes.
+    return {
+        "name": container.get_name(),
+        "documents": document_ids,
+        "offsets": offsets,
+        "lengths": lengths,
+        "indexes": [container.get_index(path).describe() for path in container.list_indexes()],
+        "columns": None if column_store is None else column_store.describe(),
+        "expiry": None if queue is None else queue.describe(),
+    }
+
+
+def _pack_header(
+    document_codec: codecs.Codec, directory_offset: int, directory_length: int
+) -> bytes:
+    return _HEADER.pack(
+        MAGIC,
+        VERSION,
+        document_codec.name.encode("utf-8"),
+        document_codec.version,
+        directory_offset,
+        directory_length,
+    )
+
+
+def _read_directory(mapping: mmap.mmap, filename: str, allow_pickle: bool) -> tuple:
+    magic, version, codec, codec_version, directory_offset, directory_length = (
+        _HEADER.unpack(mapping[:_HEADER.size])
+    )
+
+    if magic != MAGIC or version != VERSION:
+        raise errors.PersistenceError(
+            f"The file '{filename}' is not a version {VERSION} snapshot."
+        )
+
+    document_codec = codecs.get_codec(codec.rstrip(b"\0").decode("utf-8"))
+
+    if document_codec.name == codecs.PICKLE:
+        ensure_pickle_allowed(filename, allow_pickle)
+
+    if codec_version > document_codec.version:
+        raise errors.PersistenceError(
+            f"The file '{filename}' was written by a newer version of the "
+            f"'{document_codec.name}' codec."
+        )
+
+    directory = document_codec.decode(
+        mapping[directory_offset:directory_offset + directory_length]
+    )
+
+    return document_codec, directory
@@ -0,0 +1,483 @@
+"""
+Write-ahead log module. Container and document mutations are appended to a log
+file as they happen and periodically compacted into a snapshot, so a save costs
+O(changes) rather than O(total data) and a crash loses at most the records that
+were not yet synced. A log starts with a header that records the codec its
+records are encoded with, as database files do.
+"""
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, Optional, Tuple
+
+from dockie.core import codecs, ensure, errors, events
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.partition import PartitionedContainer
+from dockie.core.persistence import ensure_pickle_allowed, load_from_file, persist_to_file
+
+SYNC_ALWAYS = "always"
+SYNC_BATCH = "batch"
+SYNC_INTERVAL = "interval"
+
+SNAPSHOT_FILENAME = "snapshot.db"
+LOG_FILENAME = "wal.log"
+
+MAGIC = b"DOCKIEWL"
+
+_HEADER = struct.Struct(">II")
+_LOG_HEADER = struct.Struct(">8s16sI")
+
+
+class WriteAheadLog:
+    """
+    An append-only log of mutation records. Each record is encoded with the
+    log's codec and framed with its length and CRC32 checksum so a torn write
+    at the end of the log is detected and discarded on recovery.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        sync_mode: str = SYNC_ALWAYS,
+        batch_size: int = 100,
+        sync_interval: float = 1.0,
+        codec: str = codecs.DEFAULT,
+    ):
+        """
+        Opens a write-ahead log for appending.
+        :param filename: The log file name.
+        :param sync_mode: When to fsync the log. 'always' syncs after every record,
+        'batch' syncs after every batch_size records and 'interval' syncs at most
+        every sync_interval seconds from a background thread.
+        :param batch_size: The number of records per sync in 'batch' mode.
+        :param sync_interval: The number of seconds between syncs in 'interval' mode.
+        :param codec: The name of the codec that encodes the records. An existing
+        log must have been written with the same codec. Document data must be
+        encodable by the codec.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        ensure.not_none_or_whitespace(
+            filename, errors.PersistenceError("File name not specified.")
+        )
+
+        if sync_mode not in (SYNC_ALWAYS, SYNC_BATCH, SYNC_INTERVAL):
+            raise errors.PersistenceError(
+                f"Sync mode '{sync_mode}' is not supported. Supported sync modes "
+                f"are '{SYNC_ALWAYS}', '{SYNC_BATCH}' and '{SYNC_INTERVAL}'."
+            )
+
+        ensure.greater_than_zero(
+            batch_size, errors.PersistenceError("Batch size must be greater than zero.")
+        )
+        ensure.greater_than_zero(
+            sync_interval,
+            errors.PersistenceError("Sync interval must be greater than zero."),
+        )
+
+        self._codec = codecs.get_codec(codec)
+        existing = read_log_codec(filename)
+
+        if existing is not None and existing.name != self._codec.name:
+            raise errors.PersistenceError(
+                f"The log '{filename}' is encoded with '{existing.name}', not "
+                f"'{self._codec.name}'."
+            )
+
+        # The number of records per sync, or None when a background thread syncs.
+        self._sync_every = {SYNC_ALWAYS: 1, SYNC_BATCH: batch_size}.get(sync_mode)
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._file = open(filename, "ab")  # pylint: disable=consider-using-with
+
+        if existing is None:
+            self._file.truncate(0)
+            self._write_header()
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+
+        if sync_mode == SYNC_INTERVAL:
+            self._syncer = threading.Thread(
+                target=self._sync_periodically, args=(sync_interval,), daemon=True
+            )
+            self._syncer.start()
+
+    def __call__(self, mutation: events.Mutation):
+        """
+        Appends a mutation. This lets the log be added as a database listener.
+        :param mutation: The mutation.
+        """
+        if mutation.kind == events.EVICT:
+            # Evictions only make room in memory, the documents were not deleted.
+            return
+
+        if mutation.kind == events.ADD_CONTAINER and isinstance(
+            mutation.container, PartitionedContainer
+        ):
+            self.append(
+                (
+                    events.ADD_CONTAINER,
+                    mutation.container.get_name(),
+                    mutation.container.count_partitions(),
+                )
+            )
+        elif mutation.kind == events.ADD_CONTAINER:
+            self.append((events.ADD_CONTAINER, mutation.container.get_name()))
+        elif mutation.kind == events.EXPIRE:
+            self.append(
+                (events.EXPIRE, mutation.container.get_name(), mutation.document.get_id())
+            )
+        elif mutation.kind == events.SET_EXPIRY:
+            document_id = mutation.document.get_id()
+            self.append(
+                (
+                    events.SET_EXPIRY,
+                    mutation.container.get_name(),
+                    document_id,
+                    mutation.container.get_expiry(document_id),
+                )
+            )
+        else:
+            record = (
+                mutation.kind,
+                mutation.container.get_name(),
+                mutation.document.get_id(),
+                mutation.document.get_data(),
+            )
+            deadline = mutation.container.get_expiry(mutation.document.get_id())
+            self.append(record if deadline is None else record + (deadline,))
+
+    def append(self, record: tuple):
+        """
+        Appends a record to the log.
+        :param record: The record.
+        """
+        payload = self._codec.encode(record)
+
+        with self._lock:
+            self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self._file.write(payload)
+            self._unsynced += 1
+
+            if self._sync_every is not None and self._unsynced >= self._sync_every:
+                self._sync()
+
+    def get_codec(self) -> codecs.Codec:
+        """
+        Retrieves the codec the records are encoded with.
+        :return: The codec.
+        """
+        return self._codec
+
+    def sync(self):
+        """
+        Flushes buffered records and fsyncs the log.
+        """
+        with self._lock:
+            self._sync()
+
+    def truncate(self):
+        """
+        Discards every record in the log.
+        """
+        with self._lock:
+            self._file.truncate(0)
+            self._write_header()
+
+    def close(self):
+        """
+        Syncs and closes the log.
+        """
+        self._stop.set()
+
+        if self._syncer is not None:
+            self._syncer.join()
+
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def _write_header(self):
+        self._file.write(
+            _LOG_HEADER.pack(MAGIC, self._codec.name.encode("utf-8"), self._codec.version)
+        )
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _sync_periodically(self, sync_interval: float):
+        while not self._stop.wait(sync_interval):
+            with self._lock:
+                if self._unsynced and not self._file.closed:
+                    self._sync()
+
+
+def read_log_codec(filename: str) -> Optional[codecs.Codec]:
+    """
+    Reads the codec a write-ahead log is encoded with from its header.
+    :param filename: The log file name.
+    :return: The codec, or None when the log does not exist or has no complete
+    header, which is the case for a log torn while it was created.
+    """
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "rb") as file:
+        header = file.read(_LOG_HEADER.size)
+
+    if len(header) < _LOG_HEADER.size:
+        return None
+
+    magic, codec, codec_version = _LOG_HEADER.unpack(header)
+
+    if magic != MAGIC:
+        raise errors.PersistenceError(f"The file '{filename}' is not a write-ahead log.")
+
+    codec = codecs.get_codec(codec.rstrip(b"\0").decode("utf-8"))
+
+    if codec_version > codec.version:
+        raise errors.PersistenceError(
+            f"The log '{filename}' was written by a newer version of the "
+            f"'{codec.name}' codec."
+        )
+
+    return codec
+
+
+def read_log(filename: str, allow_pickle: bool = False) -> Iterator[tuple]:
+    """
+    Reads the records of a write-ahead log. Reading stops at the first torn or
+    corrupt record.
+    :param filename: The log file name.
+    :param allow_pickle: When True, logs encoded with pickle are read. Reading
+    pickle can run arbitrary code, so only allow it for logs you trust.
+    :return: An iterator over the records.
+    """
+    for record, _ in _read_frames(filename, allow_pickle):
+        yield record
+
+
+def _read_frames(filename: str, allow_pickle: bool) -> Iterator[Tuple[tuple, int]]:
+    codec = read_log_codec(filename)
+
+    if codec is None:
+        return
+
+    if codec.name == codecs.PICKLE:
+        ensure_pickle_allowed(filename, allow_pickle)
+
+    with open(filename, "rb") as file:
+        file.seek(_LOG_HEADER.size)
+
+        while True:
+            header = file.read(_HEADER.size)
+
+            if len(header) < _HEADER.size:
+                return
+
+            length, checksum = _HEADER.unpack(header)
+            payload = file.read(length)
+
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+
+            yield tuple(codec.decode(payload)), file.tell()
+
+
+def apply_record(database: Database, record: tuple):
+    """
+    Applies a log record to a database. Applying a record more than once has
+    the same effect as applying it once.
+    :param database: The database.
+    :param record: The record.
+    """
+    if record[0] == events.ADD_CONTAINER:
+        if record[1] in database.list_containers():
+            return
+
+        if len(record) > 2:
+            database.attach_container(PartitionedContainer(record[1], record[2]))
+        else:
+            database.add_container(record[1])
+
+        return
+
+    container = database.get_container(record[1])
+
+    if record[0] == events.EXPIRE:
+        _restore_expiry(container, record[2], 0.0)
+        return
+
+    if record[0] == events.SET_EXPIRY:
+        if record[3] is not None or container.is_expiry_enabled():
+            _restore_expiry(container, record[2], record[3])
+
+        return
+
+    _, _, document_id, data, *deadline = record
+    container.add_document(Document(document_id, data))
+
+    if deadline:
+        _restore_expiry(container, document_id, deadline[0])
+
+
+def _restore_expiry(container, document_id, deadline: float):
+    # Enabling expiry is not logged, so it is enabled with default settings
+    # when a logged document expires in a container recovered without it.
+    if not container.is_expiry_enabled():
+        container.enable_expiry()
+
+    container.set_expiry(document_id, deadline)
+
+
+class JournaledDatabase:
+    """
+    Keeps a database durable in a directory holding a snapshot and a write-ahead
+    log. Opening the directory replays the snapshot and then the log. Every
+    mutation is logged as it happens, and checkpoint() compacts the log into a
+    new snapshot. Automatic checkpoints run on a background thread. Index
+    declarations are only persisted by a checkpoint.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sync_mode: str = SYNC_ALWAYS,
+        batch_size: int = 100,
+        sync_interval: float = 1.0,
+        compact_every: Optional[int] = None,
+        codec: str = codecs.DEFAULT,
+    ):
+        """
+        Opens, or creates, a journaled database.
+        :param directory: The directory holding the snapshot and the log.
+        :param sync_mode: When to fsync the log, see WriteAheadLog.
+        :param batch_size: The number of records per sync in 'batch' mode.
+        :param sync_interval: The number of seconds between syncs in 'interval' mode.
+        :param compact_every: When specified, a checkpoint is taken in the
+        background after this many logged mutations.
+        :param codec: The name of the codec that encodes the snapshot and the
+        log. A log written with another codec is compacted into a snapshot when
+        the directory is opened. Choosing pickle trusts the files in the
+        directory, as pickle can run arbitrary code when it is loaded.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        ensure.not_none_or_whitespace(
+            directory, errors.PersistenceError("Directory not specified.")
+        )
+
+        if compact_every is not None:
+            ensure.greater_than_zero(
+                compact_every,
+                errors.PersistenceError("Compaction interval must be greater than zero."),
+            )
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._directory = directory
+        self._compact_every = compact_every
+        self._logged = 0
+        self._counter_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._database = self._recover(codecs.get_codec(codec))
+        self._log = WriteAheadLog(
+            os.path.join(directory, LOG_FILENAME), sync_mode, batch_size, sync_interval, codec
+        )
+        self._database.add_listener(self._on_mutation)
+
+    def get_database(self) -> Database:
+        """
+        Retrieves the journaled database.
+        :return: The database.
+        """
+        return self._database
+
+    def checkpoint(self):
+        """
+        Writes a new snapshot and truncates the log. Writers are blocked until the
+        log has been truncated, so no mutation is lost between the two steps. The
+        snapshot is written to a temporary file and renamed into place, so a crash
+        leaves either the old or the new snapshot.
+        """
+        snapshot_filename = os.path.join(self._directory, SNAPSHOT_FILENAME)
+
+        with self._database.read_locked():
+            # persist_to_file replaces the snapshot through files.replace_atomically.
+            persist_to_file(
+                self._database,
+                snapshot_filename,
+                overwrite=True,
+                codec=self._log.get_codec().name,
+            )
+            self._log.truncate()
+
+            with self._counter_lock:
+                self._logged = 0
+
+    def sync(self):
+        """
+        Syncs the log.
+        """
+        self._log.sync()
+
+    def close(self):
+        """
+        Stops logging mutations, waits for a running automatic checkpoint and
+        closes the log.
+        """
+        self._database.remove_listener(self._on_mutation)
+
+        if self._compactor is not None:
+            self._compactor.join()
+
+        self._log.close()
+
+    def _on_mutation(self, mutation: events.Mutation):
+        self._log(mutation)
+
+        if self._compact_every is None:
+            return
+
+        with self._counter_lock:
+            self._logged += 1
+
+            if self._logged < self._compact_every or (
+                self._compactor is not None and self._compactor.is_alive()
+            ):
+                return
+
+            self._compactor = threading.Thread(target=self.checkpoint, daemon=True)
+            self._compactor.start()
+
+    def _recover(self, codec: codecs.Codec) -> Database:
+        snapshot_filename = os.path.join(self._directory, SNAPSHOT_FILENAME)
+        log_filename = os.path.join(self._directory, LOG_FILENAME)
+        allow_pickle = codec.name == codecs.PICKLE
+
+        if os.path.exists(snapshot_filename):
+            database = load_from_file(snapshot_filename, allow_pickle)
+        else:
+            database = Database()
+
+        log_codec = read_log_codec(log_filename)
+        valid_length = 0
+
+        for record, valid_length in _read_frames(log_filename, allow_pickle):
+            apply_record(database, record)
+
+        if log_codec is not None and log_codec.name != codec.name:
+            # A log holds records of one codec, so switching codecs compacts it.
+            persist_to_file(
+                database, snapshot_filename, overwrite=True, codec=codec.name
+            )
+            os.remove(log_filename)
+        elif os.path.exists(log_filename) and os.path.getsize(log_filename) > valid_length:
+            with open(log_filename, "r+b") as file:
+                file.truncate(valid_length)
+
+        return database
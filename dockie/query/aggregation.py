@@ -0,0 +1,372 @@
+"""
+Aggregation module. Aggregates fold the values found at a dotted attribute
+path into a result one document at a time, so no list of matches is built.
+Aggregates, and grouped aggregations, are partial results that can be merged,
+so the documents can be aggregated in parts, for example one partition at a
+time, and the parts combined.
+"""
+import math
+from abc import ABC, abstractmethod
+from itertools import product
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple, Union
+
+from dockie.core import ensure, errors, index
+from dockie.query import ordering
+
+
+class Aggregate(ABC):
+    """
+    Represents an aggregate over the values at a dotted attribute path. A
+    document holding several values at the path, in a list or in a list of
+    objects, contributes every value. This class is the base class for all
+    aggregate types.
+    """
+
+    def __init__(self, path: str):
+        """
+        Creates an Aggregate instance.
+        :param path: The dotted attribute path.
+        """
+        ensure.not_none_or_whitespace(
+            path, errors.QueryError("Aggregate path not specified.")
+        )
+
+        self.path = path
+
+    def empty(self) -> "Aggregate":
+        """
+        Creates an aggregate of the same type and path that has seen no documents.
+        :return: The aggregate.
+        """
+        return type(self)(self.path)
+
+    def add(self, data):
+        """
+        Adds a document to the aggregate.
+        :param data: The document data.
+        """
+        for value in values_at(data, self.path):
+            self.add_value(value)
+
+    @abstractmethod
+    def add_value(self, value):  # pragma: no cover
+        """
+        Adds a single value to the aggregate.
+        :param value: The value.
+        """
+
+    @abstractmethod
+    def merge(self, other: "Aggregate"):  # pragma: no cover
+        """
+        Merges the partial result of another aggregate of the same type into this one.
+        :param other: The other aggregate.
+        """
+
+    @abstractmethod
+    def result(self):  # pragma: no cover
+        """
+        Retrieves the result.
+        """
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.path!r})"
+
+
+class Count(Aggregate):
+    """
+    Counts documents. Without a path, every document is counted. With a path,
+    documents holding at least one value other than None at the path are counted.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Creates a Count instance.
+        :param path: The dotted attribute path. When not specified, documents are counted.
+        """
+        if path is not None:
+            super().__init__(path)
+
+        self.path = path
+        self.count = 0
+
+    def add(self, data):
+        if self.path is None or any(
+            value is not None for value in values_at(data, self.path)
+        ):
+            self.count += 1
+
+    def add_value(self, value):
+        self.count += 1
+
+    def merge(self, other: "Count"):
+        self.count += other.count
+
+    def result(self) -> int:
+        return self.count
+
+
+class Sum(Aggregate):
+    """
+    Sums the numbers at a path. Other values, including booleans and NaN, are ignored.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.total = 0
+
+    def add_value(self, value):
+        if _is_number(value):
+            self.total += value
+
+    def merge(self, other: "Sum"):
+        self.total += other.total
+
+    def result(self):
+        return self.total
+
+
+class Avg(Aggregate):
+    """
+    Averages the numbers at a path. Other values, including booleans and NaN, are ignored.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.total = 0
+        self.count = 0
+
+    def add_value(self, value):
+        if _is_number(value):
+            self.total += value
+            self.count += 1
+
+    def merge(self, other: "Avg"):
+        self.total += other.total
+        self.count += other.count
+
+    def result(self) -> Optional[float]:
+        """
+        Retrieves the average.
+        :return: The average, or None when no numbers were seen.
+        """
+        return self.total / self.count if self.count else None
+
+
+class Min(Aggregate):
+    """
+    Finds the smallest number or string at a path, in the order used by
+    order_by: numbers before strings. Other values are ignored.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.key: Optional[tuple] = None
+
+    def add_value(self, value):
+        key = ordering.value_key(value)
+
+        if key is not None and (self.key is None or self._prefer(key, self.key)):
+            self.key = key
+
+    def merge(self, other: "Min"):
+        if other.key is not None:
+            self.add_value(other.key[1])
+
+    def result(self):
+        """
+        Retrieves the value.
+        :return: The value, or None when no numbers or strings were seen.
+        """
+        return None if self.key is None else self.key[1]
+
+    @staticmethod
+    def _prefer(key: tuple, current: tuple) -> bool:
+        return key < current
+
+
+class Max(Min):
+    """
+    Finds the largest number or string at a path, in the order used by
+    order_by: numbers before strings. Other values are ignored.
+    """
+
+    @staticmethod
+    def _prefer(key: tuple, current: tuple) -> bool:
+        return key > current
+
+
+class Distinct(Aggregate):
+    """
+    Collects the distinct values at a path in the order they were first seen.
+    Values that cannot be hashed, such as objects and lists, are ignored.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.values: Dict[object, None] = {}
+
+    def add_value(self, value):
+        try:
+            self.values.setdefault(value, None)
+        except TypeError:
+            pass
+
+    def merge(self, other: "Distinct"):
+        for value in other.values:
+            self.values.setdefault(value, None)
+
+    def result(self) -> list:
+        return list(self.values)
+
+
+class Aggregation:
+    """
+    Represents a set of named aggregates, optionally grouped by the values at
+    one or more dotted attribute paths. An aggregation is a partial result:
+    documents are added one at a time and aggregations over different
+    documents are combined with merge.
+
+    A document holding several values at a group path is added to the group
+    of each value, and a document without a hashable value at a group path is
+    added to the None group.
+    """
+
+    def __init__(
+        self,
+        aggregates: Mapping[str, Aggregate],
+        group_by: Union[str, Iterable[str], None] = None,
+    ):
+        """
+        Creates an Aggregation instance.
+        :param aggregates: The aggregates by result name. The aggregates are
+        used as templates and are not changed.
+        :param group_by: A dotted attribute path, or several, to group by.
+        When not specified, the documents form a single group.
+        """
+        ensure.not_none(aggregates, errors.QueryError("Aggregates not specified."))
+
+        if not aggregates:
+            raise errors.QueryError("At least one aggregate must be specified.")
+
+        for name, aggregate in aggregates.items():
+            if not isinstance(aggregate, Aggregate):
+                raise errors.QueryError(f"Aggregate '{name}' is not an Aggregate.")
+
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+
+        self.group_by: Optional[Tuple[str, ...]] = (
+            None if group_by is None else tuple(group_by)
+        )
+
+        if self.group_by is not None:
+            if not self.group_by:
+                raise errors.QueryError("At least one group path must be specified.")
+
+            for path in self.group_by:
+                ensure.not_none_or_whitespace(
+                    path, errors.QueryError("Group path not specified.")
+                )
+
+        self._templates = dict(aggregates)
+        self.groups: Dict[object, Dict[str, Aggregate]] = {}
+
+    def empty(self) -> "Aggregation":
+        """
+        Creates an aggregation with the same aggregates and groups that has seen no documents.
+        :return: The aggregation.
+        """
+        return Aggregation(self._templates, self.group_by)
+
+    def add(self, data):
+        """
+        Adds a document to its groups.
+        :param data: The document data.
+        """
+        for key in self._group_keys(data):
+            aggregates = self.groups.get(key)
+
+            if aggregates is None:
+                aggregates = self.groups[key] = self._create()
+
+            for aggregate in aggregates.values():
+                aggregate.add(data)
+
+    def merge(self, other: "Aggregation"):
+        """
+        Merges the partial result of another aggregation with the same
+        aggregates and groups into this one.
+        :param other: The other aggregation.
+        """
+        for key, other_aggregates in other.groups.items():
+            aggregates = self.groups.get(key)
+
+            if aggregates is None:
+                aggregates = self.groups[key] = self._create()
+
+            for name, aggregate in aggregates.items():
+                aggregate.merge(other_aggregates[name])
+
+    def result(self) -> dict:
+        """
+        Retrieves the results.
+        :return: Without groups, the result of each aggregate by name. With
+        groups, the results of each group by group value; the group value is a
+        tuple when grouping by several paths.
+        """
+        if self.group_by is None:
+            aggregates = self.groups.get(None) or self._create()
+            return {name: aggregate.result() for name, aggregate in aggregates.items()}
+
+        return {
+            key: {name: aggregate.result() for name, aggregate in aggregates.items()}
+            for key, aggregates in self.groups.items()
+        }
+
+    def _create(self) -> Dict[str, Aggregate]:
+        return {name: template.empty() for name, template in self._templates.items()}
+
+    def _group_keys(self, data) -> Iterable:
+        if self.group_by is None:
+            return (None,)
+
+        keys = [_group_values(data, path) for path in self.group_by]
+
+        if len(keys) == 1:
+            return keys[0]
+
+        return product(*keys)
+
+
+def values_at(data, path: str) -> Iterator:
+    """
+    Iterates over the values at a dotted attribute path, expanding lists.
+    :param data: The document data.
+    :param path: The dotted attribute path.
+    :return: An iterator over the values.
+    """
+    for value in index.extract_values(data, path):
+        if isinstance(value, list):
+            yield from value
+        else:
+            yield value
+
+
+def _group_values(data, path: str) -> list:
+    values = {}
+
+    for value in values_at(data, path):
+        try:
+            values.setdefault(value, None)
+        except TypeError:
+            continue
+
+    return list(values) if values else [None]
+
+
+def _is_number(value) -> bool:
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and not (isinstance(value, float) and math.isnan(value))
+    )
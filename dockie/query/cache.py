@@ -0,0 +1,144 @@
+"""
+Query cache module. Query strings are parsed once into reusable compiled
+predicates which are kept in a bounded LRU cache keyed by the query text.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from dictquery.parsers import DataQueryParser
+from dictquery.visitors import DataQueryVisitor
+
+from dockie.core import ensure, errors, instrumentation
+
+
+class CacheStats(NamedTuple):
+    """
+    Cache statistics.
+    """
+
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
+class CompiledQuery:
+    """
+    Represents a query string that has been parsed into a reusable predicate.
+    """
+
+    def __init__(self, query: str):
+        """
+        Creates a CompiledQuery instance.
+        :param query: The dictquery query string.
+        """
+        ensure.not_none(query, errors.QueryError("Query string not specified."))
+
+        self._query = query
+        self._ast = DataQueryParser().parse(query)
+
+    def get_query(self) -> str:
+        """
+        Retrieves the query string the predicate was compiled from.
+        :return: The query string.
+        """
+        return self._query
+
+    def get_ast(self):
+        """
+        Retrieves the parsed query.
+        :return: The root node of the dictquery syntax tree.
+        """
+        return self._ast
+
+    def match(self, data) -> bool:
+        """
+        Checks whether the data satisfies the query.
+        :param data: The document data.
+        :return: True if the data satisfies the query, otherwise False.
+        """
+        return DataQueryVisitor(self._ast).evaluate(data)
+
+
+class QueryCache:
+    """
+    A bounded LRU cache of compiled queries keyed by the query string.
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        Creates a QueryCache instance.
+        :param max_size: The maximum number of compiled queries kept in the cache.
+        """
+        ensure.greater_than_zero(
+            max_size, errors.QueryError("Cache size must be greater than zero.")
+        )
+
+        self._max_size = max_size
+        self._entries: "OrderedDict[str, CompiledQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, query: str) -> CompiledQuery:
+        """
+        Retrieves the compiled query for a query string, compiling and caching
+        it on a miss.
+        :param query: The query string.
+        :return: The compiled query.
+        """
+        with self._lock:
+            compiled = self._entries.get(query)
+
+            if compiled is not None:
+                self._entries.move_to_end(query)
+                self._hits += 1
+                return compiled
+
+        collector = instrumentation.ACTIVE
+
+        if collector is None:
+            compiled = CompiledQuery(query)
+        else:
+            start = time.perf_counter()
+            compiled = CompiledQuery(query)
+            seconds = time.perf_counter() - start
+            collector.observe("query.parse", seconds, query=query)
+            profile = collector.current_query()
+
+            if profile is not None:
+                profile.parse_seconds += seconds
+
+        with self._lock:
+            self._misses += 1
+            self._entries[query] = compiled
+            self._entries.move_to_end(query)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+        return compiled
+
+    def clear(self):
+        """
+        Removes all compiled queries from the cache and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_stats(self) -> CacheStats:
+        """
+        Retrieves the cache statistics.
+        :return: The cache hits, misses, current size and maximum size.
+        """
+        with self._lock:
+            return CacheStats(
+                self._hits, self._misses, len(self._entries), self._max_size
+            )
+
+
+default_query_cache = QueryCache()
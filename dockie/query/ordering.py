@@ -0,0 +1,119 @@
+"""
+Ordering module. Matches are ordered by the value at a dotted attribute path
+following the order of a sorted index: numbers before strings, each in
+ascending order, reversed for descending order. Documents with equal values
+are ordered by id, see index.id_key, so a descending order is the exact reverse
+of the ascending one. Documents without exactly one number or string at the
+path are ordered last, by id, whatever the direction. Every plan that orders
+matches follows these rules, so the order does not depend on the plan.
+"""
+import heapq
+from operator import itemgetter
+from typing import Iterable, List, Optional
+
+from dockie.core import errors, index
+from dockie.core.document import Document
+
+ASCENDING = "asc"
+DESCENDING = "desc"
+
+# Numbers are ordered before strings, as in a sorted index.
+_FAMILY_RANKS = {index.value_family(0): 0, index.value_family(""): 1}
+
+
+def is_descending(order: str) -> bool:
+    """
+    Validates an order.
+    :param order: 'asc' or 'desc'.
+    :return: True if the order is descending, otherwise False.
+    """
+    if order not in (ASCENDING, DESCENDING):
+        raise errors.QueryError(
+            f"Unknown order '{order}'. Supported orders are '{ASCENDING}' and '{DESCENDING}'."
+        )
+
+    return order == DESCENDING
+
+
+def value_key(value) -> Optional[tuple]:
+    """
+    Computes the key a value is ordered by.
+    :param value: The value.
+    :return: The key, or None when the value is not a number or a string.
+    """
+    family = index.value_family(value)
+
+    return None if family is None else (_FAMILY_RANKS[family], value)
+
+
+def sort_key(data, path: str) -> Optional[tuple]:
+    """
+    Computes the sort key of a document.
+    :param data: The document data.
+    :param path: The dotted attribute path.
+    :return: The sort key, or None when the document is ordered last.
+    """
+    keys = [
+        key
+        for key in map(value_key, index.extract_values(data, path))
+        if key is not None
+    ]
+
+    return keys[0] if len(keys) == 1 else None
+
+
+def first_by_id(documents: Iterable[Document], count: Optional[int]) -> List[Document]:
+    """
+    Orders documents by id and keeps the first ones.
+    :param documents: The documents.
+    :param count: The number of documents to keep. When None, every document is kept.
+    :return: The ordered documents.
+    """
+    if count is None:
+        return sorted(documents, key=_id_key)
+
+    return heapq.nsmallest(count, documents, key=_id_key)
+
+
+def _id_key(document: Document) -> tuple:
+    return index.id_key(document.get_id())
+
+
+def top_k(
+    documents: Iterable[Document], path: str, descending: bool, count: Optional[int]
+) -> List[Document]:
+    """
+    Orders documents and keeps the first ones. With a count, a heap of at most
+    count documents is kept, so memory does not grow with the number of documents.
+    :param documents: The documents.
+    :param path: The dotted attribute path.
+    :param descending: When True, the documents are ordered in descending order.
+    :param count: The number of documents to keep. When None, every document is kept.
+    :return: The ordered documents.
+    """
+    unordered: List[Document] = []
+
+    def keyed():
+        for document in documents:
+            key = sort_key(document.get_data(), path)
+
+            if key is not None:
+                yield (key, index.id_key(document.get_id())), document
+            else:
+                unordered.append(document)
+
+                # Trimming in bulk keeps memory bounded by the count.
+                if count is not None and len(unordered) > 2 * count:
+                    unordered[:] = first_by_id(unordered, count)
+
+    if count is None:
+        ordered = sorted(keyed(), key=itemgetter(0), reverse=descending)
+    elif descending:
+        ordered = heapq.nlargest(count, keyed(), key=itemgetter(0))
+    else:
+        ordered = heapq.nsmallest(count, keyed(), key=itemgetter(0))
+
+    result = [document for _, document in ordered]
+    result.extend(first_by_id(unordered, count))
+
+    return result if count is None else result[:count]
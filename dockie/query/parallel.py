@@ -0,0 +1,279 @@
+"""
+Parallel query module. Large full scans can be partitioned across worker
+processes to evaluate the query on more than one core. Each worker keeps its
+share of a container's documents until the container changes, so a scan sends
+the workers only the query.
+"""
+import collections
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from typing import Dict, List, NamedTuple, Optional
+
+from dockie.core import ensure, errors
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.query.cache import CompiledQuery
+
+_START_METHODS = ("forkserver", "spawn")
+
+# The compiled queries of a worker process, keyed by the query string.
+_COMPILED: Dict[str, CompiledQuery] = {}
+
+# The document data published to a worker process, keyed by publication token.
+_PUBLISHED: Dict[int, list] = {}
+
+
+def _discard(tokens: List[int]):
+    for token in tokens:
+        _PUBLISHED.pop(token, None)
+
+
+def _publish(token: int, data: list, discarded: List[int]):
+    _discard(discarded)
+    _PUBLISHED[token] = data
+
+
+def _match_published(token: int, query: str, discarded: List[int]) -> List[int]:
+    _discard(discarded)
+    compiled_query = _COMPILED.get(query)
+
+    if compiled_query is None:
+        if len(_COMPILED) >= 256:
+            _COMPILED.clear()
+
+        compiled_query = _COMPILED[query] = CompiledQuery(query)
+
+    return [
+        position
+        for position, item in enumerate(_PUBLISHED[token])
+        if compiled_query.match(item)
+    ]
+
+
+def _shutdown(workers: list):
+    for worker in workers:
+        worker.shutdown(wait=False, cancel_futures=True)
+
+
+class ParallelScan(NamedTuple):
+    """
+    The result of a parallel scan.
+
+    documents: The matching documents in insertion order.
+    scanned: The number of documents the workers evaluated.
+    """
+
+    documents: List[Document]
+    scanned: int
+
+
+class _Publication(NamedTuple):
+    version: int
+    token: int
+    documents: List[Document]
+    starts: List[int]
+    finalizer: weakref.finalize
+
+
+class ParallelExecutor:  # pylint: disable=too-many-instance-attributes
+    """
+    Evaluates queries over containers with persistent worker processes.
+    Workers are started with the 'forkserver' or 'spawn' method, never by
+    forking the querying process: forking a process that runs other threads,
+    such as expiry sweepers, log syncers or snapshot schedulers, can deadlock
+    the child on a lock one of those threads held.
+
+    The documents of a container are split into one share per worker and
+    published once per container version. Each worker keeps its share, so a
+    scan of an unchanged container sends only the query, and only the positions
+    of the matches are sent back, so matches are returned in insertion order.
+    A write to the container publishes it again on the next scan. Documents
+    that expire after they were published are filtered out of the matches.
+    Shares are discarded once their container is gone.
+
+    Queries from several threads share the workers. Call close, or use the
+    executor as a context manager, to stop them.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        threshold: int = 50000,
+        start_method: Optional[str] = None,
+    ):
+        """
+        Creates a ParallelExecutor instance. The workers are started by the
+        first scan that is run in parallel.
+        :param processes: The number of worker processes. When not specified, one
+        process per CPU is used.
+        :param threshold: The minimum number of documents for which workers are used.
+        :param start_method: 'forkserver' or 'spawn'. When not specified,
+        'forkserver' is used where it is available, otherwise 'spawn'.
+        """
+        self._processes = processes or os.cpu_count() or 1
+        ensure.greater_than_zero(
+            self._processes,
+            errors.QueryError("Number of processes must be greater than zero."),
+        )
+        ensure.greater_than_zero(
+            threshold, errors.QueryError("Threshold must be greater than zero.")
+        )
+
+        available = multiprocessing.get_all_start_methods()
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in available else "spawn"
+
+        if start_method not in _START_METHODS or start_method not in available:
+            raise errors.QueryError(
+                f"Start method '{start_method}' is not supported. Supported start "
+                f"methods are {', '.join(m for m in _START_METHODS if m in available)}."
+            )
+
+        self._threshold = threshold
+        self._start_method = start_method
+        self._workers: Optional[List[concurrent.futures.ProcessPoolExecutor]] = None
+        self._publications = weakref.WeakKeyDictionary()
+        # Tokens of containers that are gone. Finalizers append to the deque
+        # during garbage collection, so it is drained without taking the lock.
+        self._discarded = collections.deque()
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    def __enter__(self) -> "ParallelExecutor":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def should_parallelize(self, document_count: int) -> bool:
+        """
+        Checks whether a scan over a number of documents is run in parallel.
+        :param document_count: The number of documents to scan.
+        :return: True if worker processes are used, otherwise False.
+        """
+        return self._processes > 1 and document_count >= self._threshold
+
+    def scan(self, container: Container, compiled_query: CompiledQuery) -> ParallelScan:
+        """
+        Retrieves the documents of a container that satisfy a query. The
+        container is published to the workers first when it changed since it
+        was last published.
+        :param container: The container to scan.
+        :param compiled_query: The compiled query.
+        :return: The matching documents and the number of documents scanned.
+        """
+        # Every worker runs its tasks in submission order, so submitting under
+        # the lock keeps a scan ahead of the publication that discards its share.
+        with self._lock:
+            workers = self._get_workers()
+            publication = self._publish(container, workers)
+            discarded = self._drain_discarded()
+            futures = [
+                worker.submit(
+                    _match_published,
+                    publication.token,
+                    compiled_query.get_query(),
+                    discarded,
+                )
+                for worker in workers
+            ]
+
+        documents = publication.documents
+        matches = [
+            documents[start + position]
+            for start, future in zip(publication.starts, futures)
+            for position in future.result()
+        ]
+        queue = container.get_expiry_queue()
+
+        if queue is not None and matches:
+            now = time.time()
+            matches = [
+                document
+                for document in matches
+                if not queue.is_expired(document.get_id(), now)
+            ]
+
+        return ParallelScan(matches, len(documents))
+
+    def close(self):
+        """
+        Stops the worker processes and forgets what was published. A later
+        parallel scan starts new ones.
+        """
+        with self._lock:
+            if self._finalizer is not None:
+                self._finalizer()
+                self._workers = None
+                self._finalizer = None
+
+            for publication in self._publications.values():
+                publication.finalizer.detach()
+
+            self._publications.clear()
+            self._discarded.clear()
+
+    def _get_workers(self) -> List[concurrent.futures.ProcessPoolExecutor]:
+        if self._workers is None:
+            context = multiprocessing.get_context(self._start_method)
+            # Single process executors, so every share stays with one worker.
+            self._workers = [
+                concurrent.futures.ProcessPoolExecutor(1, mp_context=context)
+                for _ in range(self._processes)
+            ]
+            self._finalizer = weakref.finalize(self, _shutdown, self._workers)
+
+        return self._workers
+
+    def _publish(self, container: Container, workers: list) -> _Publication:
+        publication = self._publications.get(container)
+
+        with container.get_lock().read():
+            version = container.get_version()
+
+            if publication is not None and publication.version == version:
+                return publication
+
+            documents = list(container.iter_documents())
+
+        if publication is not None:
+            publication.finalizer.detach()
+            self._discarded.append(publication.token)
+
+        token = next(self._tokens)
+        share = -(-len(documents) // len(workers)) or 1
+        starts = list(range(0, len(workers) * share, share))
+        discarded = self._drain_discarded()
+
+        for worker, start in zip(workers, starts):
+            worker.submit(
+                _publish,
+                token,
+                [document.get_data() for document in documents[start : start + share]],
+                discarded,
+            )
+
+        publication = self._publications[container] = _Publication(
+            version,
+            token,
+            documents,
+            starts,
+            weakref.finalize(container, self._discarded.append, token),
+        )
+
+        return publication
+
+    def _drain_discarded(self) -> List[int]:
+        discarded = []
+
+        while self._discarded:
+            discarded.append(self._discarded.popleft())
+
+        return discarded
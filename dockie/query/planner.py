@@ -0,0 +1,760 @@
+"""
+Query planner module. The planner decides whether an attribute query can be
+answered from a container's secondary indexes or columns, or needs a full scan.
+"""
+from abc import ABC, abstractmethod
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dictquery import parsers
+from dictquery.visitors import DataQueryVisitor
+
+from dockie.core import index
+from dockie.core.container import Container
+from dockie.core.document import Document, NoneDocument
+from dockie.core.partition import PartitionedContainer
+from dockie.query import ordering
+from dockie.query.cache import CompiledQuery
+
+_MIRRORED_OPERATORS = {
+    parsers.EqualExpression: parsers.EqualExpression,
+    parsers.LTExpression: parsers.GTExpression,
+    parsers.LTEExpression: parsers.GTEExpression,
+    parsers.GTExpression: parsers.LTExpression,
+    parsers.GTEExpression: parsers.LTEExpression,
+}
+
+_LITERAL_EXPRESSIONS = (
+    parsers.NumberExpression,
+    parsers.BooleanExpression,
+    parsers.NoneExpression,
+    parsers.StringExpression,
+)
+
+_COLUMN_COMPARISONS = {
+    parsers.EqualExpression: ("==", "=="),
+    parsers.NotEqualExpression: ("!=", "!="),
+    parsers.LTExpression: ("<", ">"),
+    parsers.LTEExpression: ("<=", ">="),
+    parsers.GTExpression: (">", "<"),
+    parsers.GTEExpression: (">=", "<="),
+}
+
+_NUMERIC_LITERALS = (parsers.NumberExpression, parsers.BooleanExpression)
+
+_literal_visitor = DataQueryVisitor(None)
+
+
+class QueryPlan(ABC):
+    """
+    Represents the strategy used to find the candidate documents of a query.
+    Candidates are always verified against the full query, so a plan only
+    needs to return a superset of the matching documents.
+    """
+
+    @abstractmethod
+    def documents(self, container: Container) -> Iterable[Document]:  # pragma: no cover
+        """
+        Retrieves the candidate documents.
+        :param container: The container being queried.
+        """
+
+    @abstractmethod
+    def describe(self) -> str:  # pragma: no cover
+        """
+        Describes the plan.
+        """
+
+    def uses_index(self) -> bool:
+        """
+        Checks whether the plan reads from a secondary index.
+        :return: True if the plan reads from an index, otherwise False.
+        """
+        return True
+
+    def is_exact(self) -> bool:
+        """
+        Checks whether every document returned by the plan satisfies the query,
+        in which case the candidates do not need to be verified.
+        :return: True if the plan returns only matches, otherwise False.
+        """
+        return False
+
+    def __str__(self):
+        return self.describe()
+
+
+class FullScanPlan(QueryPlan):
+    """
+    Represents a plan that scans every document in the container.
+    """
+
+    def documents(self, container: Container) -> Iterable[Document]:
+        return container.iter_documents()
+
+    def describe(self) -> str:
+        return "FULL SCAN"
+
+    def uses_index(self) -> bool:
+        return False
+
+
+class _IndexPlan(QueryPlan):
+    def documents(self, container: Container) -> Iterable[Document]:
+        with container.get_lock().read():
+            document_ids = list(self.document_ids())
+
+        for document_id in document_ids:
+            document = container.get_document(document_id)
+
+            if not isinstance(document, NoneDocument):
+                yield document
+
+    @abstractmethod
+    def document_ids(self) -> Iterable:  # pragma: no cover
+        """
+        Retrieves the candidate document ids.
+        """
+
+    @abstractmethod
+    def estimate(self) -> int:  # pragma: no cover
+        """
+        Estimates the number of candidate documents.
+        """
+
+
+class IndexLookupPlan(_IndexPlan):
+    """
+    Represents a plan that looks up one or more values in an index.
+    """
+
+    def __init__(self, document_index: index.Index, values: list):
+        self.index = document_index
+        self.values = values
+
+    def document_ids(self) -> Iterable:
+        return _distinct(self.index.lookup(value) for value in self.values)
+
+    def estimate(self) -> int:
+        return sum(self.index.count(value) for value in self.values)
+
+    def describe(self) -> str:
+        return (
+            f"INDEX LOOKUP ON '{self.index.get_path()}' "
+            f"({self.index.index_type}) FOR {self.values!r}"
+        )
+
+
+class IndexRangePlan(_IndexPlan):
+    """
+    Represents a plan that reads a range of values from a sorted index.
+    """
+
+    def __init__(
+        self,
+        document_index: index.SortedIndex,
+        lower=None,
+        lower_inclusive=True,
+        upper=None,
+        upper_inclusive=True,
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.index = document_index
+        self.lower = lower
+        self.lower_inclusive = lower_inclusive
+        self.upper = upper
+        self.upper_inclusive = upper_inclusive
+
+    def document_ids(self) -> Iterable:
+        return _distinct(
+            [
+                self.index.range(
+                    self.lower, self.lower_inclusive, self.upper, self.upper_inclusive
+                )
+            ]
+        )
+
+    def estimate(self) -> int:
+        return self.index.count_range(
+            self.lower, self.lower_inclusive, self.upper, self.upper_inclusive
+        )
+
+    def describe(self) -> str:
+        bounds = []
+
+        if self.lower is not None:
+            bounds.append(f"{self.lower!r} {'<=' if self.lower_inclusive else '<'}")
+
+        bounds.append("value")
+
+        if self.upper is not None:
+            bounds.append(f"{'<=' if self.upper_inclusive else '<'} {self.upper!r}")
+
+        return (
+            f"INDEX RANGE ON '{self.index.get_path()}' "
+            f"({self.index.index_type}) {' '.join(bounds)}"
+        )
+
+    def intersect(self, other: "IndexRangePlan") -> Optional["IndexRangePlan"]:
+        """
+        Combines two ranges over the same index into a single range.
+        :param other: The other range.
+        :return: The combined range, or None if the ranges cannot be combined.
+        """
+        bounds = [
+            bound
+            for bound in (self.lower, self.upper, other.lower, other.upper)
+            if bound is not None
+        ]
+
+        if other.index is not self.index or len(
+            {index.value_family(bound) for bound in bounds}
+        ) != 1:
+            return None
+
+        lower, lower_inclusive = _tighter(
+            (self.lower, self.lower_inclusive), (other.lower, other.lower_inclusive), max
+        )
+        upper, upper_inclusive = _tighter(
+            (self.upper, self.upper_inclusive), (other.upper, other.upper_inclusive), min
+        )
+
+        return IndexRangePlan(self.index, lower, lower_inclusive, upper, upper_inclusive)
+
+
+class UnionPlan(_IndexPlan):
+    """
+    Represents a plan that combines the candidates of several index plans.
+    """
+
+    def __init__(self, plans: List[_IndexPlan]):
+        self.plans = plans
+
+    def document_ids(self) -> Iterable:
+        return _distinct(plan.document_ids() for plan in self.plans)
+
+    def estimate(self) -> int:
+        return sum(plan.estimate() for plan in self.plans)
+
+    def describe(self) -> str:
+        return f"UNION ({', '.join(plan.describe() for plan in self.plans)})"
+
+
+class ColumnarScanPlan(QueryPlan):
+    """
+    Represents a plan that evaluates the comparisons of a query against the
+    container's columns as vectorized operations. Documents holding values that
+    cannot be stored in a column are evaluated one at a time, as are the
+    candidates of a query that is only partly answered by the columns.
+    Matches are returned in insertion order.
+    """
+
+    def __init__(self, compiled_query: CompiledQuery, predicate: tuple):
+        """
+        Creates a ColumnarScanPlan instance.
+        :param compiled_query: The compiled query.
+        :param predicate: The columnar part of the query, as built by the planner.
+        """
+        self.compiled_query = compiled_query
+        self.predicate = predicate
+        self.paths = sorted(_predicate_paths(predicate))
+
+    def select(self, column_store) -> tuple:
+        """
+        Evaluates the columnar part of the query. The caller holds the container's
+        read lock.
+        :param column_store: The container's column store.
+        :return: A mask of the candidate positions and a mask of the candidate
+        positions that must still be verified against the query.
+        """
+        mask, exact = _evaluate(column_store, self.predicate)
+        fallback = column_store.fallback(self.paths)
+        candidates = (mask & column_store.live()) | fallback
+
+        return candidates, fallback if exact else candidates
+
+    def documents(self, container: Container) -> Iterable[Document]:
+        with container.get_lock().read():
+            column_store = container.get_column_store()
+            candidates, unverified = self.select(column_store)
+            document_ids = column_store.ids(candidates)
+            verify = set(column_store.ids(unverified))
+
+        for document_id in document_ids:
+            document = container.get_document(document_id)
+
+            if isinstance(document, NoneDocument):
+                continue
+
+            if document_id not in verify or self.compiled_query.match(document.get_data()):
+                yield document
+
+    def describe(self) -> str:
+        return f"COLUMNAR SCAN ON {', '.join(repr(path) for path in self.paths)}"
+
+    def uses_index(self) -> bool:
+        return False
+
+    def is_exact(self) -> bool:
+        return True
+
+
+class FanOutPlan(QueryPlan):
+    """
+    Represents a plan that runs a query against every partition of a
+    partitioned container, each partition with its own plan. Matches are
+    returned partition by partition.
+    """
+
+    def __init__(self, compiled_query: CompiledQuery, plans: List[QueryPlan]):
+        """
+        Creates a FanOutPlan instance.
+        :param compiled_query: The compiled query.
+        :param plans: The plan of each partition, in partition order.
+        """
+        self.compiled_query = compiled_query
+        self.plans = plans
+
+    def partition_matches(self, container: PartitionedContainer) -> List[Iterator[Document]]:
+        """
+        Retrieves the matches of each partition. Nothing is evaluated until an
+        iterator is consumed, so the iterators can be consumed on other threads.
+        :param container: The partitioned container.
+        :return: An iterator over the matches of each partition, in partition order.
+        """
+        return [
+            self._matches(plan, partition)
+            for plan, partition in zip(self.plans, container.list_partitions())
+        ]
+
+    def _matches(self, plan: QueryPlan, partition: Container) -> Iterator[Document]:
+        for document in plan.documents(partition):
+            if plan.is_exact() or self.compiled_query.match(document.get_data()):
+                yield document
+
+    def documents(self, container: PartitionedContainer) -> Iterable[Document]:
+        return chain.from_iterable(self.partition_matches(container))
+
+    def describe(self) -> str:
+        descriptions = list(dict.fromkeys(plan.describe() for plan in self.plans))
+        return f"FAN OUT {len(self.plans)} PARTITIONS ({', '.join(descriptions)})"
+
+    def uses_index(self) -> bool:
+        return any(plan.uses_index() for plan in self.plans)
+
+    def is_exact(self) -> bool:
+        return True
+
+
+class SortPlan(QueryPlan):
+    """
+    Represents a plan that orders the matches of another plan. When only the
+    first matches are needed, they are kept in a bounded heap, see ordering.top_k.
+    """
+
+    def __init__(self, plan: QueryPlan, path: str, descending: bool):
+        """
+        Creates a SortPlan instance.
+        :param plan: The plan that finds the matches.
+        :param path: The dotted attribute path to order by.
+        :param descending: When True, the matches are ordered in descending order.
+        """
+        self.plan = plan
+        self.path = path
+        self.descending = descending
+
+    def documents(self, container: Container) -> Iterable[Document]:
+        return self.plan.documents(container)
+
+    def describe(self) -> str:
+        return f"SORT ON '{self.path}' {_direction(self.descending)} ({self.plan.describe()})"
+
+    def uses_index(self) -> bool:
+        return self.plan.uses_index()
+
+    def is_exact(self) -> bool:
+        return self.plan.is_exact()
+
+
+class IndexOrderPlan(QueryPlan):
+    """
+    Represents a plan that walks a sorted index in order and verifies each
+    document against the query, so matches are found already ordered and the
+    walk stops once enough matches were found. Documents not ordered by the
+    index are returned last, in the order of ordering.top_k.
+    """
+
+    def __init__(
+        self,
+        compiled_query: CompiledQuery,
+        document_index: index.SortedIndex,
+        descending: bool,
+        plan: QueryPlan,
+    ):
+        """
+        Creates an IndexOrderPlan instance.
+        :param compiled_query: The compiled query.
+        :param document_index: The sorted index on the attribute path to order by.
+        :param descending: When True, the matches are ordered in descending order.
+        :param plan: The plan of the query, either a full scan or a range of the
+        same index, which bounds the walk.
+        """
+        self.compiled_query = compiled_query
+        self.index = document_index
+        self.descending = descending
+        self.plan = plan
+
+    def top(self, container: Container, count: Optional[int]) -> List[Document]:
+        """
+        Retrieves the first matches in order.
+        :param container: The container being queried.
+        :param count: The number of matches. When None, every match is returned.
+        :return: The ordered matches.
+        """
+        bounds = ()
+
+        if isinstance(self.plan, IndexRangePlan):
+            bounds = (
+                self.plan.lower,
+                self.plan.lower_inclusive,
+                self.plan.upper,
+                self.plan.upper_inclusive,
+            )
+
+        ordered: List[Document] = []
+        unordered: Dict[Any, Document] = {}
+
+        def set_aside(document: Document):
+            unordered[document.get_id()] = document
+
+            # Trimming in bulk keeps memory bounded by the count.
+            if count is not None and len(unordered) > 2 * count:
+                kept = ordering.first_by_id(unordered.values(), count)
+                unordered.clear()
+                unordered.update((kept_document.get_id(), kept_document) for kept_document in kept)
+
+        with container.get_lock().read():
+            for document_id in self.index.iter_ordered(*bounds, descending=self.descending):
+                if count is not None and len(ordered) >= count:
+                    break
+
+                single = len(self.index.get_values(document_id)) == 1
+
+                if not single and document_id in unordered:
+                    continue
+
+                document = container.get_document(document_id)
+
+                if not self.compiled_query.match(document.get_data()):
+                    continue
+
+                if single:
+                    ordered.append(document)
+                else:
+                    set_aside(document)
+
+            if count is not None and len(ordered) >= count:
+                return ordered[:count]
+
+            if not bounds:
+                for document in container.iter_documents():
+                    if not self.index.get_values(
+                        document.get_id()
+                    ) and self.compiled_query.match(document.get_data()):
+                        set_aside(document)
+
+        if count is None:
+            return ordered + ordering.first_by_id(unordered.values(), None)
+
+        return ordered + ordering.first_by_id(unordered.values(), count - len(ordered))
+
+    def documents(self, container: Container) -> Iterable[Document]:
+        return self.top(container, None)
+
+    def describe(self) -> str:
+        description = (
+            f"INDEX ORDER ON '{self.index.get_path()}' "
+            f"({self.index.index_type}) {_direction(self.descending)}"
+        )
+
+        if isinstance(self.plan, IndexRangePlan):
+            description += f" ({self.plan.describe()})"
+
+        return description
+
+    def is_exact(self) -> bool:
+        return True
+
+
+def plan_order(
+    container: Container, compiled_query: CompiledQuery, path: str, descending: bool
+) -> QueryPlan:
+    """
+    Chooses the plan used to execute an ordered query. A sorted index on the
+    attribute path to order by is walked in order when the query would
+    otherwise scan the container or read a range of that index. Otherwise, the
+    matches are sorted.
+    :param container: The container to query.
+    :param compiled_query: The compiled query.
+    :param path: The dotted attribute path to order by.
+    :param descending: When True, the matches are ordered in descending order.
+    :return: The query plan.
+    """
+    plan = plan_query(container, compiled_query)
+
+    if isinstance(container, Container):
+        document_index = container.get_index(path)
+
+        if isinstance(document_index, index.SortedIndex) and (
+            isinstance(plan, FullScanPlan)
+            or (isinstance(plan, IndexRangePlan) and plan.index is document_index)
+        ):
+            return IndexOrderPlan(compiled_query, document_index, descending, plan)
+
+    return SortPlan(plan, path, descending)
+
+
+def plan_query(container: Container, compiled_query: CompiledQuery) -> QueryPlan:
+    """
+    Chooses the plan used to execute a query against a container. An index is
+    used when the query, or one side of a conjunction, compares an indexed
+    attribute with a literal value. Otherwise, comparisons of columns with
+    numbers are evaluated against the columns. Otherwise, the container is scanned.
+    Partitioned containers are planned partition by partition.
+    :param container: The container to query.
+    :param compiled_query: The compiled query.
+    :return: The query plan.
+    """
+    if isinstance(container, PartitionedContainer):
+        return FanOutPlan(
+            compiled_query,
+            [plan_query(partition, compiled_query) for partition in container.list_partitions()],
+        )
+
+    plan = _plan(container, compiled_query.get_ast())
+
+    if plan is not None:
+        return plan
+
+    column_store = container.get_column_store()
+
+    if column_store is not None:
+        predicate = _plan_columns(column_store, compiled_query.get_ast())
+
+        if predicate is not None:
+            return ColumnarScanPlan(compiled_query, predicate)
+
+    return FullScanPlan()
+
+
+def _plan(container: Container, node) -> Optional[_IndexPlan]:
+    if isinstance(node, parsers.AndExpression):
+        return _plan_and(_plan(container, node.left), _plan(container, node.right))
+
+    if isinstance(node, parsers.OrExpression):
+        left = _plan(container, node.left)
+        right = _plan(container, node.right)
+        return UnionPlan([left, right]) if left and right else None
+
+    if isinstance(node, parsers.InExpression):
+        return _plan_in(container, node)
+
+    if type(node) in _MIRRORED_OPERATORS:
+        return _plan_comparison(container, node)
+
+    return None
+
+
+def _plan_and(left: Optional[_IndexPlan], right: Optional[_IndexPlan]):
+    if isinstance(left, IndexRangePlan) and isinstance(right, IndexRangePlan):
+        combined = left.intersect(right)
+
+        if combined is not None:
+            return combined
+
+    plans = [plan for plan in (left, right) if plan is not None]
+
+    return min(plans, key=lambda plan: plan.estimate()) if plans else None
+
+
+def _plan_in(container: Container, node) -> Optional[_IndexPlan]:
+    if not isinstance(node.left, parsers.KeyExpression) or not isinstance(
+        node.right, parsers.ArrayExpression
+    ):
+        return None
+
+    document_index = container.get_index(node.left.value)
+
+    if document_index is None or not all(
+        isinstance(item, _LITERAL_EXPRESSIONS) for item in node.right.value
+    ):
+        return None
+
+    values = [item.accept(_literal_visitor) for item in node.right.value]
+
+    if not all(document_index.accepts(value) for value in values):
+        return None
+
+    return IndexLookupPlan(document_index, values)
+
+
+def _plan_comparison(container: Container, node) -> Optional[_IndexPlan]:
+    operator = type(node)
+    key, literal = node.left, node.right
+
+    if isinstance(literal, parsers.KeyExpression):
+        operator = _MIRRORED_OPERATORS[operator]
+        key, literal = literal, key
+
+    if not isinstance(key, parsers.KeyExpression) or not isinstance(
+        literal, _LITERAL_EXPRESSIONS
+    ):
+        return None
+
+    document_index = container.get_index(key.value)
+    value = literal.accept(_literal_visitor)
+
+    if document_index is None or not document_index.accepts(value):
+        return None
+
+    if operator is parsers.EqualExpression:
+        return IndexLookupPlan(document_index, [value])
+
+    if not isinstance(document_index, index.SortedIndex):
+        return None
+
+    if operator in (parsers.GTExpression, parsers.GTEExpression):
+        return IndexRangePlan(
+            document_index, lower=value, lower_inclusive=operator is parsers.GTEExpression
+        )
+
+    return IndexRangePlan(
+        document_index, upper=value, upper_inclusive=operator is parsers.LTEExpression
+    )
+
+
+def _plan_columns(column_store, node) -> Optional[tuple]:
+    if isinstance(node, (parsers.AndExpression, parsers.OrExpression)):
+        return _plan_column_junction(column_store, node)
+
+    if isinstance(node, parsers.NotExpression):
+        child = _plan_columns(column_store, node.value)
+        return ("not", child) if child and _is_exact(child) else None
+
+    if isinstance(node, parsers.InExpression):
+        return _plan_column_membership(column_store, node)
+
+    if type(node) in _COLUMN_COMPARISONS:
+        return _plan_column_comparison(column_store, node)
+
+    return None
+
+
+def _plan_column_junction(column_store, node) -> Optional[tuple]:
+    left = _plan_columns(column_store, node.left)
+    right = _plan_columns(column_store, node.right)
+
+    if left and right:
+        kind = "and" if isinstance(node, parsers.AndExpression) else "or"
+        return kind, left, right
+
+    if isinstance(node, parsers.AndExpression) and (left or right):
+        return "partial", left or right
+
+    return None
+
+
+def _plan_column_membership(column_store, node) -> Optional[tuple]:
+    if (
+        isinstance(node.left, parsers.KeyExpression)
+        and isinstance(node.right, parsers.ArrayExpression)
+        and column_store.has_column(node.left.value)
+        and all(isinstance(item, _NUMERIC_LITERALS) for item in node.right.value)
+    ):
+        values = [item.accept(_literal_visitor) for item in node.right.value]
+        return "in", node.left.value, values
+
+    return None
+
+
+def _plan_column_comparison(column_store, node) -> Optional[tuple]:
+    comparison, mirrored = _COLUMN_COMPARISONS[type(node)]
+    key, literal = node.left, node.right
+
+    if isinstance(literal, parsers.KeyExpression):
+        comparison = mirrored
+        key, literal = literal, key
+
+    if (
+        not isinstance(key, parsers.KeyExpression)
+        or not isinstance(literal, _NUMERIC_LITERALS)
+        or not column_store.has_column(key.value)
+    ):
+        return None
+
+    return "compare", key.value, comparison, literal.accept(_literal_visitor)
+
+
+def _evaluate(column_store, predicate: tuple) -> tuple:
+    kind = predicate[0]
+
+    if kind == "compare":
+        return column_store.compare(*predicate[1:]), True
+
+    if kind == "in":
+        return column_store.isin(*predicate[1:]), True
+
+    if kind == "not":
+        return ~_evaluate(column_store, predicate[1])[0], True
+
+    if kind == "partial":
+        return _evaluate(column_store, predicate[1])[0], False
+
+    left, left_exact = _evaluate(column_store, predicate[1])
+    right, right_exact = _evaluate(column_store, predicate[2])
+    mask = left & right if kind == "and" else left | right
+
+    return mask, left_exact and right_exact
+
+
+def _is_exact(predicate: tuple) -> bool:
+    if predicate[0] in ("and", "or"):
+        return _is_exact(predicate[1]) and _is_exact(predicate[2])
+
+    return predicate[0] != "partial"
+
+
+def _predicate_paths(predicate: tuple) -> set:
+    if predicate[0] in ("compare", "in"):
+        return {predicate[1]}
+
+    return set().union(
+        *(_predicate_paths(child) for child in predicate[1:] if isinstance(child, tuple))
+    )
+
+
+def _tighter(first: tuple, second: tuple, choose) -> tuple:
+    if first[0] is None:
+        return second
+
+    if second[0] is None:
+        return first
+
+    if first[0] == second[0]:
+        return first[0], first[1] and second[1]
+
+    return first if choose(first[0], second[0]) == first[0] else second
+
+
+def _distinct(groups: Iterable[Iterable]) -> Iterable:
+    document_ids = {}
+
+    for group in groups:
+        for document_id in group:
+            document_ids[document_id] = None
+
+    return document_ids
+
+
+def _direction(descending: bool) -> str:
+    return "DESC" if descending else "ASC"
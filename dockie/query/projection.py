@@ -0,0 +1,94 @@
+"""
+Projection module. A projection picks a few dotted attribute paths out of
+each matching document, so callers receive small tuples or dicts instead of
+whole documents.
+"""
+from typing import Iterable, Union
+
+from dockie.core import ensure, errors
+from dockie.core.document import Document
+
+TUPLE = "tuple"
+DICT = "dict"
+
+DOCUMENT_ID = "$id"
+
+
+class Projection:
+    """
+    Represents a compiled projection. Each path is followed through nested
+    objects only; a path that is missing, or that runs into a value that is not
+    an object, such as a list, projects None. Projected values are the stored
+    values, not copies, so they must not be changed.
+    """
+
+    def __init__(self, paths: Iterable[str], projection_format: str = TUPLE):
+        """
+        Creates a Projection instance.
+        :param paths: The dotted attribute paths, such as 'bio.name'. The path
+        '$id' projects the document id.
+        :param projection_format: 'tuple' to project a tuple of the values in
+        path order, or 'dict' to project a dict keyed by path.
+        """
+        ensure.not_none(paths, errors.QueryError("Projection not specified."))
+
+        if isinstance(paths, str):
+            raise errors.QueryError("Projection must be a list of attribute paths.")
+
+        self._paths = tuple(paths)
+
+        if not self._paths:
+            raise errors.QueryError("Projection must contain at least one attribute path.")
+
+        for path in self._paths:
+            ensure.not_none_or_whitespace(
+                path, errors.QueryError("Projection path not specified.")
+            )
+
+        if projection_format not in (TUPLE, DICT):
+            raise errors.QueryError(
+                f"Unknown projection format '{projection_format}'. "
+                f"Supported formats are '{TUPLE}' and '{DICT}'."
+            )
+
+        self._format = projection_format
+        self._keys = tuple(
+            None if path == DOCUMENT_ID else tuple(path.split("."))
+            for path in self._paths
+        )
+
+    def get_paths(self) -> tuple:
+        """
+        Retrieves the projected paths.
+        :return: The dotted attribute paths.
+        """
+        return self._paths
+
+    def apply(self, document: Document) -> Union[tuple, dict]:
+        """
+        Projects a document.
+        :param document: The document.
+        :return: The projected values, as a tuple or a dict.
+        """
+        data = document.get_data()
+        values = tuple(
+            document.get_id() if keys is None else _lookup(data, keys)
+            for keys in self._keys
+        )
+
+        if self._format == TUPLE:
+            return values
+
+        return dict(zip(self._paths, values))
+
+
+def _lookup(data, keys: tuple):
+    value = data
+
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+
+        value = value.get(key)
+
+    return value
@@ -2,12 +2,31 @@
 Query module.
 """
 from abc import ABC, abstractmethod
-from typing import Union, List
-import dictquery as dq
-from dockie.core.container import Container
+from concurrent.futures import Executor
+from itertools import chain, islice
+from typing import AsyncIterator, Iterator, Optional, Union, List
+from dockie.core.aio import AsyncContainer, run_blocking
+from dockie.core.container import Container, validate_ids
 from dockie.core import ensure
 from dockie.core import errors
+from dockie.core import instrumentation
 from dockie.core.document import Document, NoneDocument
+from dockie.core.partition import PartitionedContainer
+from dockie.query import ordering
+from dockie.query.aggregation import Aggregation
+from dockie.query.cache import CompiledQuery, QueryCache, default_query_cache
+from dockie.query.parallel import ParallelExecutor
+from dockie.query.projection import TUPLE, Projection
+from dockie.query.planner import (
+    ColumnarScanPlan,
+    FanOutPlan,
+    FullScanPlan,
+    IndexOrderPlan,
+    QueryPlan,
+    SortPlan,
+    plan_order,
+    plan_query,
+)
 
 
 class DocumentQuery(ABC):
@@ -26,7 +45,36 @@ class DocumentQuery(ABC):
         ensure.not_none(
             container, errors.ObjectCreateError("Container name not specified.")
         )
-        return self.on_execute(container, **kwargs)
+
+        collector = instrumentation.ACTIVE
+
+        if collector is None:
+            return self.on_execute(container, **kwargs)
+
+        with collector.profile_query(
+            type(self).__name__, container.get_name(), kwargs.get("query")
+        ) as profile:
+            result = self.on_execute(container, **kwargs)
+            profile.returned = _count_results(result)
+
+        return result
+
+    async def execute_async(
+        self,
+        container: Union[Container, AsyncContainer],
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ):
+        """
+        Executes the document query in an executor, so the event loop is not
+        blocked while the container is scanned.
+        :param container: The container to query.
+        :param executor: The executor. When not specified, the event loop's
+        default executor is used.
+        :param kwargs: Additional keyword arguments to the query.
+        :return: The query result.
+        """
+        return await run_blocking(executor, self.execute, _unwrap(container), **kwargs)
 
     @abstractmethod
     def on_execute(self, container: Container, **kwargs):  # pragma: no cover
@@ -39,13 +87,28 @@ class DocumentQuery(ABC):
 
 class DocumentIdQuery(DocumentQuery):
     """
-    Represents a document id query.
+    Represents a document id query. With 'document_id', a single document is
+    retrieved. With 'document_ids', several documents are retrieved at once and
+    returned in the order of the ids, with NONE_DOCUMENT marking the ids that
+    were not found.
     """
 
     def on_execute(
             self, container: Container, **kwargs
-    ) -> Union[Document, NoneDocument]:
+    ) -> Union[Document, NoneDocument, List[Document]]:
         document_id = kwargs.get("document_id")
+        document_ids = kwargs.get("document_ids")
+
+        if document_ids is not None:
+            if document_id is not None:
+                raise errors.QueryError(
+                    "Specify either 'document_id' or 'document_ids', not both."
+                )
+
+            if isinstance(document_ids, (str, bytes)):
+                raise errors.QueryError("Document ids must be a list of document ids.")
+
+            return container.get_documents(validate_ids(document_ids, errors.QueryError))
 
         ensure.id_specified(
             document_id, errors.QueryError("Document id not specified.")
@@ -56,18 +119,444 @@ class DocumentIdQuery(DocumentQuery):
 
 class DocumentAttributeQuery(DocumentQuery):
     """
-    Represents a document attribute query,
+    Represents a document attribute query. When the container has a secondary
+    index that can answer the query, matches are returned in index order.
+    Otherwise, the container is scanned and matches are returned in insertion order.
+    Queries against a partitioned container return matches partition by partition.
     """
 
+    def __init__(
+        self,
+        query_cache: QueryCache = None,
+        executor: ParallelExecutor = None,
+        partition_executor: Executor = None,
+    ):
+        """
+        Creates a DocumentAttributeQuery instance.
+        :param query_cache: The cache of compiled queries. When not specified,
+        the module wide default cache is used.
+        :param executor: When specified, unlimited full scans of containers at or
+        above the executor's threshold are evaluated by its worker processes.
+        :param partition_executor: When specified, unlimited queries against a
+        partitioned container evaluate the partitions concurrently on this executor.
+        """
+        self._query_cache = query_cache or default_query_cache
+        self._executor = executor
+        self._partition_executor = partition_executor
+
     def on_execute(self, container: Container, **kwargs) -> List[Document]:
-        documents = []
+        return list(self.iterate(container, **kwargs))
+
+    def iterate(self, container: Container, **kwargs) -> Iterator[Document]:
+        """
+        Executes the query lazily. Matches are yielded as they are found and the
+        scan stops as soon as the requested page of results has been produced.
+        :param container: The container to query.
+        :param kwargs: The query keyword arguments. 'query' is the query string,
+        'offset' is the number of matches to skip and 'limit' is the maximum number
+        of matches to return. 'order_by' is a dotted attribute path to order the
+        matches by and 'order' is 'asc', the default, or 'desc', see
+        ordering.top_k. 'projection' is a list of dotted attribute paths;
+        when specified, each match is returned as a tuple of the values at those
+        paths, or as a dict keyed by path when 'projection_format' is 'dict'.
+        :return: An iterator over the matching documents or their projections.
+        When the container has a result cache, the page is computed in full and
+        cached, see Container.enable_result_cache.
+        """
+        ensure.not_none(
+            container, errors.ObjectCreateError("Container name not specified.")
+        )
         query = kwargs.get("query")
         ensure.not_none(query, errors.QueryError("Query string not specified."))
 
-        for document_id in container.list_documents():
-            document = container.get_document(document_id)
+        offset = kwargs.get("offset", 0)
+        limit = kwargs.get("limit")
+        ensure.not_negative(
+            offset, errors.QueryError("Offset must be zero or greater.")
+        )
+
+        if limit is not None:
+            ensure.not_negative(limit, errors.QueryError("Limit must be zero or greater."))
+
+        order_by = kwargs.get("order_by")
+        descending = False
+
+        if order_by is not None:
+            ensure.not_none_or_whitespace(
+                order_by, errors.QueryError("Order path not specified.")
+            )
+            descending = ordering.is_descending(kwargs.get("order", ordering.ASCENDING))
+
+        page = self._page(container, query, offset, limit, order_by, descending)
+        projection = kwargs.get("projection")
+
+        if projection is not None:
+            projection = Projection(projection, kwargs.get("projection_format", TUPLE))
+            return map(projection.apply, page)
+
+        return page
+
+    def _page(
+        self,
+        container: Container,
+        query: str,
+        offset: int,
+        limit: Optional[int],
+        order_by: Optional[str],
+        descending: bool,
+    ) -> Iterator[Document]:
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        result_cache = container.get_result_cache()
+
+        # Cached results were computed before any of the documents expired, and
+        # removing expired documents changes the version, so the cache is only
+        # bypassed while expired documents are waiting to be swept.
+        if result_cache is None or container.has_expired_documents():
+            return self._matches(container, query, offset, limit, order_by, descending)
+
+        key = (query, offset, limit, order_by, descending)
+        version = container.get_version()
+        cached = result_cache.get(key, version)
+
+        if cached is None:
+            cached = tuple(
+                self._matches(container, query, offset, limit, order_by, descending)
+            )
+            result_cache.put(key, version, cached)
+
+        return iter(cached)
+
+    def _matches(
+        self,
+        container: Container,
+        query: str,
+        offset: int,
+        limit: Optional[int],
+        order_by: Optional[str],
+        descending: bool,
+    ) -> Iterator[Document]:
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        compiled_query = self._query_cache.get(query)
+
+        if order_by is None:
+            plan = plan_query(container, compiled_query)
+        else:
+            plan = plan_order(container, compiled_query, order_by, descending)
+
+        profile = None
+        collector = instrumentation.ACTIVE
+
+        if collector is not None:
+            profile = collector.current_query()
+
+            if profile is not None:
+                profile.plan = plan.describe()
+
+        count = None if limit is None else offset + limit
+
+        if isinstance(plan, IndexOrderPlan):
+            return islice(plan.top(container, count), offset, None)
+
+        if isinstance(plan, SortPlan):
+            matches = self._scan(container, compiled_query, plan.plan, profile, True)
+            return islice(ordering.top_k(matches, order_by, descending, count), offset, None)
+
+        matches = self._scan(container, compiled_query, plan, profile, limit is None)
+
+        return islice(matches, offset, count)
+
+    def _scan(
+        self,
+        container: Container,
+        compiled_query: CompiledQuery,
+        plan: QueryPlan,
+        profile: Optional[instrumentation.QueryProfile],
+        unlimited: bool,
+    ) -> Iterator[Document]:
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if (
+            self._partition_executor is not None
+            and unlimited
+            and isinstance(plan, FanOutPlan)
+        ):
+            partitions = self._partition_executor.map(list, plan.partition_matches(container))
+            return chain.from_iterable(partitions)
+
+        if (
+            self._executor is not None
+            and unlimited
+            and isinstance(plan, FullScanPlan)
+            and self._executor.should_parallelize(container.count_documents())
+        ):
+            documents, scanned = self._executor.scan(container, compiled_query)
+
+            if profile is not None:
+                profile.scanned = (profile.scanned or 0) + scanned
+
+            return iter(documents)
+
+        candidates = plan.documents(container)
+
+        if profile is not None:
+            candidates = profile.count_scanned(candidates)
+
+        if plan.is_exact():
+            return iter(candidates)
+
+        return (
+            document
+            for document in candidates
+            if compiled_query.match(document.get_data())
+        )
+
+    async def iterate_async(
+        self,
+        container: Union[Container, AsyncContainer],
+        executor: Optional[Executor] = None,
+        batch_size: int = 100,
+        **kwargs,
+    ) -> AsyncIterator[Document]:
+        """
+        Executes the query lazily from a coroutine. The scan runs in an executor
+        one batch of matches at a time and control returns to the event loop
+        between batches, so other coroutines keep running during long scans.
+        :param container: The container to query.
+        :param executor: The executor. When not specified, the event loop's
+        default executor is used.
+        :param batch_size: The number of matches produced per call to the executor.
+        :param kwargs: The query keyword arguments, see iterate.
+        :return: An asynchronous iterator over the matching documents.
+        """
+        ensure.greater_than_zero(
+            batch_size, errors.QueryError("Batch size must be greater than zero.")
+        )
+        matches = await run_blocking(executor, self.iterate, _unwrap(container), **kwargs)
+
+        while True:
+            batch = await run_blocking(executor, list, islice(matches, batch_size))
+
+            for document in batch:
+                yield document
+
+            if len(batch) < batch_size:
+                return
+
+    def explain(self, container: Container, **kwargs) -> QueryPlan:
+        """
+        Reports the plan chosen to execute the query without executing it.
+        :param container: The container to query.
+        :param kwargs: The query keyword arguments.
+        :return: The query plan.
+        """
+        ensure.not_none(
+            container, errors.ObjectCreateError("Container name not specified.")
+        )
+        query = kwargs.get("query")
+        ensure.not_none(query, errors.QueryError("Query string not specified."))
+        compiled_query = self._query_cache.get(query)
+        order_by = kwargs.get("order_by")
+
+        if order_by is None:
+            return plan_query(container, compiled_query)
+
+        descending = ordering.is_descending(kwargs.get("order", ordering.ASCENDING))
+
+        return plan_order(container, compiled_query, order_by, descending)
+
+
+class ColumnAggregateQuery(DocumentQuery):
+    """
+    Represents an aggregate over a column, optionally restricted to the
+    documents that satisfy a query.
+    """
+
+    def __init__(self, query_cache: QueryCache = None):
+        """
+        Creates a ColumnAggregateQuery instance.
+        :param query_cache: The cache of compiled queries. When not specified,
+        the module wide default cache is used.
+        """
+        self._query_cache = query_cache or default_query_cache
+
+    def on_execute(self, container: Container, **kwargs):
+        """
+        Computes the aggregate.
+        :param container: The container to query.
+        :param kwargs: The query keyword arguments. 'column' is the column path,
+        'function' is one of 'count', 'sum', 'min', 'max' or 'mean', and 'query'
+        is an optional query string that selects the aggregated documents.
+        :return: The aggregate. The minimum, maximum and mean of no values are None.
+        """
+        column = kwargs.get("column")
+        function = kwargs.get("function")
+        query = kwargs.get("query")
+
+        ensure.not_none_or_whitespace(
+            column, errors.QueryError("Column not specified.")
+        )
+        ensure.not_none_or_whitespace(
+            function, errors.QueryError("Aggregate function not specified.")
+        )
+
+        if column not in container.list_columns():
+            raise errors.QueryError(f"The container has no column on '{column}'.")
+
+        if isinstance(container, PartitionedContainer):
+            return self._merge_partitions(container, column, function, query)
+
+        with container.get_lock().read():
+            column_store = container.get_column_store()
+            unexpired = self._unexpired(container, column_store)
+
+            if query is None:
+                return column_store.aggregate(column, function, unexpired)
+
+            compiled_query = self._query_cache.get(query)
+            plan = plan_query(container, compiled_query)
+
+            if isinstance(plan, ColumnarScanPlan):
+                candidates, unverified = plan.select(column_store)
+                documents = (
+                    container.get_document(document_id)
+                    for document_id in column_store.ids(unverified)
+                )
+                rejected = column_store.mask_of(
+                    document.get_id()
+                    for document in documents
+                    if not compiled_query.match(document.get_data())
+                )
+                mask = candidates & ~rejected
+            else:
+                mask = column_store.mask_of(
+                    document.get_id()
+                    for document in plan.documents(container)
+                    if compiled_query.match(document.get_data())
+                )
+
+            if unexpired is not None:
+                mask &= unexpired
+
+            return column_store.aggregate(column, function, mask)
+
+    @staticmethod
+    def _unexpired(container: Container, column_store):
+        # Expired documents read as missing until they are removed, so they are
+        # left out of the columns as well.
+        if not container.has_expired_documents():
+            return None
+
+        return ~column_store.mask_of(container.get_expiry_queue().list_expired())
+
+    def _merge_partitions(
+        self, container: PartitionedContainer, column: str, function: str, query
+    ):
+        def aggregate(partition_function: str) -> list:
+            return [
+                self.execute(partition, column=column, function=partition_function, query=query)
+                for partition in container.list_partitions()
+            ]
+
+        if function == "mean":
+            count = sum(aggregate("count"))
+            return sum(aggregate("sum")) / count if count else None
+
+        values = aggregate(function)
+
+        if function in ("count", "sum"):
+            return sum(values)
+
+        values = [value for value in values if value is not None]
+        merge = min if function == "min" else max
+
+        return merge(values) if values else None
+
+
+class AggregateQuery(DocumentQuery):
+    """
+    Represents an aggregation over the documents of a container, optionally
+    restricted to the documents that satisfy a query, see aggregation.Aggregation.
+    Documents are aggregated as they are found. Partitioned containers are
+    aggregated partition by partition and the partial results merged.
+    """
+
+    def __init__(self, query_cache: QueryCache = None, partition_executor: Executor = None):
+        """
+        Creates an AggregateQuery instance.
+        :param query_cache: The cache of compiled queries. When not specified,
+        the module wide default cache is used.
+        :param partition_executor: When specified, the partitions of a
+        partitioned container are aggregated concurrently on this executor.
+        """
+        self._matches = DocumentAttributeQuery(query_cache)
+        self._partition_executor = partition_executor
+
+    def on_execute(self, container: Container, **kwargs) -> dict:
+        """
+        Computes the aggregation.
+        :param container: The container to query.
+        :param kwargs: The query keyword arguments, see partial.
+        :return: The results, see Aggregation.result.
+        """
+        return self.partial(container, **kwargs).result()
+
+    def partial(self, container: Container, **kwargs) -> Aggregation:
+        """
+        Computes the aggregation as a partial result that can be merged with others.
+        :param container: The container to query.
+        :param kwargs: The query keyword arguments. 'aggregates' maps result
+        names to aggregates, such as {"total": Sum("price"), "orders": Count()},
+        'group_by' is a dotted attribute path, or a list of paths, to group by,
+        and 'query' is an optional query string that selects the aggregated documents.
+        :return: The aggregation.
+        """
+        ensure.not_none(
+            container, errors.ObjectCreateError("Container name not specified.")
+        )
+        aggregation = Aggregation(kwargs.get("aggregates"), kwargs.get("group_by"))
+        query = kwargs.get("query")
+
+        if isinstance(container, PartitionedContainer):
+            def aggregate(partition: Container) -> Aggregation:
+                return self._aggregate(partition, aggregation.empty(), query)
+
+            partitions = container.list_partitions()
+            parts = (
+                map(aggregate, partitions)
+                if self._partition_executor is None
+                else self._partition_executor.map(aggregate, partitions)
+            )
+
+            for part in parts:
+                aggregation.merge(part)
+
+            return aggregation
+
+        return self._aggregate(container, aggregation, query)
+
+    def _aggregate(
+        self, container: Container, aggregation: Aggregation, query: Optional[str]
+    ) -> Aggregation:
+        documents = (
+            container.iter_documents()
+            if query is None
+            else self._matches.iterate(container, query=query)
+        )
+
+        for document in documents:
+            aggregation.add(document.get_data())
+
+        return aggregation
+
+
+def _unwrap(container: Union[Container, AsyncContainer]) -> Container:
+    if isinstance(container, AsyncContainer):
+        return container.get_container()
+
+    return container
+
 
-            if dq.match(document.get_data(), query):
-                documents.append(document)
+def _count_results(result) -> int:
+    if isinstance(result, list):
+        return sum(not isinstance(item, NoneDocument) for item in result)
 
-        return documents
+    return 0 if result is None or isinstance(result, NoneDocument) else 1
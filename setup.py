@@ -30,6 +30,7 @@ setup(
     packages=find_packages(include=["dockie", "dockie.*"]),
     python_requires=">=3.9",
     install_requires=["dictquery"],
+    extras_require={"columnar": ["numpy"], "codecs": ["msgpack", "lz4"]},
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Programming Language :: Python",
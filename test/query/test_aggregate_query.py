@@ -0,0 +1,176 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.core.partition import PartitionedContainer
+from dockie.query.aggregation import Aggregation, Avg, Count, Distinct, Max, Min, Sum
+from dockie.query.query import AggregateQuery
+
+ORDERS = [
+    {"category": "toys", "price": 10, "customer": {"city": "Seattle"}, "tags": ["a", "b"]},
+    {"category": "toys", "price": 30, "customer": {"city": "Boston"}, "tags": ["b"]},
+    {"category": "books", "price": 5.5, "customer": {"city": "Seattle"}},
+    {"category": "books", "price": "n/a", "customer": {"city": "Seattle"}},
+    {"price": 100},
+]
+
+AGGREGATES = {
+    "orders": Count(),
+    "priced": Count("price"),
+    "total": Sum("price"),
+    "average": Avg("price"),
+    "cheapest": Min("price"),
+    "dearest": Max("price"),
+    "cities": Distinct("customer.city"),
+}
+
+
+def _fill(container):
+    container.add_documents((f"order{number}", data) for number, data in enumerate(ORDERS))
+
+    return container
+
+
+@pytest.fixture(params=["container", "partitioned"])
+def container(request):
+    if request.param == "container":
+        return _fill(Container("orders"))
+
+    return _fill(PartitionedContainer("orders", partitions=3))
+
+
+def test_aggregates_over_every_document(container):
+    result = AggregateQuery().execute(container, aggregates=AGGREGATES)
+
+    assert result["orders"] == 5
+    assert result["priced"] == 5
+    assert result["total"] == 145.5
+    assert result["average"] == pytest.approx(145.5 / 4)
+    assert result["cheapest"] == 5.5
+    assert result["dearest"] == "n/a"
+    assert sorted(result["cities"]) == ["Boston", "Seattle"]
+
+
+def test_aggregates_over_query_matches(container):
+    result = AggregateQuery().execute(
+        container, query="category == 'toys'", aggregates={"total": Sum("price")}
+    )
+
+    assert result == {"total": 40}
+
+
+def test_group_by_single_path(container):
+    result = AggregateQuery().execute(
+        container,
+        aggregates={"orders": Count(), "total": Sum("price")},
+        group_by="category",
+    )
+
+    assert result == {
+        "toys": {"orders": 2, "total": 40},
+        "books": {"orders": 2, "total": 5.5},
+        None: {"orders": 1, "total": 100},
+    }
+
+
+def test_group_by_several_paths_and_multiple_values(container):
+    result = AggregateQuery(partition_executor=ThreadPoolExecutor(2)).execute(
+        container, aggregates={"orders": Count()}, group_by=["category", "tags"]
+    )
+
+    assert result[("toys", "a")] == {"orders": 1}
+    assert result[("toys", "b")] == {"orders": 2}
+    assert result[("books", None)] == {"orders": 2}
+
+
+def test_empty_aggregates():
+    result = AggregateQuery().execute(Container("empty"), aggregates=AGGREGATES)
+
+    assert result == {
+        "orders": 0,
+        "priced": 0,
+        "total": 0,
+        "average": None,
+        "cheapest": None,
+        "dearest": None,
+        "cities": [],
+    }
+
+
+def test_partial_results_merge():
+    first = Aggregation(AGGREGATES, group_by="category")
+    second = first.empty()
+
+    for number, data in enumerate(ORDERS):
+        (first if number % 2 else second).add(data)
+
+    whole = Aggregation(AGGREGATES, group_by="category")
+
+    for data in ORDERS:
+        whole.add(data)
+
+    first.merge(pickle.loads(pickle.dumps(second)))
+    merged = first.result()
+    expected = whole.result()
+
+    for results in (merged, expected):
+        for group in results.values():
+            group["cities"] = sorted(group["cities"])
+
+    assert merged == expected
+
+
+def test_partial_query_results_merge():
+    left = _fill(Container("left"))
+    right = Container("right")
+    right.add_document(Document("order9", {"category": "toys", "price": 1}))
+    query = AggregateQuery()
+
+    partial = query.partial(left, aggregates={"total": Sum("price")}, group_by="category")
+    partial.merge(
+        query.partial(right, aggregates={"total": Sum("price")}, group_by="category")
+    )
+
+    assert partial.result()["toys"] == {"total": 41}
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {},
+        {"aggregates": {}},
+        {"aggregates": {"total": "sum"}},
+        {"aggregates": {"total": Sum("price")}, "group_by": []},
+        {"aggregates": {"total": Sum("price")}, "group_by": " "},
+    ],
+)
+def test_invalid_aggregations_raise(arguments):
+    with pytest.raises(errors.QueryError):
+        AggregateQuery().execute(Container("orders"), **arguments)
+
+
+def test_lists_contribute_every_value():
+    container = Container("lists")
+    container.add_document(Document("doc1", {"scores": [1, 2, "x", None], "lines": [{"n": 3}]}))
+    container.add_document(Document("doc2", {"scores": [], "lines": [{"n": 4}, {"n": 5}]}))
+
+    result = AggregateQuery().execute(
+        container,
+        aggregates={
+            "scored": Count("scores"),
+            "total": Sum("scores"),
+            "lines": Sum("lines.n"),
+            "distinct": Distinct("scores"),
+        },
+    )
+
+    assert result == {"scored": 1, "total": 3, "lines": 12, "distinct": [1, 2, "x", None]}
+
+
+def test_aggregate_path_is_required():
+    with pytest.raises(errors.QueryError):
+        Sum(" ")
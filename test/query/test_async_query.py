@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.aio import AsyncContainer
+from dockie.core.container import Container
+from dockie.query.query import DocumentAttributeQuery, DocumentIdQuery
+
+
+@pytest.fixture
+def container():
+    container = Container("numbers")
+    container.add_documents(("doc%d" % number, {"number": number}) for number in range(250))
+
+    return container
+
+
+def _ids(documents):
+    return [document.get_id() for document in documents]
+
+
+def test_execute_async(container):
+    documents = asyncio.run(
+        DocumentAttributeQuery().execute_async(container, query="number < 3")
+    )
+
+    assert _ids(documents) == ["doc0", "doc1", "doc2"]
+
+
+def test_execute_async_accepts_async_container(container):
+    document = asyncio.run(
+        DocumentIdQuery().execute_async(AsyncContainer(container), document_id="doc7")
+    )
+
+    assert document.get_data() == {"number": 7}
+
+
+def test_execute_async_raises_query_errors(container):
+    with pytest.raises(errors.QueryError):
+        asyncio.run(DocumentAttributeQuery().execute_async(container))
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 100, 1000])
+def test_iterate_async(container, batch_size):
+    async def scenario():
+        return [
+            document
+            async for document in DocumentAttributeQuery().iterate_async(
+                container, batch_size=batch_size, query="number >= 10", offset=5, limit=200
+            )
+        ]
+
+    assert _ids(asyncio.run(scenario())) == ["doc%d" % number for number in range(15, 215)]
+
+
+def test_iterate_async_yields_to_other_coroutines(container):
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        task = asyncio.ensure_future(ticker())
+        count = 0
+
+        async for _ in DocumentAttributeQuery().iterate_async(
+            container, batch_size=10, query="number >= 0"
+        ):
+            count += 1
+
+        task.cancel()
+        return count
+
+    assert asyncio.run(scenario()) == 250
+    assert len(ticks) >= 25
+
+
+def test_iterate_async_with_invalid_batch_size_raises_error(container):
+    async def scenario():
+        async for _ in DocumentAttributeQuery().iterate_async(
+            container, batch_size=0, query="number >= 0"
+        ):
+            pass
+
+    with pytest.raises(errors.QueryError):
+        asyncio.run(scenario())
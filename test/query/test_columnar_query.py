@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from dockie.core import errors, index
+from dockie.core.container import Container
+from dockie.query.query import ColumnAggregateQuery, DocumentAttributeQuery
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def container():
+    container = Container("shop")
+    container.add_documents(
+        [
+            ("doc1", {"offer": {"price": 10}, "qty": 1, "color": "red"}),
+            ("doc2", {"offer": {"price": 20}, "qty": 2, "color": "blue"}),
+            ("doc3", {"offer": [{"price": 12}, {"price": 30}], "qty": 3}),
+            ("doc4", {"offer": {"price": 40}, "qty": 4, "color": "blue"}),
+            ("doc5", {"qty": 5, "color": "red"}),
+            ("doc6", {"offer": {"price": True}, "qty": 6, "color": "green"}),
+        ]
+    )
+
+    return container
+
+
+def _ids(documents):
+    return [document.get_id() for document in documents]
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        "`offer.price` > 15",
+        "`offer.price` <= 20",
+        "15 < `offer.price`",
+        "`offer.price` == 40",
+        "`offer.price` != 10",
+        "`offer.price` IN [10, 40]",
+        "`offer.price` > 15 AND qty < 4",
+        "`offer.price` < 15 OR qty >= 4",
+        "NOT `offer.price` > 15",
+        '`offer.price` > 15 AND color == "blue"',
+    ],
+)
+def test_columnar_scan_matches_full_scan(container, query_string):
+    query = DocumentAttributeQuery()
+    expected = _ids(query.execute(container, query=query_string))
+
+    container.add_column("offer.price")
+    container.add_column("qty")
+
+    assert str(query.explain(container, query=query_string)).startswith("COLUMNAR SCAN")
+    assert _ids(query.execute(container, query=query_string)) == expected
+
+
+def test_query_without_column_comparison_is_full_scan(container):
+    container.add_column("qty")
+    query = DocumentAttributeQuery()
+
+    assert str(query.explain(container, query='color == "red"')) == "FULL SCAN"
+    assert str(query.explain(container, query='qty > 1 OR color == "red"')) == "FULL SCAN"
+    assert str(query.explain(container, query='NOT (qty > 1 AND color == "red")')) == (
+        "FULL SCAN"
+    )
+
+
+def test_index_is_preferred_over_columns(container):
+    container.add_column("qty")
+    container.add_index("qty", index.SORTED)
+
+    plan = DocumentAttributeQuery().explain(container, query="qty > 3")
+
+    assert str(plan).startswith("INDEX RANGE")
+
+
+def test_columnar_scan_supports_limit_and_offset(container):
+    container.add_column("qty")
+
+    documents = DocumentAttributeQuery().execute(
+        container, query="qty > 1", offset=1, limit=2
+    )
+
+    assert _ids(documents) == ["doc3", "doc4"]
+
+
+@pytest.mark.parametrize(
+    "function, query_string, expected",
+    [
+        ("sum", None, 21.0),
+        ("count", "qty > 2", 4),
+        ("mean", "qty <= 2", 1.5),
+        ("max", 'color == "red"', 5.0),
+        ("min", 'qty > 1 AND color == "blue"', 2.0),
+        ("sum", "qty > 100", 0.0),
+    ],
+)
+def test_column_aggregate_query(container, function, query_string, expected):
+    container.add_column("qty")
+
+    result = ColumnAggregateQuery().execute(
+        container, column="qty", function=function, query=query_string
+    )
+
+    assert result == expected
+
+
+def test_column_aggregate_query_uses_column_plan_with_fallback_rows(container):
+    container.add_column("offer.price")
+
+    result = ColumnAggregateQuery().execute(
+        container, column="offer.price", function="sum", query="`offer.price` > 15"
+    )
+
+    assert result == 60.0
+
+
+@pytest.mark.parametrize("query_string", [None, "qty > 2", "`offer.price` > 15"])
+def test_column_aggregate_query_skips_expired_documents(container, query_string):
+    container.add_column("qty")
+    container.add_column("offer.price")
+    container.enable_expiry(sweep_interval=None)
+    container.set_expiry("doc4", time.time() - 1)
+    readable = DocumentAttributeQuery().execute(container, query=query_string or "qty > 0")
+
+    result = ColumnAggregateQuery().execute(
+        container, column="qty", function="count", query=query_string
+    )
+
+    assert result == len(readable)
+    assert "doc4" not in _ids(readable)
+
+
+def test_column_aggregate_query_with_missing_column_raises_error(container):
+    with pytest.raises(errors.QueryError):
+        ColumnAggregateQuery().execute(container, column="qty", function="sum")
+
+
+def test_column_aggregate_query_with_no_function_raises_error(container):
+    container.add_column("qty")
+
+    with pytest.raises(errors.QueryError):
+        ColumnAggregateQuery().execute(container, column="qty")
@@ -61,3 +61,66 @@ def test_query_raises_error_when_query_not_specified():
 
     with pytest.raises(errors.QueryError):
         query.execute(container)
+
+
+class _CountingDict(dict):
+    reads = 0
+
+    def __getitem__(self, key):
+        _CountingDict.reads += 1
+        return super().__getitem__(key)
+
+
+def _numbered_container(count):
+    container = Container("shop")
+
+    for number in range(count):
+        container.add_document(
+            Document(number, _CountingDict(number=number, even=number % 2 == 0))
+        )
+
+    return container
+
+
+def test_iterate_yields_matches_lazily():
+    container = _numbered_container(1000)
+    _CountingDict.reads = 0
+
+    matches = DocumentAttributeQuery().iterate(container, query="even==true")
+
+    assert next(matches).get_id() == 0
+    assert next(matches).get_id() == 2
+    assert _CountingDict.reads == 3
+
+
+def test_limit_stops_scan_early():
+    container = _numbered_container(1000)
+    _CountingDict.reads = 0
+
+    actual_documents = DocumentAttributeQuery().execute(
+        container, query="even==true", limit=5
+    )
+
+    assert [document.get_id() for document in actual_documents] == [0, 2, 4, 6, 8]
+    assert _CountingDict.reads == 9
+
+
+def test_offset_skips_matches():
+    container = _numbered_container(20)
+
+    actual_documents = DocumentAttributeQuery().execute(
+        container, query="even==true", offset=3, limit=2
+    )
+
+    assert [document.get_id() for document in actual_documents] == [6, 8]
+
+
+def test_query_raises_error_when_limit_or_offset_invalid():
+    container = _numbered_container(1)
+    query = DocumentAttributeQuery()
+
+    with pytest.raises(errors.QueryError):
+        query.iterate(container, query="even==true", limit=-1)
+
+    with pytest.raises(errors.QueryError):
+        query.iterate(container, query="even==true", offset="1")
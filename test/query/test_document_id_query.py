@@ -1,5 +1,9 @@
+import pytest
+
+from dockie.core import errors
 from dockie.core.container import Container
-from dockie.core.document import Document
+from dockie.core.document import Document, NoneDocument
+from dockie.core.partition import PartitionedContainer
 from dockie.query.query import DocumentIdQuery
 
 
@@ -12,3 +16,26 @@ def test_can_query_document_by_id():
     actual_document = query.execute(container, document_id=100)
 
     assert actual_document.get_id() == 100
+
+
+@pytest.mark.parametrize("container", [Container("shop"), PartitionedContainer("shop", 4)])
+def test_can_query_documents_by_ids(container):
+    container.add_documents((number, {"number": number}) for number in range(10))
+
+    documents = DocumentIdQuery().execute(container, document_ids=[7, 100, 2])
+
+    assert [document.get_id() for document in documents[::2]] == [7, 2]
+    assert isinstance(documents[1], NoneDocument)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"document_ids": "abc"},
+        {"document_ids": [1, " "]},
+        {"document_ids": [1], "document_id": 1},
+    ],
+)
+def test_invalid_document_ids_raise_error(kwargs):
+    with pytest.raises(errors.QueryError):
+        DocumentIdQuery().execute(Container("shop"), **kwargs)
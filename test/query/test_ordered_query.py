@@ -0,0 +1,230 @@
+import random
+
+import pytest
+
+from dockie.core import errors, index
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.core.partition import PartitionedContainer
+from dockie.query import ordering
+from dockie.query.query import DocumentAttributeQuery
+
+
+def _values():
+    generator = random.Random(7)
+    values = []
+
+    for number in range(300):
+        choice = number % 10
+
+        if choice == 0:
+            values.append(None)
+        elif choice == 1:
+            values.append([generator.randint(0, 50), generator.randint(0, 50)])
+        elif choice == 2:
+            values.append(f"s{generator.randint(0, 50):02d}")
+        else:
+            values.append(generator.randint(0, 50))
+
+    return values
+
+
+def _fill(container):
+    for number, value in enumerate(_values()):
+        data = {"group": number % 3}
+
+        if value is not None:
+            data["score"] = value
+
+        container.add_document(Document(f"doc{number}", data))
+
+    return container
+
+
+def _expected(container, query_string, descending):
+    documents = DocumentAttributeQuery().execute(container, query=query_string)
+    keyed = [
+        (ordering.sort_key(document.get_data(), "score"), document)
+        for document in documents
+    ]
+    ordered = sorted(
+        (item for item in keyed if item[0] is not None),
+        key=lambda item: item[0],
+        reverse=descending,
+    )
+    last = [document for key, document in keyed if key is None]
+
+    return [key for key, _ in ordered] + [None] * len(last), {
+        document.get_id() for document in last
+    }
+
+
+def _actual(container, descending, **kwargs):
+    documents = DocumentAttributeQuery().execute(
+        container, order_by="score", order="desc" if descending else "asc", **kwargs
+    )
+    keys = [ordering.sort_key(document.get_data(), "score") for document in documents]
+    last = {document.get_id() for document, key in zip(documents, keys) if key is None}
+
+    return keys, last
+
+
+@pytest.fixture(params=[None, index.HASH, index.SORTED])
+def container(request):
+    container = _fill(Container("scores"))
+
+    if request.param is not None:
+        container.add_index("score", request.param)
+
+    return container
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("query_string", ["group == 1", "group >= 0", "group != 2"])
+def test_order_by_matches_full_sort(container, query_string, descending):
+    expected_keys, expected_last = _expected(container, query_string, descending)
+    keys, last = _actual(container, descending, query=query_string)
+
+    assert keys == expected_keys
+    assert last == expected_last
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("offset, limit", [(0, 5), (3, 10), (0, 1000), (290, 20)])
+def test_order_by_with_limit_returns_the_top_of_the_full_sort(
+    container, descending, offset, limit
+):
+    expected_keys, _ = _expected(container, "group >= 0", descending)
+    keys, _ = _actual(container, descending, query="group >= 0", offset=offset, limit=limit)
+
+    assert keys == expected_keys[offset:offset + limit]
+
+
+def test_sorted_index_is_walked_in_order():
+    container = _fill(Container("scores"))
+    container.add_index("score", index.SORTED)
+    query = DocumentAttributeQuery()
+
+    assert str(query.explain(container, query="group == 1", order_by="score")) == (
+        "INDEX ORDER ON 'score' (sorted) ASC"
+    )
+    assert str(
+        query.explain(container, query="score > 10", order_by="score", order="desc")
+    ) == "INDEX ORDER ON 'score' (sorted) DESC (INDEX RANGE ON 'score' (sorted) 10.0 < value)"
+
+
+def test_other_plans_are_sorted():
+    container = _fill(Container("scores"))
+    container.add_index("group")
+    query = DocumentAttributeQuery()
+
+    assert str(query.explain(container, query="group == 1", order_by="score")) == (
+        "SORT ON 'score' ASC (INDEX LOOKUP ON 'group' (hash) FOR [1.0])"
+    )
+
+
+def test_index_walk_stops_after_the_page():
+    container = Container("numbers")
+    container.add_documents((f"doc{number}", {"n": number}) for number in range(1000))
+    container.add_index("n", index.SORTED)
+
+    documents = DocumentAttributeQuery().execute(
+        container, query="n >= 0", order_by="n", order="desc", limit=3
+    )
+
+    assert [document.get_id() for document in documents] == ["doc999", "doc998", "doc997"]
+
+
+def test_partitioned_container_is_sorted():
+    container = _fill(PartitionedContainer("scores", partitions=4))
+    container.add_index("score", index.SORTED)
+
+    expected_keys, _ = _expected(container, "group >= 0", True)
+    keys, _ = _actual(container, True, query="group >= 0", limit=20)
+
+    assert keys == expected_keys[:20]
+
+
+def test_ordered_results_are_cached_separately():
+    container = _fill(Container("scores"))
+    container.enable_result_cache()
+    query = DocumentAttributeQuery()
+
+    ascending = query.execute(container, query="group == 1", order_by="score", limit=3)
+    descending = query.execute(
+        container, query="group == 1", order_by="score", order="desc", limit=3
+    )
+
+    assert ascending != descending
+    assert container.get_result_cache().get_stats().size == 2
+
+
+@pytest.mark.parametrize("arguments", [{"order_by": " "}, {"order_by": "score", "order": "up"}])
+def test_invalid_order_raises(arguments):
+    with pytest.raises(errors.QueryError):
+        DocumentAttributeQuery().execute(
+            _fill(Container("scores")), query="group == 1", **arguments
+        )
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("index_type", [None, index.SORTED])
+def test_order_by_within_a_range(index_type, descending):
+    container = Container("numbers")
+    generator = random.Random(3)
+    container.add_documents(
+        (f"doc{number}", {"n": generator.randint(0, 100)}) for number in range(500)
+    )
+
+    if index_type is not None:
+        container.add_index("n", index_type)
+
+    documents = DocumentAttributeQuery().execute(
+        container,
+        query="n >= 20 AND n < 60",
+        order_by="n",
+        order="desc" if descending else "asc",
+        limit=50,
+    )
+    values = [document.get_data()["n"] for document in documents]
+    expected = sorted(
+        (
+            document.get_data()["n"]
+            for document in container.iter_documents()
+            if 20 <= document.get_data()["n"] < 60
+        ),
+        reverse=descending,
+    )
+
+    assert values == expected[:50]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("query_string", ["group >= 0", "group != 1"])
+@pytest.mark.parametrize("limit", [None, 7, 250])
+def test_index_walk_and_sort_return_the_same_order(descending, query_string, limit):
+    generator = random.Random(11)
+    sorted_container = Container("scores")
+    sorted_container.add_index("score", index.SORTED)
+    plain_container = Container("scores")
+
+    for step, value in enumerate(_values() + _values()[:100]):
+        document_id = generator.choice([step % 250, f"doc{step % 250}"])
+        data = {"group": step % 3} if value is None else {"group": step % 3, "score": value}
+
+        for container in (sorted_container, plain_container):
+            container.add_document(Document(document_id, data))
+
+    query = DocumentAttributeQuery()
+    arguments = {
+        "query": query_string,
+        "order_by": "score",
+        "order": "desc" if descending else "asc",
+        "limit": limit,
+    }
+
+    assert str(query.explain(sorted_container, **arguments)).startswith("INDEX ORDER")
+    assert str(query.explain(plain_container, **arguments)).startswith("SORT")
+    assert [document.get_id() for document in query.execute(sorted_container, **arguments)] == [
+        document.get_id() for document in query.execute(plain_container, **arguments)
+    ]
@@ -0,0 +1,135 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.query.parallel import ParallelExecutor
+from dockie.query.query import DocumentAttributeQuery
+
+@pytest.fixture
+def container():
+    container = Container("shop")
+    container.add_documents(
+        (number, {"number": number, "odd": number % 2 == 1}) for number in range(3000)
+    )
+    return container
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ParallelExecutor(processes=2, threshold=100) as executor:
+        yield executor
+
+
+def test_parallel_scan_returns_matches_in_insertion_order(container, executor):
+    query_string = "odd == true AND number > 100"
+
+    parallel = DocumentAttributeQuery(executor=executor).execute(
+        container, query=query_string
+    )
+    sequential = DocumentAttributeQuery().execute(container, query=query_string)
+
+    assert executor.should_parallelize(container.count_documents())
+    assert [document.get_id() for document in parallel] == [
+        document.get_id() for document in sequential
+    ]
+    assert len(parallel) == 1450
+
+
+def test_parallel_scan_applies_offset(container, executor):
+    documents = DocumentAttributeQuery(executor=executor).execute(
+        container, query="number < 10", offset=8
+    )
+
+    assert [document.get_id() for document in documents] == [8, 9]
+
+
+def test_small_scans_stay_in_process():
+    executor = ParallelExecutor(processes=4, threshold=1000)
+    container = Container("small")
+    container.add_documents((number, {"number": number}) for number in range(10))
+
+    documents = DocumentAttributeQuery(executor=executor).execute(
+        container, query="number >= 8"
+    )
+
+    assert not executor.should_parallelize(container.count_documents())
+    assert not ParallelExecutor(processes=1, threshold=1).should_parallelize(10)
+    assert [document.get_id() for document in documents] == [8, 9]
+    assert executor._workers is None
+
+
+def test_container_is_published_once_per_version(container, executor):
+    query = DocumentAttributeQuery(executor=executor)
+    query.execute(container, query="number < 10")
+    token = executor._publications[container].token
+
+    assert len(query.execute(container, query="number < 20")) == 20
+    assert executor._publications[container].token == token
+
+    container.add_document(Document(3000, {"number": -1, "odd": False}))
+
+    assert len(query.execute(container, query="number < 10")) == 11
+    assert executor._publications[container].token != token
+
+
+def test_documents_expired_after_publishing_are_skipped(container, executor):
+    container.enable_expiry(sweep_interval=None)
+    container.set_expiry(5, time.time() + 0.2)
+    query = DocumentAttributeQuery(executor=executor)
+
+    assert len(query.execute(container, query="number < 10")) == 10
+
+    time.sleep(0.3)
+    documents = query.execute(container, query="number < 10")
+
+    assert [document.get_id() for document in documents] == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+
+
+def test_shares_of_collected_containers_are_discarded(executor):
+    container = Container("temporary")
+    container.add_documents((number, {"number": number}) for number in range(200))
+    DocumentAttributeQuery(executor=executor).execute(container, query="number < 10")
+    token = executor._publications[container].token
+
+    del container
+    gc.collect()
+
+    assert token in executor._discarded
+
+
+def test_raise_error_when_threshold_invalid():
+    with pytest.raises(errors.QueryError):
+        ParallelExecutor(threshold=0)
+
+
+def test_raise_error_when_start_method_invalid():
+    with pytest.raises(errors.QueryError):
+        ParallelExecutor(start_method="fork")
+
+
+def test_concurrent_parallel_scans_share_the_pool(container, executor):
+    results = {}
+
+    def scan(number):
+        results[number] = DocumentAttributeQuery(executor=executor).execute(
+            container, query=f"number < {number}"
+        )
+
+    threads = [threading.Thread(target=scan, args=(number,)) for number in (10, 20, 30)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert {number: len(documents) for number, documents in results.items()} == {
+        10: 10,
+        20: 20,
+        30: 30,
+    }
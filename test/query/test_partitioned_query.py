@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dockie.core import index
+from dockie.core.partition import PartitionedContainer
+from dockie.query.query import ColumnAggregateQuery, DocumentAttributeQuery
+
+
+@pytest.fixture
+def container():
+    container = PartitionedContainer("numbers", partitions=4)
+    container.add_documents((f"doc{number}", {"number": number}) for number in range(200))
+
+    return container
+
+
+def _ids(documents):
+    return sorted(document.get_id() for document in documents)
+
+
+def test_query_fans_out_across_partitions(container):
+    query = DocumentAttributeQuery()
+
+    assert _ids(query.execute(container, query="number >= 190")) == sorted(
+        f"doc{number}" for number in range(190, 200)
+    )
+    assert str(query.explain(container, query="number >= 190")) == (
+        "FAN OUT 4 PARTITIONS (FULL SCAN)"
+    )
+
+
+def test_query_uses_partition_indexes(container):
+    container.add_index("number", index.SORTED)
+    query = DocumentAttributeQuery()
+
+    assert len(query.execute(container, query="number < 10 AND number >= 5")) == 5
+    assert str(query.explain(container, query="number < 10")).startswith(
+        "FAN OUT 4 PARTITIONS (INDEX RANGE"
+    )
+
+
+def test_query_limit_and_offset_span_partitions(container):
+    query = DocumentAttributeQuery()
+    everything = query.execute(container, query="number >= 0")
+    page = query.execute(container, query="number >= 0", offset=40, limit=60)
+
+    assert len(everything) == 200
+    assert page == everything[40:100]
+
+
+def test_query_with_partition_executor(container):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        query = DocumentAttributeQuery(partition_executor=executor)
+        documents = query.execute(container, query="number < 50", offset=10)
+
+    assert len(documents) == 40
+    assert documents == DocumentAttributeQuery().execute(
+        container, query="number < 50", offset=10
+    )
+
+
+@pytest.mark.parametrize(
+    "function, expected",
+    [("count", 100), ("sum", 4950.0), ("min", 0.0), ("max", 99.0), ("mean", 49.5)],
+)
+def test_column_aggregate_merges_partitions(container, function, expected):
+    pytest.importorskip("numpy")
+    container.add_column("number")
+
+    result = ColumnAggregateQuery().execute(
+        container, column="number", function=function, query="number < 100"
+    )
+
+    assert result == expected
@@ -0,0 +1,81 @@
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.query.projection import DICT, DOCUMENT_ID, Projection
+from dockie.query.query import DocumentAttributeQuery
+
+
+@pytest.fixture
+def container():
+    container = Container("people")
+    container.add_document(
+        Document("doc1", {"name": "Ann", "bio": {"age": 30, "city": "Seattle"}, "tags": ["a"]})
+    )
+    container.add_document(Document("doc2", {"name": "Bob", "bio": {"age": 40}}))
+    container.add_document(Document("doc3", {"name": "Cy", "bio": "unknown"}))
+
+    return container
+
+
+def test_projection_returns_tuples_in_path_order(container):
+    result = DocumentAttributeQuery().execute(
+        container, query="name != 'x'", projection=["bio.city", "name"]
+    )
+
+    assert result == [("Seattle", "Ann"), (None, "Bob"), (None, "Cy")]
+
+
+def test_projection_returns_dicts(container):
+    result = DocumentAttributeQuery().execute(
+        container,
+        query="`bio.age` >= 40",
+        projection=[DOCUMENT_ID, "bio.age"],
+        projection_format=DICT,
+    )
+
+    assert result == [{"$id": "doc2", "bio.age": 40}]
+
+
+def test_projection_returns_stored_values(container):
+    (values,) = DocumentAttributeQuery().execute(
+        container, query="name == 'Ann'", projection=["bio", "tags"]
+    )
+
+    assert values[0] is container.get_document("doc1").get_data()["bio"]
+    assert values[1] == ["a"]
+
+
+def test_projection_applies_to_the_page(container):
+    result = DocumentAttributeQuery().iterate(
+        container, query="name != 'x'", projection=["name"], offset=1, limit=1
+    )
+
+    assert list(result) == [("Bob",)]
+
+
+def test_projection_is_applied_to_cached_results(container):
+    container.enable_result_cache()
+    query = DocumentAttributeQuery()
+
+    documents = query.execute(container, query="name == 'Bob'")
+    names = query.execute(container, query="name == 'Bob'", projection=["name"])
+
+    assert documents[0].get_id() == "doc2"
+    assert names == [("Bob",)]
+    assert container.get_result_cache().get_stats().hits == 1
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"paths": []},
+        {"paths": "name"},
+        {"paths": ["name", " "]},
+        {"paths": ["name"], "projection_format": "list"},
+    ],
+)
+def test_invalid_projection_raises(arguments):
+    with pytest.raises(errors.QueryError):
+        Projection(**arguments)
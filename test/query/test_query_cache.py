@@ -0,0 +1,70 @@
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.query.cache import QueryCache
+from dockie.query.query import DocumentAttributeQuery
+
+
+def test_compiled_query_matches_data():
+    compiled_query = QueryCache().get('`bio.name`=="Farooq"')
+
+    assert compiled_query.match({"bio": {"name": "Farooq"}})
+    assert not compiled_query.match({"bio": {"name": "Noor"}})
+
+
+def test_repeat_query_is_a_cache_hit():
+    cache = QueryCache()
+
+    first = cache.get('name=="Farooq"')
+    second = cache.get('name=="Farooq"')
+
+    assert first is second
+    assert cache.get_stats().hits == 1
+    assert cache.get_stats().misses == 1
+
+
+def test_cache_evicts_least_recently_used_query():
+    cache = QueryCache(max_size=2)
+
+    cache.get("a==1")
+    cache.get("b==1")
+    cache.get("a==1")
+    cache.get("c==1")
+
+    assert cache.get_stats().size == 2
+
+    cache.get("a==1")
+    assert cache.get_stats().hits == 2
+
+    cache.get("b==1")
+    assert cache.get_stats().misses == 4
+
+
+def test_clear_resets_cache():
+    cache = QueryCache()
+    cache.get("a==1")
+    cache.clear()
+
+    assert cache.get_stats() == (0, 0, 0, 256)
+
+
+def test_raise_error_when_cache_size_invalid():
+    with pytest.raises(errors.QueryError):
+        QueryCache(max_size=0)
+
+
+def test_attribute_query_uses_query_cache():
+    container = Container("shop")
+    container.add_document(Document("doc1", {"name": "Farooq"}))
+    container.add_document(Document("doc2", {"name": "Noor"}))
+
+    cache = QueryCache()
+    query = DocumentAttributeQuery(query_cache=cache)
+
+    for _ in range(3):
+        assert len(query.execute(container, query='name=="Farooq"')) == 1
+
+    assert cache.get_stats().hits == 2
+    assert cache.get_stats().misses == 1
@@ -0,0 +1,76 @@
+import pytest
+
+from dockie.core import index
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.query.query import DocumentAttributeQuery
+
+
+@pytest.fixture
+def container():
+    container = Container("shop")
+    container.add_index("bio.name")
+    container.add_index("price", index.SORTED)
+
+    documents = [
+        {"id": "doc1", "bio": {"name": "Farooq"}, "price": 10, "color": "red"},
+        {"id": "doc2", "bio": {"name": "Noor"}, "price": 20, "color": "blue"},
+        {"id": "doc3", "bio": {"name": "Yasin"}, "price": 30, "color": "red"},
+        {"id": "doc4", "bio": {"name": "Farooq"}, "price": 40, "color": "blue"},
+    ]
+
+    for document in documents:
+        container.add_document(Document(document["id"], document))
+
+    return container
+
+
+def _ids(documents):
+    return sorted(document.get_id() for document in documents)
+
+
+@pytest.mark.parametrize(
+    "query_string, expected_ids, expected_plan",
+    [
+        ('`bio.name`=="Farooq"', ["doc1", "doc4"], "INDEX LOOKUP"),
+        ('"Noor"==`bio.name`', ["doc2"], "INDEX LOOKUP"),
+        ('`bio.name` IN ["Noor", "Yasin"]', ["doc2", "doc3"], "INDEX LOOKUP"),
+        ("price > 20", ["doc3", "doc4"], "INDEX RANGE"),
+        ("price >= 20 AND price < 40", ["doc2", "doc3"], "INDEX RANGE"),
+        ("10 < price", ["doc2", "doc3", "doc4"], "INDEX RANGE"),
+        ('`bio.name`=="Farooq" AND color=="red"', ["doc1"], "INDEX LOOKUP"),
+        ('`bio.name`=="Noor" OR price <= 10', ["doc1", "doc2"], "UNION"),
+        ('color=="red"', ["doc1", "doc3"], "FULL SCAN"),
+        ('`bio.name`=="Noor" OR color=="red"', ["doc1", "doc2", "doc3"], "FULL SCAN"),
+        ('NOT `bio.name`=="Noor"', ["doc1", "doc3", "doc4"], "FULL SCAN"),
+        ('`bio.name` > "M"', ["doc2", "doc3"], "FULL SCAN"),
+    ],
+)
+def test_query_uses_index_when_predicate_allows_it(
+    container, query_string, expected_ids, expected_plan
+):
+    query = DocumentAttributeQuery()
+
+    assert _ids(query.execute(container, query=query_string)) == expected_ids
+    assert str(query.explain(container, query=query_string)).startswith(expected_plan)
+
+
+def test_conjunction_uses_most_selective_index(container):
+    plan = DocumentAttributeQuery().explain(
+        container, query='`bio.name`=="Yasin" AND price > 5'
+    )
+
+    assert plan.uses_index()
+    assert plan.describe() == "INDEX LOOKUP ON 'bio.name' (hash) FOR ['Yasin']"
+
+
+def test_index_results_follow_replacement(container):
+    container.add_document(Document("doc2", {"bio": {"name": "Farooq"}, "price": 5}))
+    query = DocumentAttributeQuery()
+
+    assert _ids(query.execute(container, query='`bio.name`=="Farooq"')) == [
+        "doc1",
+        "doc2",
+        "doc4",
+    ]
+    assert _ids(query.execute(container, query="price < 10")) == ["doc2"]
@@ -0,0 +1,110 @@
+import pickle
+import time
+
+import pytest
+
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.core.partition import PartitionedContainer
+from dockie.query.query import DocumentAttributeQuery
+
+
+@pytest.fixture
+def container():
+    container = Container("numbers")
+    container.add_documents((f"doc{number}", {"number": number}) for number in range(100))
+    container.enable_result_cache()
+
+    return container
+
+
+def _ids(documents):
+    return [document.get_id() for document in documents]
+
+
+def test_repeated_query_is_served_from_cache(container):
+    query = DocumentAttributeQuery()
+
+    first = _ids(query.execute(container, query="number >= 95"))
+    second = _ids(query.execute(container, query="number >= 95"))
+
+    assert first == second == [f"doc{number}" for number in range(95, 100)]
+    assert container.get_result_cache().get_stats().hits == 1
+
+
+def test_cache_is_keyed_by_page(container):
+    query = DocumentAttributeQuery()
+
+    assert len(query.execute(container, query="number >= 90", limit=3)) == 3
+    assert len(query.execute(container, query="number >= 90", offset=8)) == 2
+    assert container.get_result_cache().get_stats().size == 2
+
+
+def test_write_invalidates_cached_results(container):
+    query = DocumentAttributeQuery()
+    query.execute(container, query="number >= 95")
+    version = container.get_version()
+
+    container.add_document(Document("doc200", {"number": 200}))
+
+    assert container.get_version() == version + 1
+    assert "doc200" in _ids(query.execute(container, query="number >= 95"))
+    assert container.get_result_cache().get_stats().invalidations == 1
+
+
+def test_bulk_load_invalidates_cached_results(container):
+    query = DocumentAttributeQuery()
+    query.execute(container, query="number >= 95")
+
+    container.add_documents([("doc300", {"number": 300}), ("doc301", {"number": 301})])
+
+    assert len(query.execute(container, query="number >= 95")) == 7
+
+
+def test_disabled_cache_is_not_used(container):
+    container.disable_result_cache()
+
+    assert container.get_result_cache() is None
+    assert len(DocumentAttributeQuery().execute(container, query="number < 5")) == 5
+
+
+def test_result_cache_is_not_persisted(container):
+    DocumentAttributeQuery().execute(container, query="number < 5")
+    loaded = pickle.loads(pickle.dumps(container))
+
+    assert loaded.get_result_cache() is None
+    assert loaded.get_version() == container.get_version()
+
+
+def test_partitioned_container_caches_results():
+    container = PartitionedContainer("numbers", partitions=4)
+    container.add_documents((f"doc{number}", {"number": number}) for number in range(100))
+    container.enable_result_cache()
+    query = DocumentAttributeQuery()
+
+    query.execute(container, query="number < 10")
+    query.execute(container, query="number < 10")
+    container.add_document(Document("doc-new", {"number": 1}))
+
+    assert len(query.execute(container, query="number < 10")) == 11
+    assert container.get_result_cache().get_stats().hits == 1
+    assert container.get_result_cache().get_stats().invalidations == 1
+
+
+def test_cache_is_bypassed_while_documents_are_expired(container):
+    container.enable_expiry(sweep_interval=None)
+    container.set_expiry("doc99", time.time() + 3600)
+    query = DocumentAttributeQuery()
+    query.execute(container, query="number >= 95")
+
+    container.set_expiry("doc99", time.time() - 1)
+
+    assert container.has_expired_documents()
+    assert "doc99" not in _ids(query.execute(container, query="number >= 95"))
+
+    container.expire()
+
+    assert not container.has_expired_documents()
+    assert _ids(query.execute(container, query="number >= 95")) == [
+        f"doc{number}" for number in range(95, 99)
+    ]
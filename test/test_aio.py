@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.aio import AsyncContainer, AsyncDatabase
+from dockie.core.container import Container
+from dockie.core.document import Document, NoneDocument
+
+
+def test_add_and_get_documents():
+    async def scenario():
+        database = AsyncDatabase()
+        container = await database.add_container("people")
+        await container.add_document(Document("doc1", {"name": "Farooq"}))
+        result = await container.add_documents([("doc2", {"name": "Noor"})])
+
+        return (
+            await database.list_containers(),
+            result.inserted,
+            (await container.get_document("doc2")).get_data(),
+            await container.get_document("missing"),
+            await container.get_documents(["missing", "doc1"]),
+            len(await container.list_documents()),
+        )
+
+    names, inserted, data, missing, batch, count = asyncio.run(scenario())
+
+    assert names == ["people"]
+    assert inserted == 1
+    assert data == {"name": "Noor"}
+    assert isinstance(missing, NoneDocument)
+    assert isinstance(batch[0], NoneDocument)
+    assert batch[1].get_data() == {"name": "Farooq"}
+    assert count == 2
+
+
+def test_get_missing_container_raises_error():
+    with pytest.raises(errors.ObjectNotFoundError):
+        asyncio.run(AsyncDatabase().get_container("missing"))
+
+
+def test_wrap_none_container_raises_error():
+    with pytest.raises(errors.ObjectCreateError):
+        AsyncContainer(None)
+
+
+def test_persist_and_load(tmp_path):
+    filename = str(tmp_path / "async.db")
+
+    async def scenario():
+        database = AsyncDatabase()
+        await database.add_container("people")
+        await database.bulk_load("people", [("doc1", {"name": "Farooq"})])
+        await database.persist_to_file(filename)
+
+        loaded = await AsyncDatabase.load_from_file(filename)
+        container = await loaded.get_container("people")
+
+        return (await container.get_document("doc1")).get_data()
+
+    assert asyncio.run(scenario()) == {"name": "Farooq"}
+
+
+def test_write_and_open_snapshot(tmp_path):
+    filename = str(tmp_path / "async.snapshot")
+
+    async def scenario():
+        database = AsyncDatabase()
+        await database.add_container("people")
+        await database.bulk_load("people", [("doc1", {"name": "Farooq"})])
+        await database.write_snapshot(filename)
+
+        opened = await AsyncDatabase.open_snapshot(filename)
+        container = await opened.get_container("people")
+
+        return (await container.get_document("doc1")).get_data()
+
+    assert asyncio.run(scenario()) == {"name": "Farooq"}
+
+
+def test_blocking_calls_do_not_block_the_event_loop():
+    container = Container("slow")
+    container.get_lock().acquire_write()
+
+    async def scenario():
+        wrapped = AsyncContainer(container)
+        add = asyncio.ensure_future(wrapped.add_document(Document("doc1", {})))
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        responsive = time.perf_counter() - started < 0.5
+
+        container.get_lock().release_write()
+        await add
+
+        return responsive
+
+    assert asyncio.run(scenario())
+    assert container.count_documents() == 1
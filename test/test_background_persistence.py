@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.persistence import (
+    SnapshotScheduler,
+    load_from_file,
+    persist_in_background,
+    persist_to_file,
+)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def database():
+    database = Database()
+    database.add_container("orders")
+    database.get_container("orders").add_documents(
+        (number, {"total": number}) for number in range(100)
+    )
+
+    return database
+
+
+def test_persist_in_background_writes_the_database_as_it_was(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    future = persist_in_background(database, filename, codec="json")
+    database.get_container("orders").add_document(Document(0, {"total": -1}))
+    database.get_container("orders").add_document(Document("late", {}))
+
+    assert future.result(5) == filename
+
+    loaded = load_from_file(filename).get_container("orders")
+
+    assert loaded.count_documents() == 100
+    assert loaded.get_document(0).get_data() == {"total": 0}
+    assert os.listdir(str(tmp_path)) == ["db.bak"]
+
+
+def test_persist_in_background_validates_destination(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    persist_to_file(database, filename)
+
+    with pytest.raises(errors.PersistenceError):
+        persist_in_background(database, filename)
+
+
+def test_persist_in_background_reports_errors(database, tmp_path):
+    future = persist_in_background(database, str(tmp_path / "missing" / "db.bak"))
+
+    with pytest.raises(OSError):
+        future.result(5)
+
+
+def test_saves_replace_the_file_atomically(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    persist_to_file(database, filename)
+    database.get_container("orders").add_document(Document("new", {}))
+    persist_to_file(database, filename, overwrite=True)
+
+    assert load_from_file(filename).get_container("orders").count_documents() == 101
+    assert os.listdir(str(tmp_path)) == ["db.bak"]
+
+
+def test_concurrent_writers_do_not_tear_the_snapshot(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    orders = database.get_container("orders")
+    stop = threading.Event()
+
+    def write():
+        number = 100
+
+        while not stop.is_set():
+            orders.add_document(Document(number, {"total": number}))
+            number += 1
+
+    writer = threading.Thread(target=write)
+    writer.start()
+
+    try:
+        futures = [
+            persist_in_background(database, f"{filename}.{number}") for number in range(5)
+        ]
+        counts = [
+            load_from_file(future.result(5)).get_container("orders").count_documents()
+            for future in futures
+        ]
+    finally:
+        stop.set()
+        writer.join()
+
+    assert counts == sorted(counts)
+
+    for number, count in enumerate(counts):
+        loaded = load_from_file(f"{filename}.{number}").get_container("orders")
+        assert sorted(loaded.list_documents()) == list(range(count))
+
+
+@pytest.mark.parametrize("schedule", [{}, {"interval": 0}, {"mutations": -1}])
+def test_invalid_schedule_raises_error(database, tmp_path, schedule):
+    with pytest.raises(errors.PersistenceError):
+        SnapshotScheduler(database, str(tmp_path / "db.bak"), **schedule)
+
+
+def test_scheduler_saves_after_mutations(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    scheduler = SnapshotScheduler(database, filename, mutations=10)
+
+    try:
+        database.get_container("orders").add_documents(
+            (number, {}) for number in range(100, 110)
+        )
+
+        _wait_for(lambda: scheduler.get_save_count() == 1)
+
+        assert load_from_file(filename).get_container("orders").count_documents() == 110
+    finally:
+        scheduler.stop(save=False)
+
+
+def test_scheduler_saves_on_interval_only_when_changed(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    scheduler = SnapshotScheduler(database, filename, interval=0.01)
+
+    try:
+        time.sleep(0.1)
+
+        assert scheduler.get_save_count() == 0
+
+        database.add_container("customers")
+
+        _wait_for(lambda: scheduler.get_save_count() == 1)
+
+        assert load_from_file(filename).list_containers() == ["orders", "customers"]
+        assert scheduler.get_last_error() is None
+    finally:
+        scheduler.stop()
+
+
+def test_stop_saves_pending_mutations(database, tmp_path):
+    filename = str(tmp_path / "db.bak")
+    scheduler = SnapshotScheduler(database, filename, interval=3600)
+    database.get_container("orders").add_document(Document("new", {}))
+    scheduler.stop()
+
+    assert scheduler.get_save_count() == 1
+    assert load_from_file(filename).get_container("orders").count_documents() == 101
+
+    database.get_container("orders").add_document(Document("after", {}))
+
+    assert scheduler.get_save_count() == 1
@@ -0,0 +1,231 @@
+import os
+import pickle
+
+import pytest
+
+from dockie.core import budget, errors, events, index, wal
+from dockie.core.budget import BudgetedDocumentStore, MemoryBudget, estimate_size
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document, NoneDocument
+from dockie.core.partition import PartitionedContainer
+from dockie.query.query import DocumentAttributeQuery
+
+
+def _document(number):
+    return Document(number, {"number": number, "payload": "x" * 100})
+
+
+def _budget_for(documents):
+    return sum(estimate_size(_document(number)) for number in range(documents))
+
+
+@pytest.fixture
+def spilled(tmp_path):
+    container = Container("orders")
+    container.set_memory_budget(_budget_for(10), budget.SPILL, str(tmp_path))
+    container.add_documents(_document(number) for number in range(100))
+
+    return container
+
+
+def test_estimate_size_counts_nested_data():
+    small = estimate_size(Document("a", {"tags": []}))
+    large = estimate_size(Document("a", {"tags": ["x" * 1000, {"nested": "y" * 1000}]}))
+
+    assert large - small > 2000
+
+
+def test_invalid_budget_settings_raise_error():
+    with pytest.raises(errors.ObjectCreateError):
+        MemoryBudget(0)
+
+    with pytest.raises(errors.ObjectCreateError):
+        Container("orders").set_memory_budget(1000, mode="compress")
+
+
+def test_clock_gives_referenced_documents_a_second_chance():
+    store = BudgetedDocumentStore(MemoryBudget(3 * estimate_size(_document(0))))
+
+    for number in range(3):
+        store[number] = _document(number)
+
+    assert store.get(0) is not None
+
+    store[3] = _document(3)
+
+    assert list(store) == [0, 2, 3]
+    assert [document.get_id() for document in store.pop_dropped()] == [1]
+
+
+def test_drop_mode_evicts_cold_documents():
+    container = Container("cache")
+    container.add_index("number", index.HASH)
+    mutations = []
+    container.add_listener(mutations.append)
+    container.set_memory_budget(_budget_for(10))
+
+    for number in range(20):
+        container.add_document(_document(number))
+
+    stats = container.get_memory_stats()
+
+    assert container.count_documents() == 10
+    assert stats.evictions == 10
+    assert stats.used_bytes <= stats.max_bytes
+    assert stats.resident == 10 and stats.spilled == 0
+    assert isinstance(container.get_document(0), NoneDocument)
+    assert list(container.get_index("number").lookup(0)) == []
+    evicted = [mutation.document.get_id() for mutation in mutations if mutation.kind == events.EVICT]
+
+    assert evicted == list(range(10))
+
+
+def test_drop_mode_evicts_during_bulk_load():
+    container = Container("cache")
+    container.set_memory_budget(_budget_for(10))
+    container.add_documents(_document(number) for number in range(100))
+
+    assert container.count_documents() == 10
+    assert container.list_documents() == list(range(90, 100))
+
+
+def test_spill_mode_reads_evicted_documents_back(spilled):
+    assert spilled.count_documents() == 100
+    assert spilled.get_memory_stats().spilled == 90
+    assert spilled.get_document(0).get_data() == _document(0).get_data()
+    assert [document.get_id() for document in spilled.get_documents([1, 99, "missing"])[:2]] == [
+        1,
+        99,
+    ]
+
+    stats = spilled.get_memory_stats()
+
+    assert stats.faults == 2
+    assert stats.spills >= 90
+    assert stats.resident <= 10
+
+
+def test_scans_do_not_fault_or_reference_documents(spilled):
+    resident = [document_id for document_id in spilled._documents._resident]
+
+    assert len(DocumentAttributeQuery().execute(spilled, query="number < 50")) == 50
+    assert len(list(spilled.iter_documents())) == 100
+
+    stats = spilled.get_memory_stats()
+
+    assert stats.faults == 0
+    assert stats.spilled == 90
+    assert list(spilled._documents._resident) == resident
+    assert not spilled._documents._referenced
+
+
+def test_drop_mode_bulk_load_counts_inserts_per_document():
+    container = Container("cache")
+    container.add_index("number", index.HASH)
+    container.set_memory_budget(_budget_for(10))
+    container.add_documents(_document(number) for number in range(10))
+
+    result = container.add_documents(_document(number) for number in range(5, 25))
+
+    assert (result.inserted, result.replaced) == (15, 5)
+
+
+def test_spill_mode_replaces_and_removes_spilled_documents(spilled):
+    spilled.add_document(Document(0, {"number": -1}))
+
+    assert spilled.get_document(0).get_data() == {"number": -1}
+    assert spilled.count_documents() == 100
+
+
+def test_spill_file_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(budget, "_COMPACT_BYTES", 0)
+    store = BudgetedDocumentStore(MemoryBudget(1), budget.SPILL, str(tmp_path))
+
+    for _ in range(3):
+        for number in range(10):
+            store[number] = _document(number)
+
+    assert store._spill.garbage == 0
+    assert store[5].get_data() == _document(5).get_data()
+
+
+def test_remove_memory_budget_reads_documents_back(spilled, tmp_path):
+    spilled.remove_memory_budget()
+
+    assert spilled.get_memory_stats() is None
+    assert isinstance(spilled._documents, dict)
+    assert spilled.count_documents() == 100
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_budgeted_container_pickles_to_dict(spilled):
+    restored = pickle.loads(pickle.dumps(spilled))
+
+    assert restored.get_memory_stats() is None
+    assert isinstance(restored._documents, dict)
+    assert restored.get_document(0).get_data() == _document(0).get_data()
+
+
+def test_spilled_documents_still_expire(spilled):
+    spilled.enable_expiry(sweep_interval=None)
+    spilled.set_expiry(0, 0.0)
+
+    assert spilled.expire() == 1
+    assert spilled.count_documents() == 99
+
+
+def test_database_budget_is_shared_by_containers():
+    database = Database()
+    database.add_container("a")
+    shared = database.set_memory_budget(_budget_for(10))
+    database.add_container("b")
+
+    for number in range(10):
+        database.get_container("a").add_document(_document(number))
+
+    for number in range(10, 15):
+        database.get_container("b").add_document(_document(number))
+
+    assert database.get_container("b").count_documents() == 5
+    assert shared.get_used() > shared.max_bytes
+
+    database.get_container("a").add_document(_document(10))
+
+    assert database.get_container("a").count_documents() == 5
+    assert database.get_container("b").get_memory_stats().evictions == 0
+    assert shared.get_used() <= shared.max_bytes
+    assert pickle.loads(pickle.dumps(database)).get_container("a").get_memory_stats() is None
+
+
+def test_partitioned_container_budget(tmp_path):
+    container = PartitionedContainer("orders", partitions=4)
+    container.set_memory_budget(_budget_for(20), budget.SPILL, str(tmp_path))
+    container.add_documents(_document(number) for number in range(100))
+
+    stats = container.get_memory_stats()
+
+    assert container.count_documents() == 100
+    assert stats.resident + stats.spilled == 100
+    assert stats.evictions == stats.spilled > 0
+    assert container.get_document(0).get_data() == _document(0).get_data()
+
+    container.remove_memory_budget()
+
+    assert container.get_memory_stats() is None
+
+
+def test_journal_does_not_record_evictions(tmp_path):
+    journaled = wal.JournaledDatabase(str(tmp_path))
+    database = journaled.get_database()
+    database.add_container("cache")
+    cache = database.get_container("cache")
+    cache.set_memory_budget(_budget_for(5))
+    cache.add_documents(_document(number) for number in range(10))
+    journaled.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path))
+
+    assert recovered.get_database().get_container("cache").count_documents() == 10
+
+    recovered.close()
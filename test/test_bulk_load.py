@@ -0,0 +1,76 @@
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+
+
+def test_add_documents_accepts_documents_and_tuples():
+    container = Container("shop")
+
+    result = container.add_documents(
+        [Document("doc1", {"n": 1}), ("doc2", {"n": 2}), (3, {"n": 3})], batch_size=2
+    )
+
+    assert result == (3, 0)
+    assert container.list_documents() == ["doc1", "doc2", 3]
+    assert container.get_document("doc2").get_data() == {"n": 2}
+
+
+def test_add_documents_counts_replacements():
+    container = Container("shop")
+    container.add_document(Document("doc1", {"n": 1}))
+
+    result = container.add_documents(
+        (f"doc{number}", {"n": number}) for number in [1, 2, 2, 3]
+    )
+
+    assert result.inserted == 2
+    assert result.replaced == 2
+    assert container.get_document("doc2").get_data() == {"n": 2}
+
+
+def test_add_documents_maintains_indexes_and_listeners():
+    container = Container("shop")
+    container.add_index("n")
+    mutations = []
+    container.add_listener(mutations.append)
+
+    result = container.add_documents([("doc1", {"n": 1}), ("doc1", {"n": 2})])
+
+    assert result == (1, 1)
+    assert list(container.get_index("n").lookup(2)) == ["doc1"]
+    assert len(mutations) == 2
+
+
+@pytest.mark.parametrize(
+    "item, error",
+    [
+        (("", {}), errors.ObjectCreateError),
+        ((1.5, {}), errors.IdTypeNotSupportedError),
+        (("doc2", None), errors.ObjectCreateError),
+        (None, errors.ObjectCreateError),
+        (("doc2",), errors.ObjectCreateError),
+    ],
+)
+def test_add_documents_rejects_invalid_batch(item, error):
+    container = Container("shop")
+
+    with pytest.raises(error):
+        container.add_documents([("doc1", {}), item])
+
+    assert container.list_documents() == []
+
+
+def test_bulk_load_into_database_container():
+    database = Database()
+    database.add_container("shop")
+
+    result = database.bulk_load("shop", ((number, {}) for number in range(10)))
+
+    assert result == (10, 0)
+    assert len(database.get_container("shop").list_documents()) == 10
+
+    with pytest.raises(errors.ObjectNotFoundError):
+        database.bulk_load("orders", [])
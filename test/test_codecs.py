@@ -0,0 +1,234 @@
+import json
+import pickle
+import struct
+
+import pytest
+
+from dockie.core import codecs, errors, index
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.persistence import load_from_file, persist_to_file
+from dockie.core.snapshot import open_snapshot, write_snapshot
+
+VALUE = {"name": "Farooq", "age": 42, "score": 1.5, "tags": ["a", "b"], "bio": None}
+
+
+@pytest.fixture
+def database():
+    database = Database()
+    database.add_container("people")
+    people = database.get_container("people")
+    people.add_index("name")
+    people.add_index("age", index.SORTED)
+    people.add_documents(
+        [("doc1", {"name": "Farooq", "age": 42}), (2, {"name": "Noor", "age": 7})]
+    )
+    database.add_container("empty")
+
+    return database
+
+
+def _available(names, lookup):
+    return [
+        name if lookup(name).is_available() else pytest.param(name, marks=pytest.mark.skip)
+        for name in names
+    ]
+
+
+@pytest.mark.parametrize(
+    "name", _available([codecs.PICKLE, codecs.JSON, codecs.MSGPACK], codecs.get_codec)
+)
+def test_codec_roundtrip(name):
+    codec = codecs.get_codec(name)
+
+    assert codec.decode(codec.encode(VALUE)) == VALUE
+
+
+@pytest.mark.parametrize(
+    "name", _available([codecs.ZLIB, codecs.LZ4], codecs.get_compression)
+)
+def test_compression_roundtrip(name):
+    compression = codecs.get_compression(name)
+    payload = b"dockie" * 1000
+
+    assert compression.decompress(compression.compress(payload)) == payload
+    assert len(compression.compress(payload)) < len(payload)
+
+
+def test_unknown_codec_raises_error():
+    with pytest.raises(errors.PersistenceError):
+        codecs.get_codec("yaml")
+
+
+def test_unknown_compression_raises_error():
+    with pytest.raises(errors.PersistenceError):
+        codecs.get_compression("brotli")
+
+
+def test_no_compression():
+    assert codecs.get_compression(None) is None
+
+
+def test_register_codec():
+    class ReprCodec(codecs.JsonCodec):
+        name = "test-json"
+
+    codecs.register_codec(ReprCodec())
+
+    assert "test-json" in codecs.list_codecs()
+    assert codecs.get_codec("test-json").decode(b"[1]") == [1]
+
+
+def test_register_rejects_names_longer_than_the_header_field():
+    class LongCodec(codecs.JsonCodec):
+        name = "json-with-a-long-name"
+
+    class LongCompression(codecs.ZlibCompression):
+        name = "zlib-with-a-long-name"
+
+    with pytest.raises(errors.PersistenceError):
+        codecs.register_codec(LongCodec())
+
+    with pytest.raises(errors.PersistenceError):
+        codecs.register_compression(LongCompression())
+
+    assert "json-with-a-long-name" not in codecs.list_codecs()
+
+
+@pytest.mark.parametrize(
+    "codec", _available([codecs.PICKLE, codecs.JSON, codecs.MSGPACK], codecs.get_codec)
+)
+@pytest.mark.parametrize(
+    "compression", [None] + _available([codecs.ZLIB, codecs.LZ4], codecs.get_compression)
+)
+def test_persist_and_load_with_codec(database, tmp_path, codec, compression):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename, codec=codec, compression=compression)
+
+    loaded = load_from_file(filename, allow_pickle=codec == codecs.PICKLE)
+    people = loaded.get_container("people")
+
+    assert sorted(loaded.list_containers()) == ["empty", "people"]
+    assert people.get_document("doc1").get_data() == {"name": "Farooq", "age": 42}
+    assert people.get_document(2).get_data() == {"name": "Noor", "age": 7}
+    assert people.list_indexes() == ["name", "age"]
+    assert people.get_index("age").index_type == index.SORTED
+    assert list(people.get_index("name").lookup("Noor")) == [2]
+
+
+def test_file_header_records_codec(database, tmp_path):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename, codec=codecs.JSON, compression=codecs.ZLIB)
+
+    with open(filename, "rb") as file:
+        magic, version, codec, codec_version, compression = struct.unpack(
+            ">8sI16sI16s", file.read(48)
+        )
+
+    assert magic == b"DOCKIEDB"
+    assert version == 1
+    assert codec.rstrip(b"\0") == b"json"
+    assert codec_version == 1
+    assert compression.rstrip(b"\0") == b"zlib"
+
+
+def test_load_file_written_by_newer_codec_raises_error(database, tmp_path):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename, codec=codecs.JSON)
+
+    with open(filename, "r+b") as file:
+        file.seek(28)
+        file.write(struct.pack(">I", 99))
+
+    with pytest.raises(errors.PersistenceError):
+        load_from_file(filename)
+
+
+def test_files_are_written_with_json_by_default(database, tmp_path):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename)
+
+    with open(filename, "rb") as file:
+        assert file.read(28)[12:28].rstrip(b"\0") == codecs.DEFAULT.encode("utf-8") == b"json"
+
+    assert load_from_file(filename).list_containers() == ["people", "empty"]
+
+
+def test_load_pickle_file_requires_allow_pickle(database, tmp_path):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename, codec=codecs.PICKLE)
+
+    with pytest.raises(errors.PersistenceError):
+        load_from_file(filename)
+
+    assert load_from_file(filename, allow_pickle=True).list_containers() == ["people", "empty"]
+
+
+def test_load_legacy_pickle_file(database, tmp_path):
+    filename = str(tmp_path / "legacy.db")
+
+    with open(filename, "wb") as file:
+        pickle.dump(database, file)
+
+    with pytest.raises(errors.PersistenceError):
+        load_from_file(filename)
+
+    loaded = load_from_file(filename, allow_pickle=True)
+
+    assert loaded.get_container("people").get_document(2).get_data()["name"] == "Noor"
+
+
+@pytest.mark.parametrize(
+    "codec", _available([codecs.PICKLE, codecs.JSON, codecs.MSGPACK], codecs.get_codec)
+)
+def test_snapshot_with_codec(database, tmp_path, codec):
+    filename = str(tmp_path / "people.snapshot")
+    write_snapshot(database, filename, codec=codec)
+
+    people = open_snapshot(filename, allow_pickle=codec == codecs.PICKLE).get_container("people")
+
+    assert people.get_document("doc1").get_data() == {"name": "Farooq", "age": 42}
+    assert list(people.get_index("age").range(10, True, None, True)) == ["doc1"]
+    assert list(people.get_index("name").lookup("Noor")) == [2]
+
+
+def test_open_pickle_snapshot_requires_allow_pickle(database, tmp_path):
+    filename = str(tmp_path / "people.snapshot")
+    write_snapshot(database, filename, codec=codecs.PICKLE)
+
+    with pytest.raises(errors.PersistenceError):
+        open_snapshot(filename)
+
+
+def test_snapshot_directory_is_encoded_with_the_document_codec(database, tmp_path):
+    filename = str(tmp_path / "people.snapshot")
+    write_snapshot(database, filename, codec=codecs.JSON)
+
+    with open(filename, "rb") as file:
+        header = file.read(struct.calcsize(">8sI16sIQQ"))
+        _, version, _, _, offset, length = struct.unpack(">8sI16sIQQ", header)
+        file.seek(offset)
+        directory = json.loads(file.read(length))
+
+    assert version == 3
+    assert [entry["name"] for entry in directory] == ["people", "empty"]
+    assert directory[0]["indexes"][1] == ["age", "sorted", [["doc1", [42]], [2, [7]]]]
+
+
+def test_open_version_1_snapshot_raises_error(tmp_path):
+    filename = str(tmp_path / "people.snapshot")
+
+    with open(filename, "wb") as file:
+        file.write(struct.pack(">8sI16sIQQ", b"DOCKIEMM", 1, b"pickle", 1, 0, 0))
+
+    with pytest.raises(errors.PersistenceError):
+        open_snapshot(filename)
+
+
+def test_add_documents_of_loaded_json_database(database, tmp_path):
+    filename = str(tmp_path / "people.db")
+    persist_to_file(database, filename, codec=codecs.JSON)
+    people = load_from_file(filename).get_container("people")
+    people.add_document(Document(3, {"name": "Yasin", "age": 12}))
+
+    assert list(people.get_index("age").range(10, True, None, True)) == [3, "doc1"]
@@ -0,0 +1,135 @@
+import pytest
+
+from dockie.core import errors, persistence, snapshot
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def container():
+    container = Container("shop")
+    container.add_documents(
+        [
+            ("doc1", {"price": 10, "stock": {"count": 5}}),
+            ("doc2", {"price": 20.5, "stock": {"count": 0}}),
+            ("doc3", {"price": "unknown"}),
+            ("doc4", {"name": "no price"}),
+        ]
+    )
+    container.add_column("price")
+
+    return container
+
+
+def test_add_column_projects_existing_documents(container):
+    column_store = container.get_column_store()
+
+    assert container.list_columns() == ["price"]
+    assert column_store.ids(column_store.compare("price", ">=", 10)) == ["doc1", "doc2"]
+    assert column_store.ids(column_store.fallback(["price"])) == ["doc3"]
+
+
+def test_column_follows_inserts_and_replacements(container):
+    container.add_document(Document("doc5", {"price": 7}))
+    container.add_document(Document("doc1", {"price": 100}))
+    column_store = container.get_column_store()
+
+    assert column_store.ids(column_store.compare("price", "<", 50)) == ["doc2", "doc5"]
+    assert column_store.ids(column_store.compare("price", "==", 100)) == ["doc1"]
+
+
+def test_column_follows_bulk_loads(container):
+    container.add_documents(("doc%d" % number, {"price": number}) for number in range(5, 100))
+    column_store = container.get_column_store()
+
+    assert column_store.aggregate("price", "count") == 97
+    assert column_store.aggregate("price", "max") == 99
+
+
+def test_removed_positions_are_compacted(container):
+    container.enable_expiry(sweep_interval=None)
+
+    for round_number in range(10):
+        container.add_documents(
+            (f"{round_number}-{number}", {"price": number}) for number in range(100)
+        )
+        container.set_expiry("doc2", 0.0 if round_number == 9 else None)
+
+        for number in range(100):
+            container.set_expiry(f"{round_number}-{number}", 0.0)
+
+        container.expire()
+
+    column_store = container.get_column_store()
+
+    assert len(column_store._ids) < 200
+    assert column_store.ids(column_store.compare("price", ">=", 0)) == ["doc1"]
+    assert column_store.ids(column_store.fallback(["price"])) == ["doc3"]
+    assert column_store.aggregate("price", "sum") == 10
+
+
+def test_add_duplicate_column_raises_error(container):
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_column("price")
+
+
+def test_add_column_with_no_path_raises_error(container):
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_column(" ")
+
+
+@pytest.mark.parametrize(
+    "function, expected",
+    [("count", 2), ("sum", 30.5), ("min", 10.0), ("max", 20.5), ("mean", 15.25)],
+)
+def test_aggregate(container, function, expected):
+    assert container.get_column_store().aggregate("price", function) == expected
+
+
+def test_aggregate_over_no_values(container):
+    column_store = container.get_column_store()
+    mask = column_store.mask_of([])
+
+    assert column_store.aggregate("price", "count", mask) == 0
+    assert column_store.aggregate("price", "sum", mask) == 0.0
+    assert column_store.aggregate("price", "mean", mask) is None
+
+
+def test_unsupported_aggregate_raises_error(container):
+    with pytest.raises(errors.QueryError):
+        container.get_column_store().aggregate("price", "median")
+
+
+def test_large_integers_and_lists_fall_back(container):
+    container.add_document(Document("doc5", {"price": 2 ** 60}))
+    container.add_document(Document("doc6", {"price": [1, 2]}))
+    column_store = container.get_column_store()
+
+    assert column_store.ids(column_store.fallback(["price"])) == ["doc3", "doc5", "doc6"]
+
+
+def test_columns_survive_persistence(container, tmp_path):
+    database = Database()
+    database.attach_container(container)
+    filename = str(tmp_path / "columns.db")
+    persistence.persist_to_file(database, filename)
+
+    loaded = persistence.load_from_file(filename).get_container("shop")
+
+    assert loaded.list_columns() == ["price"]
+    assert loaded.get_column_store().aggregate("price", "sum") == 30.5
+
+
+def test_columns_survive_snapshots(container, tmp_path):
+    database = Database()
+    database.attach_container(container)
+    filename = str(tmp_path / "columns.snapshot")
+    snapshot.write_snapshot(database, filename)
+
+    opened = snapshot.open_snapshot(filename).get_container("shop")
+    opened.add_document(Document("doc5", {"price": 1}))
+
+    assert opened.get_column_store().aggregate("price", "min") == 1.0
@@ -0,0 +1,102 @@
+import threading
+
+from dockie.core import index
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.persistence import load_from_file, persist_to_file
+from dockie.query.query import DocumentAttributeQuery
+
+WRITERS = 4
+READERS = 4
+DOCUMENTS_PER_WRITER = 2000
+
+
+def _run(targets):
+    failures = []
+
+    def guarded(target):
+        try:
+            target()
+        except Exception as exception:  # pylint: disable=broad-except
+            failures.append(exception)
+
+    threads = [threading.Thread(target=guarded, args=(target,)) for target in targets]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return failures
+
+
+def test_scans_and_point_reads_under_concurrent_writes():
+    container = Container("shop")
+    container.add_index("writer", index.HASH)
+    container.add_index("number", index.SORTED)
+    done = threading.Event()
+
+    def write(writer):
+        def target():
+            for number in range(DOCUMENTS_PER_WRITER):
+                container.add_document(
+                    Document(f"{writer}-{number}", {"writer": writer, "number": number})
+                )
+
+                if number % 10 == 0:
+                    container.add_document(
+                        Document(f"{writer}-0", {"writer": writer, "number": 0})
+                    )
+
+        return target
+
+    def read():
+        query = DocumentAttributeQuery()
+
+        while not done.is_set():
+            for document in query.execute(container, query="writer == 1"):
+                assert document.get_data()["writer"] == 1
+
+            for document in query.execute(container, query="number < 10"):
+                assert document.get_data()["number"] < 10
+
+            scanned = query.execute(container, query="number >= 0 AND writer != -1")
+            assert len(scanned) <= WRITERS * DOCUMENTS_PER_WRITER
+            container.get_document("0-0")
+
+    readers = [read for _ in range(READERS)]
+    writers = [write(writer) for writer in range(WRITERS)]
+
+    def write_all():
+        try:
+            assert not _run(writers)
+        finally:
+            done.set()
+
+    assert not _run(readers + [write_all])
+
+    query = DocumentAttributeQuery()
+
+    assert len(container.list_documents()) == WRITERS * DOCUMENTS_PER_WRITER
+    assert len(query.execute(container, query="writer == 2")) == DOCUMENTS_PER_WRITER
+    assert len(query.execute(container, query="number < 10")) == WRITERS * 10
+
+
+def test_persist_while_writing(tmp_path):
+    database = Database()
+    database.add_container("shop")
+    container = database.get_container("shop")
+    filename = str(tmp_path / "db.bak")
+
+    def write():
+        for number in range(DOCUMENTS_PER_WRITER * 2):
+            container.add_document(Document(number, {"number": number}))
+
+    def persist():
+        for _ in range(10):
+            persist_to_file(database, filename, overwrite=True)
+            load_from_file(filename)
+
+    assert not _run([write, persist])
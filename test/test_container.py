@@ -40,3 +40,26 @@ def test_raise_error_when_container_name_not_specified():
 def test_get_document_when_not_found_returns_none_document():
     document = container.get_document("foo")
     assert type(document) is NoneDocument
+
+
+def test_get_document_misses_share_one_none_document():
+    assert container.get_document("foo") is container.get_document(1234)
+
+
+def test_get_documents_returns_documents_in_request_order():
+    documents = container.get_documents(["order1", "missing", "item1", 42])
+
+    assert [document.get_id() for document in documents[::2]] == ["order1", "item1"]
+    assert documents[1] is documents[3] is container.get_document("missing")
+
+
+@pytest.mark.parametrize("document_ids", [None, ["item1", ""], ["item1", 1.5]])
+def test_get_documents_with_invalid_ids_raises_error(document_ids):
+    with pytest.raises((errors.ObjectReadError, errors.IdTypeNotSupportedError)):
+        container.get_documents(document_ids)
+
+
+@pytest.mark.parametrize("document_id", ["", "  ", None, 1.5, True])
+def test_get_document_with_invalid_id_raises_error(document_id):
+    with pytest.raises((errors.ObjectReadError, errors.IdTypeNotSupportedError)):
+        container.get_document(document_id)
@@ -1,8 +1,9 @@
+import pickle
 from typing import Optional
 
 import pytest
 
-from dockie.core.document import Document
+from dockie.core.document import NONE_DOCUMENT, Document, NoneDocument
 import dockie.core.errors as errors
 
 
@@ -32,3 +33,36 @@ def test_can_create_document_with_int_id():
     data = {"foo": "bar"}
     doc = Document(1, data)
     assert doc.get_id() == 1
+
+
+def test_document_has_no_instance_dict():
+    doc = Document("doc1", {})
+
+    assert not hasattr(doc, "__dict__")
+
+    with pytest.raises(AttributeError):
+        doc.extra = "value"
+
+
+def test_document_pickle_roundtrip():
+    doc = pickle.loads(pickle.dumps(Document("doc1", {"foo": "bar"})))
+
+    assert doc.get_id() == "doc1"
+    assert doc.get_data() == {"foo": "bar"}
+
+
+def test_document_loads_state_pickled_before_slots():
+    doc = Document.__new__(Document)
+    doc.__setstate__({"_document_id": "doc1", "_data": {"foo": "bar"}})
+
+    assert doc.get_id() == "doc1"
+    assert doc.get_data() == {"foo": "bar"}
+
+
+def test_none_document_is_shared_and_empty():
+    assert isinstance(NONE_DOCUMENT, NoneDocument)
+    assert NONE_DOCUMENT.get_id() is None
+    assert dict(NONE_DOCUMENT.get_data()) == {}
+
+    with pytest.raises(TypeError):
+        NONE_DOCUMENT.get_data()["foo"] = "bar"
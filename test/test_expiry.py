@@ -0,0 +1,279 @@
+import pickle
+import time
+
+import pytest
+
+from dockie.core import errors, events, index, persistence, snapshot, wal
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document, NoneDocument
+from dockie.core.expiry import ExpiryQueue
+from dockie.core.partition import PartitionedContainer
+from dockie.query.query import DocumentAttributeQuery
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def container():
+    container = Container("sessions")
+    container.enable_expiry(sweep_interval=None)
+    container.add_document(Document("kept", {"user": 1}))
+    container.add_document(Document("expiring", {"user": 2}), ttl=3600)
+    container.add_document(Document("expired", {"user": 3}), ttl=3600)
+    container.set_expiry("expired", time.time() - 1)
+
+    return container
+
+
+def test_expiry_queue_pops_expired_documents_earliest_first():
+    queue = ExpiryQueue()
+    now = time.time()
+    queue.set("b", now - 1)
+    queue.set("a", now - 2)
+    queue.set("c", now + 3600)
+
+    assert queue.has_expired()
+    assert queue.pop_expired(limit=1) == ["a"]
+    assert queue.pop_expired() == ["b"]
+    assert not queue.has_expired()
+    assert len(queue) == 1
+
+
+def test_expiry_queue_skips_stale_entries():
+    queue = ExpiryQueue()
+    queue.set("a", time.time() - 1)
+    queue.set("a", time.time() + 3600)
+    queue.set("b", time.time() - 1)
+    queue.set("b", None)
+
+    assert queue.pop_expired() == []
+    assert queue.items() == [("a", queue.get("a"))]
+
+
+def test_expiry_queue_ignores_stale_entries_when_checking():
+    queue = ExpiryQueue()
+    queue.set("a", time.time() - 1)
+    queue.set("a", time.time() + 3600)
+    queue.set("b", time.time() - 1)
+    queue.set("b", None)
+
+    assert not queue.has_expired()
+    assert queue.list_expired() == []
+
+    queue.set("c", time.time() - 1)
+
+    assert queue.has_expired()
+    assert queue.list_expired() == ["c"]
+    assert len(queue) == 2
+
+
+def test_expiry_queue_can_be_pickled():
+    queue = ExpiryQueue(default_ttl=10)
+    queue.set("a", time.time() - 1)
+
+    restored = pickle.loads(pickle.dumps(queue))
+
+    assert restored.default_ttl == 10
+    assert restored.pop_expired() == ["a"]
+
+
+@pytest.mark.parametrize("settings", [{"default_ttl": 0}, {"sweep_interval": -1}])
+def test_invalid_expiry_settings_raise_error(settings):
+    with pytest.raises(errors.ObjectCreateError):
+        Container("sessions").enable_expiry(**settings)
+
+
+def test_ttl_requires_expiry_to_be_enabled():
+    container = Container("sessions")
+
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_document(Document("a", {}), ttl=10)
+
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_documents([("a", {})], ttl=10)
+
+    assert container.count_documents() == 0
+
+
+def test_reads_treat_expired_documents_as_missing(container):
+    assert isinstance(container.get_document("expired"), NoneDocument)
+    assert container.get_document("expiring").get_data() == {"user": 2}
+    assert isinstance(container.get_documents(["kept", "expired"])[1], NoneDocument)
+    assert sorted(container.list_documents()) == ["expiring", "kept"]
+    assert [document.get_id() for document in container.iter_documents()] == [
+        "kept",
+        "expiring",
+    ]
+    assert len(DocumentAttributeQuery().execute(container, query="user >= 1")) == 2
+    assert container.count_documents() == 3
+
+
+def test_expire_removes_expired_documents_and_index_entries(container):
+    container.add_index("user", index.HASH)
+    mutations = []
+    container.add_listener(mutations.append)
+    version = container.get_version()
+
+    assert container.expire() == 1
+    assert container.expire() == 0
+    assert container.count_documents() == 2
+    assert list(container.get_index("user").lookup(3)) == []
+    assert container.get_version() == version + 1
+    assert [(mutation.kind, mutation.document.get_id()) for mutation in mutations] == [
+        (events.EXPIRE, "expired")
+    ]
+
+
+def test_replacing_a_document_resets_its_expiry(container):
+    container.add_document(Document("expired", {"user": 4}))
+
+    assert container.get_expiry("expired") is None
+    assert container.get_document("expired").get_data() == {"user": 4}
+
+
+def test_default_ttl_and_set_expiry(container):
+    container.enable_expiry(default_ttl=60, sweep_interval=None)
+    container.add_document(Document("new", {}))
+    container.add_documents([("bulk", {})], ttl=120)
+
+    assert container.get_expiry("new") == pytest.approx(time.time() + 60, abs=5)
+    assert container.get_expiry("bulk") == pytest.approx(time.time() + 120, abs=5)
+    assert container.get_expiry("expiring") is not None
+
+    version = container.get_version()
+    container.set_expiry("expiring", None)
+
+    assert container.get_expiry("expiring") is None
+    assert container.get_version() == version + 1
+    assert not container.set_expiry("missing", time.time())
+    assert container.get_version() == version + 1
+
+
+def test_disable_expiry_removes_expired_documents(container):
+    container.disable_expiry()
+
+    assert not container.is_expiry_enabled()
+    assert sorted(container.list_documents()) == ["expiring", "kept"]
+    assert container.get_expiry("expiring") is None
+
+
+def test_sweeper_removes_expired_documents_in_background():
+    container = Container("sessions")
+    container.enable_expiry(sweep_interval=0.01)
+    container.add_documents(((number, {}) for number in range(100)), ttl=0.05)
+    container.add_document(Document("kept", {}))
+
+    _wait_for(lambda: container.count_documents() == 1)
+    sweeper = container._features.sweeper
+
+    assert sweeper.is_running()
+
+    container.disable_expiry()
+
+    assert not sweeper.is_running()
+
+
+def test_partitioned_container_expiry():
+    container = PartitionedContainer("sessions", partitions=4)
+    container.enable_expiry(sweep_interval=None)
+    container.add_documents(((number, {}) for number in range(20)), ttl=3600)
+
+    for number in range(10):
+        container.set_expiry(number, time.time() - 1)
+
+    assert isinstance(container.get_document(0), NoneDocument)
+    assert container.expire() == 10
+    assert container.count_documents() == 10
+
+    container.enable_expiry(sweep_interval=0.01)
+    container.set_expiry(10, time.time() - 1)
+
+    _wait_for(lambda: container.count_documents() == 9)
+
+    container.disable_expiry()
+
+
+def test_persist_and_load_keep_expiry(container, tmp_path):
+    database = Database()
+    database.attach_container(container)
+    filename = str(tmp_path / "db.dockie")
+    persistence.persist_to_file(database, filename, codec="json")
+
+    loaded = persistence.load_from_file(filename).get_container("sessions")
+
+    assert sorted(loaded.list_documents()) == ["expiring", "kept"]
+    assert loaded.get_expiry("expiring") == container.get_expiry("expiring")
+    assert loaded.get_expiry_queue().sweep_interval is None
+
+
+def test_snapshot_keeps_expiry(container, tmp_path):
+    database = Database()
+    database.attach_container(container)
+    filename = str(tmp_path / "db.snap")
+    snapshot.write_snapshot(database, filename)
+
+    loaded = snapshot.open_snapshot(filename).get_container("sessions")
+
+    assert sorted(loaded.list_documents()) == ["expiring", "kept"]
+    assert loaded.get_expiry("expiring") == container.get_expiry("expiring")
+
+
+def test_save_and_load_partitions_keep_expiry(tmp_path):
+    container = PartitionedContainer("sessions", partitions=2)
+    container.enable_expiry(default_ttl=60, sweep_interval=None)
+    container.add_documents((number, {}) for number in range(10))
+    persistence.save_partitions(container, str(tmp_path))
+
+    loaded = persistence.load_partitions(str(tmp_path))
+
+    assert loaded.is_expiry_enabled()
+    assert loaded.get_expiry(3) == container.get_expiry(3)
+
+
+def test_journaled_database_recovers_expiry(tmp_path):
+    journaled = wal.JournaledDatabase(str(tmp_path))
+    database = journaled.get_database()
+    database.add_container("sessions")
+    sessions = database.get_container("sessions")
+    sessions.enable_expiry(sweep_interval=None)
+    sessions.add_document(Document("a", {}), ttl=3600)
+    sessions.add_document(Document("b", {}), ttl=3600)
+    sessions.set_expiry("b", time.time() - 1)
+    sessions.expire()
+    journaled.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path))
+    sessions = recovered.get_database().get_container("sessions")
+
+    assert sessions.list_documents() == ["a"]
+    assert sessions.get_expiry("a") == pytest.approx(time.time() + 3600, abs=5)
+
+    recovered.close()
+
+
+def test_journaled_database_recovers_expiry_changes(tmp_path):
+    journaled = wal.JournaledDatabase(str(tmp_path))
+    database = journaled.get_database()
+    database.add_container("sessions")
+    sessions = database.get_container("sessions")
+    sessions.enable_expiry(sweep_interval=None)
+    sessions.add_document(Document("a", {}), ttl=3600)
+    sessions.add_document(Document("b", {}), ttl=3600)
+    sessions.set_expiry("a", time.time() + 7200)
+    sessions.set_expiry("b", None)
+    journaled.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path))
+    sessions = recovered.get_database().get_container("sessions")
+
+    assert sessions.get_expiry("a") == pytest.approx(time.time() + 7200, abs=5)
+    assert sessions.get_expiry("b") is None
+
+    recovered.close()
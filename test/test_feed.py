@@ -0,0 +1,149 @@
+import asyncio
+import pickle
+import threading
+
+import pytest
+
+from dockie.core import errors, events
+from dockie.core.aio import AsyncContainer
+from dockie.core.container import Container
+from dockie.core.document import Document
+from dockie.core.feed import ChangeFeed
+from dockie.core.partition import PartitionedContainer
+
+
+@pytest.fixture
+def container():
+    container = Container("orders")
+    container.enable_change_feed()
+
+    return container
+
+
+def test_feed_records_inserts_and_replacements_in_order(container):
+    container.add_document(Document("a", {"total": 1}))
+    container.add_documents([("b", {"total": 2}), ("a", {"total": 3})])
+
+    changes = container.get_change_feed().read()
+
+    assert [(change.sequence, change.kind, change.document_id) for change in changes] == [
+        (1, events.INSERT, "a"),
+        (2, events.INSERT, "b"),
+        (3, events.REPLACE, "a"),
+    ]
+    assert changes[2].document.get_data() == {"total": 3}
+
+
+def test_read_from_checkpoint(container):
+    container.add_documents((number, {}) for number in range(10))
+    change_feed = container.get_change_feed()
+
+    assert [change.document_id for change in change_feed.read(7)] == [7, 8, 9]
+    assert [change.sequence for change in change_feed.read(2, limit=2)] == [3, 4]
+    assert change_feed.read(change_feed.get_sequence()) == []
+
+
+def test_retention_is_bounded():
+    change_feed = ChangeFeed(retention=5)
+    container = Container("orders")
+    container.add_listener(change_feed)
+    container.add_documents((number, {}) for number in range(100))
+
+    assert len(change_feed.read(95)) == 5
+
+    with pytest.raises(errors.ObjectReadError):
+        change_feed.read(94)
+
+
+def test_invalid_retention_raises_error():
+    with pytest.raises(errors.ObjectCreateError):
+        Container("orders").enable_change_feed(retention=0)
+
+
+def test_feed_records_expiry(container):
+    container.enable_expiry(sweep_interval=None)
+    container.add_document(Document("a", {}), ttl=3600)
+    container.set_expiry("a", 0.0)
+    container.expire()
+
+    assert [change.kind for change in container.get_change_feed().read()] == [
+        events.INSERT,
+        events.EXPIRE,
+    ]
+
+
+def test_iter_changes_waits_for_new_changes(container):
+    change_feed = container.get_change_feed()
+    received = []
+
+    def consume():
+        received.extend(change.document_id for change in change_feed.iter_changes())
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    container.add_document(Document("a", {}))
+    container.add_document(Document("b", {}))
+    container.disable_change_feed()
+    consumer.join(5)
+
+    assert not consumer.is_alive()
+    assert received == ["a", "b"]
+    assert container.get_change_feed() is None
+
+
+def test_iter_changes_ends_after_timeout(container):
+    container.add_document(Document("a", {}))
+
+    assert len(list(container.get_change_feed().iter_changes(timeout=0.01))) == 1
+
+
+def test_async_stream():
+    async def scenario():
+        container = AsyncContainer(Container("orders"))
+        container.get_container().enable_change_feed()
+        received = []
+
+        async def consume():
+            async for change in container.stream_changes(timeout=5):
+                received.append(change.document_id)
+
+                if len(received) == 2:
+                    return
+
+        consumer = asyncio.ensure_future(consume())
+        await container.add_document(Document("a", {}))
+        await container.add_document(Document("b", {}))
+        await asyncio.wait_for(consumer, 5)
+
+        return received
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+
+
+def test_async_stream_requires_feed():
+    async def scenario():
+        async for _ in AsyncContainer(Container("orders")).stream_changes():
+            pass
+
+    with pytest.raises(errors.ObjectReadError):
+        asyncio.run(scenario())
+
+
+def test_partitioned_container_feed_sequences_every_partition():
+    container = PartitionedContainer("orders", partitions=4)
+    change_feed = container.enable_change_feed()
+    container.add_documents((number, {}) for number in range(20))
+
+    changes = change_feed.read()
+
+    assert [change.sequence for change in changes] == list(range(1, 21))
+    assert sorted(change.document_id for change in changes) == list(range(20))
+
+
+def test_feed_is_not_pickled(container):
+    container.add_document(Document("a", {}))
+
+    restored = pickle.loads(pickle.dumps(container))
+
+    assert restored.get_change_feed() is None
+    assert restored.get_document("a").get_data() == {}
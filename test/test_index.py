@@ -0,0 +1,94 @@
+import pytest
+
+from dockie.core import errors, index
+from dockie.core.container import Container
+from dockie.core.document import Document
+
+
+def test_hash_index_looks_up_nested_values():
+    hash_index = index.HashIndex("bio.name")
+    hash_index.add("doc1", {"bio": {"name": "Farooq"}})
+    hash_index.add("doc2", {"bio": {"name": "Noor"}})
+
+    assert list(hash_index.lookup("Farooq")) == ["doc1"]
+    assert hash_index.count("Noor") == 1
+
+
+def test_hash_index_skips_unhashable_values():
+    hash_index = index.HashIndex("tags")
+    hash_index.add("doc1", {"tags": ["a", "b"]})
+
+    assert list(hash_index.lookup("a")) == []
+
+
+def test_sorted_index_answers_ranges_in_value_order():
+    sorted_index = index.SortedIndex("price")
+
+    for document_id, price in [("c", 30), ("a", 10), ("b", 20.5)]:
+        sorted_index.add(document_id, {"price": price})
+
+    assert sorted_index.range(lower=10, lower_inclusive=False) == ["b", "c"]
+    assert sorted_index.range(upper=20.5) == ["a", "b"]
+    assert sorted_index.count_range(10, True, 30, False) == 2
+
+
+def test_sorted_index_keeps_numbers_and_strings_apart():
+    sorted_index = index.SortedIndex("code")
+    sorted_index.add("doc1", {"code": 5})
+    sorted_index.add("doc2", {"code": "5"})
+
+    assert sorted_index.range(lower=0) == ["doc1"]
+    assert sorted_index.range(lower="0") == ["doc2"]
+
+
+def test_replacing_document_updates_index():
+    container = Container("shop")
+    container.add_index("name")
+    container.add_document(Document("doc1", {"name": "Farooq"}))
+    container.add_document(Document("doc1", {"name": "Noor"}))
+
+    assert list(container.get_index("name").lookup("Farooq")) == []
+    assert list(container.get_index("name").lookup("Noor")) == ["doc1"]
+
+
+def test_add_index_indexes_existing_documents():
+    container = Container("shop")
+    container.add_document(Document("doc1", {"price": 10}))
+    container.add_index("price", index.SORTED)
+
+    assert container.list_indexes() == ["price"]
+    assert container.get_index("price").range(lower=5) == ["doc1"]
+
+
+def test_add_index_raises_error_when_index_exists():
+    container = Container("shop")
+    container.add_index("name")
+
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_index("name", index.SORTED)
+
+
+def test_add_index_raises_error_when_index_type_not_supported():
+    with pytest.raises(errors.ObjectCreateError):
+        Container("shop").add_index("name", "bitmap")
+
+
+@pytest.mark.parametrize("index_type", [index.HASH, index.SORTED])
+def test_restored_index_matches_the_original(index_type):
+    original = index.create_index("price", index_type)
+
+    for document_id, price in [("c", 10), (2, 10), ("a", "x"), (1, 10.0), ("b", 5)]:
+        original.add(document_id, {"price": price})
+
+    restored = index.restore_index(original.describe())
+
+    assert restored.index_type == index_type
+    assert restored.get_values(2) == [10]
+
+    for value in (5, 10, "x", 7):
+        assert list(restored.lookup(value)) == list(original.lookup(value))
+
+    if index_type == index.SORTED:
+        assert list(restored.iter_ordered()) == list(original.iter_ordered()) == [
+            "b", 1, 2, "c", "a"
+        ]
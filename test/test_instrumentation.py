@@ -0,0 +1,173 @@
+import os
+
+import pytest
+
+from dockie.core import errors, instrumentation
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+from dockie.core.instrumentation import Histogram, Instrumentation
+from dockie.core.partition import PartitionedContainer
+from dockie.core.persistence import load_from_file, persist_to_file
+from dockie.query.cache import QueryCache
+from dockie.query.query import DocumentAttributeQuery, DocumentIdQuery
+
+
+@pytest.fixture
+def collector():
+    collector = instrumentation.enable(Instrumentation(slow_query_seconds=0))
+
+    yield collector
+
+    instrumentation.disable()
+
+
+@pytest.fixture
+def container():
+    container = Container("numbers")
+    container.add_documents((f"doc{number}", {"number": number}) for number in range(50))
+
+    return container
+
+
+def test_instrumentation_is_disabled_by_default():
+    assert instrumentation.ACTIVE is None
+
+
+def test_container_calls_are_timed(collector, container):
+    container.add_document(Document("doc50", {"number": 50}))
+    container.get_document("doc1")
+    container.get_document("missing")
+
+    counters = collector.get_counters()
+    assert counters["container.add_document"] == 1
+    assert counters["container.get_document.hits"] == 1
+    assert counters["container.get_document.misses"] == 1
+    assert collector.get_histogram("container.add_document").count == 1
+
+
+def test_validation_is_timed(collector, container):
+    container.add_documents([("doc50", {"number": 50})])
+    container.get_documents(["doc1", "missing"])
+
+    histograms = collector.list_histograms()
+    assert "container.validate_documents" in histograms
+    assert "container.validate_ids" in histograms
+    assert collector.get_counters()["container.get_documents.misses"] == 1
+
+
+def test_ids_are_validated_once_per_read(collector):
+    container = PartitionedContainer("numbers", partitions=4)
+    container.add_documents((number, {}) for number in range(20))
+
+    DocumentIdQuery().execute(container, document_ids=list(range(10)))
+    container.get_documents([1, 2, 3])
+
+    assert collector.get_histogram("container.validate_ids").count == 2
+
+
+def test_query_profile_counts_scanned_and_returned(collector, container):
+    DocumentAttributeQuery(query_cache=QueryCache()).execute(container, query="number < 5")
+
+    counters = collector.get_counters()
+    assert counters["query.execute"] == 1
+    assert counters["query.parse"] == 1
+    assert counters["query.scanned"] == 50
+    assert counters["query.returned"] == 5
+
+    (slow_query,) = collector.get_slow_queries()
+    assert slow_query.query == "number < 5"
+    assert slow_query.container == "numbers"
+    assert slow_query.plan == "FULL SCAN"
+    assert slow_query.scanned == 50
+    assert slow_query.returned == 5
+    assert slow_query.parse_seconds > 0
+
+
+def test_indexed_query_scans_only_candidates(collector, container):
+    container.add_index("number")
+    DocumentAttributeQuery().execute(container, query="number == 3")
+
+    assert collector.get_counters()["query.scanned"] == 1
+
+
+def test_id_query_is_profiled(collector, container):
+    DocumentIdQuery().execute(container, document_id="missing")
+
+    (slow_query,) = collector.get_slow_queries()
+    assert slow_query.query_type == "DocumentIdQuery"
+    assert slow_query.returned == 0
+
+
+def test_slow_query_threshold_and_log_size(container):
+    collector = instrumentation.enable(
+        Instrumentation(slow_query_seconds=60, slow_query_log_size=1)
+    )
+
+    try:
+        DocumentAttributeQuery().execute(container, query="number < 5")
+    finally:
+        instrumentation.disable()
+
+    assert not collector.get_slow_queries()
+    assert collector.get_counters()["query.execute"] == 1
+
+
+def test_callbacks_receive_events(collector, container):
+    events = []
+    collector.add_callback(events.append)
+
+    DocumentAttributeQuery().execute(container, query="number < 2")
+    collector.remove_callback(events.append)
+    container.add_document(Document("doc99", {"number": 99}))
+
+    (event,) = [event for event in events if event.name == "query.execute"]
+    assert event.attributes["returned"] == 2
+    assert all(event.name != "container.add_document" for event in events)
+
+
+def test_failed_calls_are_counted_as_errors(collector, container):
+    with pytest.raises(errors.QueryError):
+        DocumentAttributeQuery().execute(container, query="number < 1", offset=-1)
+
+    counters = collector.get_counters()
+    assert counters["query.execute.errors"] == 1
+    assert "query.execute" not in counters
+
+
+def test_persistence_is_timed(collector, tmp_path):
+    database = Database()
+    database.add_container("numbers")
+    filename = os.path.join(tmp_path, "numbers.db")
+
+    persist_to_file(database, filename)
+    load_from_file(filename)
+
+    histograms = collector.list_histograms()
+    assert "persistence.persist_to_file" in histograms
+    assert "persistence.load_from_file" in histograms
+
+
+def test_reset_clears_everything(collector, container):
+    DocumentAttributeQuery().execute(container, query="number < 2")
+    collector.reset()
+
+    assert not collector.get_counters()
+    assert not collector.list_histograms()
+    assert not collector.get_slow_queries()
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+
+    for milliseconds in range(1, 101):
+        histogram.add(milliseconds / 1000)
+
+    assert histogram.count == 100
+    assert histogram.min == 0.001
+    assert histogram.max == 0.1
+    assert histogram.mean() == pytest.approx(0.0505)
+    assert 0.05 <= histogram.percentile(50) <= 0.1
+    assert histogram.percentile(100) == 0.1
+    assert sum(count for _, count in histogram.get_buckets()) == 100
+    assert Histogram().percentile(50) is None
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from dockie.core import errors
+from dockie.core.container import Container
+from dockie.core.database import Database
+from dockie.core.document import Document
+
+
+@pytest.fixture
+def container():
+    container = Container("people")
+    container.add_documents(
+        [("doc1", {"name": "Farooq", "tags": ["a"]}), (2, {"name": "Noor", "bio": None})]
+    )
+
+    return container
+
+
+def test_export_writes_one_document_per_line(container, tmp_path):
+    filename = str(tmp_path / "people.jsonl")
+
+    assert container.export_jsonl(filename) == 2
+
+    with open(filename, encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file]
+
+    assert lines == [
+        {"id": "doc1", "data": {"name": "Farooq", "tags": ["a"]}},
+        {"id": 2, "data": {"name": "Noor", "bio": None}},
+    ]
+
+
+def test_export_and_import_roundtrip(container, tmp_path):
+    filename = str(tmp_path / "people.jsonl")
+    container.export_jsonl(filename)
+    imported = Container("copy")
+    progress = []
+
+    result = imported.import_jsonl(filename, batch_size=1, progress=progress.append)
+
+    assert result.inserted == 2
+    assert progress == [1, 2]
+    assert imported.get_document(2).get_data() == {"name": "Noor", "bio": None}
+
+
+def test_import_replaces_existing_documents(container, tmp_path):
+    filename = str(tmp_path / "people.jsonl")
+    container.export_jsonl(filename)
+    container.add_document(Document("doc1", {"name": "Changed"}))
+
+    result = container.import_jsonl(filename)
+
+    assert result.replaced == 2
+    assert container.get_document("doc1").get_data()["name"] == "Farooq"
+
+
+def test_export_raises_error_when_file_exists(container, tmp_path):
+    filename = str(tmp_path / "people.jsonl")
+    container.export_jsonl(filename)
+
+    with pytest.raises(errors.PersistenceError):
+        container.export_jsonl(filename)
+
+    assert container.export_jsonl(filename, overwrite=True) == 2
+
+
+def test_export_raises_error_when_data_is_not_json(tmp_path):
+    container = Container("people")
+    container.add_document(Document("doc1", {"value": object()}))
+
+    with pytest.raises(errors.PersistenceError):
+        container.export_jsonl(str(tmp_path / "people.jsonl"))
+
+
+def test_failed_export_leaves_existing_file_intact(container, tmp_path):
+    filename = str(tmp_path / "people.jsonl")
+    container.export_jsonl(filename)
+    container.add_document(Document("doc3", {"value": object()}))
+
+    with pytest.raises(errors.PersistenceError):
+        container.export_jsonl(filename, overwrite=True)
+
+    assert Container("copy").import_jsonl(filename).inserted == 2
+    assert [path.name for path in tmp_path.iterdir()] == ["people.jsonl"]
+
+
+def test_import_raises_error_when_file_not_found(container, tmp_path):
+    with pytest.raises(errors.PersistenceError):
+        container.import_jsonl(str(tmp_path / "missing.jsonl"))
+
+
+@pytest.mark.parametrize("line", ["not json", '{"id": "doc1"}', "[1, 2]"])
+def test_import_raises_error_on_malformed_line(container, tmp_path, line):
+    filename = tmp_path / "bad.jsonl"
+    filename.write_text('{"id": "doc3", "data": {}}\n\n' + line + "\n", encoding="utf-8")
+
+    with pytest.raises(errors.PersistenceError, match="Line 3"):
+        container.import_jsonl(str(filename), batch_size=1)
+
+    assert container.get_document("doc3").get_data() == {}
+
+
+def test_database_export_and_import(container, tmp_path):
+    filename = str(tmp_path / "database.jsonl")
+    database = Database()
+    database.attach_container(container)
+    database.add_container("empty")
+    database.add_container("orders")
+    database.get_container("orders").add_document(Document("order1", {"total": 5}))
+
+    assert database.export_jsonl(filename) == 3
+
+    imported = Database()
+    imported.add_container("orders")
+    progress = []
+    result = imported.import_jsonl(filename, batch_size=1, progress=progress.append)
+
+    assert result.inserted == 3
+    assert progress == [1, 2, 3]
+    assert sorted(imported.list_containers()) == ["empty", "orders", "people"]
+    assert imported.get_container("orders").get_document("order1").get_data() == {
+        "total": 5
+    }
+    assert imported.get_container("empty").count_documents() == 0
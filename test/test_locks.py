@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from dockie.core.locks import ReadWriteLock
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            barrier.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+
+    for thread in threads:
+        thread.join()
+
+
+def test_writer_excludes_readers():
+    lock = ReadWriteLock()
+    events = []
+
+    def read():
+        with lock.read():
+            events.append("read")
+
+    with lock.write():
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+        events.append("write")
+
+    reader.join()
+
+    assert events == ["write", "read"]
+
+
+def test_waiting_writer_is_preferred_over_new_readers():
+    lock = ReadWriteLock()
+    events = []
+
+    def write():
+        with lock.write():
+            events.append("write")
+
+    def read():
+        with lock.read():
+            events.append("read")
+
+    with lock.read():
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.05)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+
+    writer.join()
+    reader.join()
+
+    assert events == ["write", "read"]
+
+
+def test_lock_is_reentrant():
+    lock = ReadWriteLock()
+
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+
+    with lock.read():
+        with lock.read():
+            pass
+
+    with lock.write():
+        pass
+
+
+def test_read_lock_cannot_be_upgraded():
+    lock = ReadWriteLock()
+
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
@@ -0,0 +1,157 @@
+import pytest
+
+from dockie.core import errors, index, persistence, snapshot
+from dockie.core.database import Database
+from dockie.core.document import Document, NoneDocument
+from dockie.core.partition import PartitionedContainer, partition_of
+from dockie.core.wal import JournaledDatabase
+
+
+@pytest.fixture
+def container():
+    container = PartitionedContainer("people", partitions=4)
+    container.add_documents((f"doc{number}", {"number": number}) for number in range(100))
+
+    return container
+
+
+def test_documents_are_spread_over_partitions(container):
+    counts = [partition.count_documents() for partition in container.list_partitions()]
+
+    assert sum(counts) == container.count_documents() == 100
+    assert all(count > 0 for count in counts)
+
+
+def test_partition_of_is_stable():
+    assert partition_of("doc1", 8) == partition_of("doc1", 8)
+    assert 0 <= partition_of(12345, 8) < 8
+
+
+def test_get_document(container):
+    container.add_document(Document("doc1", {"number": -1}))
+
+    assert container.get_document("doc1").get_data() == {"number": -1}
+    assert container.get_partition("doc1").get_document("doc1").get_data() == {"number": -1}
+    assert isinstance(container.get_document("missing"), NoneDocument)
+
+
+def test_get_documents_reassembles_partitions_in_request_order(container):
+    document_ids = [f"doc{number}" for number in range(99, -1, -3)] + ["missing"]
+    documents = container.get_documents(document_ids)
+
+    assert [document.get_id() for document in documents[:-1]] == document_ids[:-1]
+    assert isinstance(documents[-1], NoneDocument)
+
+
+def test_list_and_iterate_documents(container):
+    assert sorted(container.list_documents()) == sorted(f"doc{n}" for n in range(100))
+    assert len(list(container.iter_documents())) == 100
+
+
+def test_add_documents_reports_replacements_and_progress(container):
+    progress = []
+    result = container.add_documents(
+        [("doc1", {}), ("new", {}), ("doc2", {})], batch_size=2, progress=progress.append
+    )
+
+    assert result.inserted == 1
+    assert result.replaced == 2
+    assert progress == [2, 3]
+
+
+def test_invalid_batch_is_not_inserted(container):
+    with pytest.raises(errors.ObjectCreateError):
+        container.add_documents([("valid", {}), ("", {})])
+
+    assert isinstance(container.get_document("valid"), NoneDocument)
+
+
+def test_invalid_partition_count_raises_error():
+    with pytest.raises(errors.ObjectCreateError):
+        PartitionedContainer("people", partitions=0)
+
+
+def test_indexes_are_added_to_every_partition(container):
+    container.add_index("number", index.SORTED)
+
+    assert container.list_indexes() == ["number"]
+    assert container.get_index_type("number") == index.SORTED
+    assert all(
+        partition.get_index("number") is not None for partition in container.list_partitions()
+    )
+
+
+def test_listeners_receive_mutations_of_every_partition(container):
+    mutations = []
+    container.add_listener(mutations.append)
+    container.add_documents((f"new{number}", {}) for number in range(20))
+    container.remove_listener(mutations.append)
+    container.add_document(Document("after", {}))
+
+    assert len(mutations) == 20
+    assert {mutation.container.get_name() for mutation in mutations} == {"people"}
+
+
+def test_save_writes_only_changed_partitions(container, tmp_path):
+    directory = str(tmp_path / "people")
+
+    assert persistence.save_partitions(container, directory) == [0, 1, 2, 3]
+    assert persistence.save_partitions(container, directory) == []
+
+    container.add_document(Document("doc1", {"number": -1}))
+    changed = partition_of("doc1", 4)
+
+    assert container.list_dirty_partitions() == [changed]
+    assert persistence.save_partitions(container, directory) == [changed]
+
+    loaded = persistence.load_partitions(directory)
+
+    assert loaded.get_name() == "people"
+    assert loaded.count_partitions() == 4
+    assert loaded.count_documents() == 100
+    assert loaded.get_document("doc1").get_data() == {"number": -1}
+    assert loaded.list_dirty_partitions() == []
+
+
+def test_load_partitions_raises_error_when_directory_is_empty(tmp_path):
+    with pytest.raises(errors.PersistenceError):
+        persistence.load_partitions(str(tmp_path))
+
+
+def test_persist_database_with_partitioned_container(container, tmp_path):
+    filename = str(tmp_path / "people.db")
+    container.add_index("number")
+    database = Database()
+    database.attach_container(container)
+    persistence.persist_to_file(database, filename)
+
+    loaded = persistence.load_from_file(filename).get_container("people")
+
+    assert isinstance(loaded, PartitionedContainer)
+    assert loaded.count_partitions() == 4
+    assert loaded.count_documents() == 100
+    assert loaded.list_indexes() == ["number"]
+
+
+def test_snapshot_of_partitioned_container_raises_error(container, tmp_path):
+    database = Database()
+    database.attach_container(container)
+
+    with pytest.raises(errors.PersistenceError):
+        snapshot.write_snapshot(database, str(tmp_path / "people.snapshot"))
+
+
+def test_journaled_database_recovers_partitioned_container(tmp_path):
+    directory = str(tmp_path / "journal")
+    journaled = JournaledDatabase(directory)
+    journaled.get_database().attach_container(PartitionedContainer("people", 3))
+    journaled.get_database().get_container("people").add_document(Document("doc1", {}))
+    journaled.close()
+
+    recovered = JournaledDatabase(directory)
+    container = recovered.get_database().get_container("people")
+    recovered.close()
+
+    assert isinstance(container, PartitionedContainer)
+    assert container.count_partitions() == 3
+    assert container.get_document("doc1").get_data() == {}
@@ -0,0 +1,74 @@
+import pytest
+
+from dockie.core import errors
+from dockie.core.results import ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_result_cache_hits_current_version():
+    cache = ResultCache()
+    cache.put("key", 1, ["a", "b"])
+
+    assert cache.get("key", 1) == ("a", "b")
+    assert cache.get("other", 1) is None
+    assert cache.get_stats().hits == 1
+    assert cache.get_stats().misses == 1
+
+
+def test_result_cache_invalidates_stale_version():
+    cache = ResultCache()
+    cache.put("key", 1, ["a"])
+
+    assert cache.get("key", 2) is None
+
+    stats = cache.get_stats()
+    assert stats.invalidations == 1
+    assert stats.size == 0
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_size=2)
+    cache.put("a", 0, [1])
+    cache.put("b", 0, [2])
+    cache.get("a", 0)
+    cache.put("c", 0, [3])
+
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) == (1,)
+    assert cache.get("c", 0) == (3,)
+    assert cache.get_stats().evictions == 1
+
+
+def test_result_cache_expires_entries():
+    clock = FakeClock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("key", 0, [1])
+
+    clock.now = 9.9
+    assert cache.get("key", 0) == (1,)
+
+    clock.now = 10
+    assert cache.get("key", 0) is None
+    assert cache.get_stats().expirations == 1
+
+
+def test_result_cache_clear_resets_stats():
+    cache = ResultCache()
+    cache.put("key", 0, [1])
+    cache.get("key", 0)
+    cache.clear()
+
+    assert cache.get_stats() == (0, 0, 0, 0, 0, 0, 128)
+
+
+@pytest.mark.parametrize("arguments", [{"max_size": 0}, {"ttl": 0}, {"ttl": -1}])
+def test_result_cache_rejects_invalid_arguments(arguments):
+    with pytest.raises(errors.QueryError):
+        ResultCache(**arguments)
@@ -0,0 +1,127 @@
+import pickle
+
+import pytest
+
+from dockie.core import errors, index, snapshot
+from dockie.core.database import Database
+from dockie.core.document import Document, NoneDocument
+from dockie.query.query import DocumentAttributeQuery
+
+
+@pytest.fixture
+def filename(tmp_path):
+    database = Database()
+    database.add_container("orders")
+    database.add_container("items")
+
+    orders = database.get_container("orders")
+    orders.add_index("customerId", index.SORTED)
+
+    for number in range(100):
+        orders.add_document(Document(f"order{number}", {"customerId": number}))
+
+    database.get_container("items").add_document(Document(1, {"name": "basketball"}))
+
+    filename = str(tmp_path / "db.snap")
+    snapshot.write_snapshot(database, filename)
+
+    return filename
+
+
+def test_open_snapshot_decodes_documents_on_first_access(filename):
+    database = snapshot.open_snapshot(filename)
+    orders = database.get_container("orders")
+    store = orders._documents
+
+    assert database.list_containers() == ["orders", "items"]
+    assert len(orders.list_documents()) == 100
+    assert store.count_resident() == 0
+
+    assert orders.get_document("order42").get_data() == {"customerId": 42}
+    assert database.get_container("items").get_document(1).get_data() == {
+        "name": "basketball"
+    }
+    assert store.count_resident() == 1
+    assert type(orders.get_document("order100")) is NoneDocument
+
+
+def test_resident_set_limit_evicts_cold_documents(filename):
+    orders = snapshot.open_snapshot(filename, max_resident=10).get_container("orders")
+
+    for document_id in orders.list_documents():
+        orders.get_document(document_id)
+
+    assert orders._documents.count_resident() == 10
+    assert orders.get_document("order0").get_data() == {"customerId": 0}
+
+
+def test_get_documents_decodes_only_requested_documents(filename):
+    orders = snapshot.open_snapshot(filename).get_container("orders")
+    documents = orders.get_documents(["order7", "order100", "order3"])
+
+    assert [document.get_data() for document in documents[::2]] == [
+        {"customerId": 7},
+        {"customerId": 3},
+    ]
+    assert type(documents[1]) is NoneDocument
+    assert orders._documents.count_resident() == 2
+
+
+def test_snapshot_keeps_indexes(filename):
+    orders = snapshot.open_snapshot(filename).get_container("orders")
+    query = DocumentAttributeQuery()
+
+    assert query.explain(orders, query="customerId >= 98").uses_index()
+    assert [
+        document.get_id() for document in query.execute(orders, query="customerId >= 98")
+    ] == ["order98", "order99"]
+    assert orders._documents.count_resident() == 2
+
+
+def test_opened_snapshot_accepts_writes(filename):
+    database = snapshot.open_snapshot(filename)
+    orders = database.get_container("orders")
+    orders.add_document(Document("order1", {"customerId": 1000}))
+    orders.add_document(Document("order100", {"customerId": 100}))
+
+    snapshot.write_snapshot(database, filename, overwrite=True)
+    orders = snapshot.open_snapshot(filename).get_container("orders")
+
+    assert orders.get_document("order1").get_data() == {"customerId": 1000}
+    assert orders.list_documents()[-1] == "order100"
+
+
+def test_opened_snapshot_can_be_pickled(filename):
+    database = pickle.loads(pickle.dumps(snapshot.open_snapshot(filename)))
+
+    assert (
+        database.get_container("orders").get_document("order7").get_data()
+        == {"customerId": 7}
+    )
+
+
+def test_write_snapshot_raises_error_when_file_exists(filename):
+    with pytest.raises(errors.PersistenceError):
+        snapshot.write_snapshot(Database(), filename)
+
+
+def test_failed_write_leaves_existing_snapshot_intact(filename, tmp_path):
+    database = snapshot.open_snapshot(filename)
+    database.get_container("items").add_document(Document(2, {"value": object()}))
+
+    with pytest.raises(TypeError):
+        snapshot.write_snapshot(database, filename, overwrite=True, codec="json")
+
+    assert snapshot.open_snapshot(filename).get_container("orders").count_documents() == 100
+    assert [path.name for path in tmp_path.iterdir()] == ["db.snap"]
+
+
+def test_open_snapshot_raises_error_when_file_is_not_a_snapshot(tmp_path):
+    filename = tmp_path / "db.bak"
+    filename.write_bytes(b"x" * 100)
+
+    with pytest.raises(errors.PersistenceError):
+        snapshot.open_snapshot(str(filename))
+
+    with pytest.raises(errors.PersistenceError):
+        snapshot.open_snapshot(str(tmp_path / "missing.snap"))
@@ -0,0 +1,169 @@
+import os
+
+import pytest
+
+from dockie.core import codecs, errors, events, wal
+from dockie.core.database import Database
+from dockie.core.document import Document
+
+
+def _populate(database):
+    database.add_container("orders")
+    orders = database.get_container("orders")
+    orders.add_document(Document("order1", {"customerId": 100}))
+    orders.add_document(Document("order2", {"customerId": 200}))
+    orders.add_document(Document("order1", {"customerId": 300}))
+
+
+def test_database_listener_receives_mutations():
+    database = Database()
+    mutations = []
+    database.add_listener(mutations.append)
+
+    _populate(database)
+
+    assert [mutation.kind for mutation in mutations] == [
+        events.ADD_CONTAINER,
+        events.INSERT,
+        events.INSERT,
+        events.REPLACE,
+    ]
+    assert mutations[-1].previous.get_data() == {"customerId": 100}
+
+
+def test_log_records_mutations(tmp_path):
+    filename = str(tmp_path / "wal.log")
+    database = Database()
+    log = wal.WriteAheadLog(filename)
+    database.add_listener(log)
+
+    _populate(database)
+    log.close()
+
+    assert list(wal.read_log(filename)) == [
+        (events.ADD_CONTAINER, "orders"),
+        (events.INSERT, "orders", "order1", {"customerId": 100}),
+        (events.INSERT, "orders", "order2", {"customerId": 200}),
+        (events.REPLACE, "orders", "order1", {"customerId": 300}),
+    ]
+
+
+def test_read_log_ignores_torn_tail(tmp_path):
+    filename = str(tmp_path / "wal.log")
+    log = wal.WriteAheadLog(filename)
+    log.append((events.ADD_CONTAINER, "orders"))
+    log.append((events.ADD_CONTAINER, "items"))
+    log.close()
+
+    with open(filename, "r+b") as file:
+        file.truncate(os.path.getsize(filename) - 3)
+
+    assert list(wal.read_log(filename)) == [(events.ADD_CONTAINER, "orders")]
+
+
+@pytest.mark.parametrize("sync_mode", [wal.SYNC_ALWAYS, wal.SYNC_BATCH, wal.SYNC_INTERVAL])
+def test_journaled_database_recovers_from_log(tmp_path, sync_mode):
+    journal = wal.JournaledDatabase(str(tmp_path), sync_mode=sync_mode, batch_size=2)
+    _populate(journal.get_database())
+    journal.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path)).get_database()
+    orders = recovered.get_container("orders")
+
+    assert orders.list_documents() == ["order1", "order2"]
+    assert orders.get_document("order1").get_data() == {"customerId": 300}
+
+
+def test_checkpoint_compacts_log_into_snapshot(tmp_path):
+    journal = wal.JournaledDatabase(str(tmp_path))
+    _populate(journal.get_database())
+    journal.checkpoint()
+
+    assert list(wal.read_log(str(tmp_path / wal.LOG_FILENAME))) == []
+    assert sorted(os.listdir(str(tmp_path))) == [wal.SNAPSHOT_FILENAME, wal.LOG_FILENAME]
+
+    journal.get_database().get_container("orders").add_document(
+        Document("order3", {"customerId": 400})
+    )
+    journal.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path)).get_database()
+
+    assert recovered.get_container("orders").list_documents() == [
+        "order1",
+        "order2",
+        "order3",
+    ]
+
+
+def test_compact_every_takes_checkpoints(tmp_path):
+    journal = wal.JournaledDatabase(str(tmp_path), compact_every=2)
+    _populate(journal.get_database())
+    journal.close()
+
+    assert os.path.exists(tmp_path / wal.SNAPSHOT_FILENAME)
+    assert len(list(wal.read_log(str(tmp_path / wal.LOG_FILENAME)))) < 2
+
+    recovered = wal.JournaledDatabase(str(tmp_path)).get_database()
+
+    assert recovered.get_container("orders").list_documents() == ["order1", "order2"]
+
+
+def test_recovery_truncates_torn_tail(tmp_path):
+    journal = wal.JournaledDatabase(str(tmp_path))
+    _populate(journal.get_database())
+    journal.close()
+
+    log_filename = tmp_path / wal.LOG_FILENAME
+
+    with open(log_filename, "ab") as file:
+        file.write(b"\x00\x00")
+
+    journal = wal.JournaledDatabase(str(tmp_path))
+    journal.get_database().add_container("items")
+    journal.close()
+
+    recovered = wal.JournaledDatabase(str(tmp_path)).get_database()
+
+    assert recovered.list_containers() == ["orders", "items"]
+
+
+def test_log_records_are_encoded_with_its_codec(tmp_path):
+    filename = str(tmp_path / "wal.log")
+    log = wal.WriteAheadLog(filename, codec=codecs.PICKLE)
+    log.append((events.ADD_CONTAINER, "orders"))
+    log.close()
+
+    assert wal.read_log_codec(filename).name == codecs.PICKLE
+
+    with pytest.raises(errors.PersistenceError):
+        list(wal.read_log(filename))
+
+    with pytest.raises(errors.PersistenceError):
+        wal.WriteAheadLog(filename, codec=codecs.JSON)
+
+    assert list(wal.read_log(filename, allow_pickle=True)) == [(events.ADD_CONTAINER, "orders")]
+
+
+def test_journaled_database_compacts_log_written_with_another_codec(tmp_path):
+    journal = wal.JournaledDatabase(str(tmp_path))
+    _populate(journal.get_database())
+    journal.close()
+
+    journal = wal.JournaledDatabase(str(tmp_path), codec=codecs.PICKLE)
+    journal.get_database().add_container("items")
+    journal.close()
+
+    log_filename = str(tmp_path / wal.LOG_FILENAME)
+    recovered = wal.JournaledDatabase(str(tmp_path), codec=codecs.PICKLE).get_database()
+
+    assert wal.read_log_codec(log_filename).name == codecs.PICKLE
+    assert recovered.list_containers() == ["orders", "items"]
+    assert recovered.get_container("orders").get_document("order1").get_data() == {
+        "customerId": 300
+    }
+
+
+def test_raise_error_when_sync_mode_not_supported(tmp_path):
+    with pytest.raises(errors.PersistenceError):
+        wal.WriteAheadLog(str(tmp_path / "wal.log"), sync_mode="never")